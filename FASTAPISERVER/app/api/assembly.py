@@ -0,0 +1,109 @@
+"""Assembly of analysis responses from graph state, with fast JSON encoding and response compression"""
+
+import gzip
+from typing import Any, Dict, Optional
+import orjson
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from app.models.responses import HealthAnalysisResponse
+from app.config.settings import settings
+
+# Compiled once: validates an assembled document in one pass and serializes it in pydantic-core
+_response_adapter = TypeAdapter(HealthAnalysisResponse)
+
+# Stand-ins for ingredient profile fields a cached or degraded result lacks
+INGREDIENT_DEFAULTS = {
+    "name": "Unknown",
+    "manufacturing": "Unknown",
+    "regulatory_gap": "No data",
+    "health_risks": "No data",
+    "nova_score": 3,
+}
+
+try:
+    import brotli
+except ImportError:  # Optional: without it responses are offered gzip only
+    brotli = None
+
+
+def _ingredient(item: Any) -> Dict[str, Any]:
+    # Graph runs produce IngredientProfile models, cached results plain dicts
+    fields = item.__dict__ if isinstance(item, BaseModel) else item
+    return {key: fields.get(key, default) for key, default in INGREDIENT_DEFAULTS.items()}
+
+
+def response_document(result: dict) -> Dict[str, Any]:
+    """The API response fields of a finished health copilot state, not yet validated"""
+    return {
+        "success": True,
+        "brand_name": result.get("brand_name", "Unknown"),
+        "ingredients_list": result.get("ingredients_list", []),
+        "user_clinical_profile": result.get("user_clinical_profile", ""),
+        "ingredient_knowledge_base": [_ingredient(item) for item in result.get("ingredient_knowledge_base", [])],
+        "clinical_risk_analysis": result.get("clinical_risk_analysis", ""),
+        "product_alternatives": result.get("product_alternatives", []),
+        "final_conversational_insight": result.get("final_conversational_insight", ""),
+        "decision_color": result.get("decision_color", "#EAB308"),  # Default yellow
+        "degraded_stages": result.get("degraded_stages", []),
+        "extraction_status": result.get("extraction_status") or "ok",
+        "decision": result.get("decision"),
+        "conflicts": (result.get("prescreen_result") or {}).get("conflicts", []),
+    }
+
+
+def build_analysis_response(result: dict) -> HealthAnalysisResponse:
+    """Convert a finished health copilot state into the API response"""
+    return _response_adapter.validate_python(response_document(result))
+
+
+def analysis_document(result: dict) -> Dict[str, Any]:
+    """The API response as JSON-ready data (SSE `done` events, published job snapshots)"""
+    return _response_adapter.dump_python(build_analysis_response(result), mode="json")
+
+
+def analysis_json(result: dict) -> bytes:
+    """The API response encoded as JSON"""
+    return _response_adapter.dump_json(build_analysis_response(result))
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The client's preferred encoding among br (when Brotli is installed) and gzip, or None"""
+    offered = ("br", "gzip") if brotli is not None else ("gzip",)
+    weights: Dict[str, float] = {}
+    for part in (accept_encoding or "").lower().split(","):
+        coding, _, params = part.partition(";")
+        params = params.strip()
+        try:
+            weight = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            weight = 0.0
+        weights[coding.strip()] = weight
+    # Ties go to the first offered (smaller) encoding
+    best = max(offered, key=lambda c: weights.get(c, weights.get("*", 0.0)))
+    return best if weights.get(best, weights.get("*", 0.0)) > 0 else None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.response_brotli_quality)
+    return gzip.compress(body, compresslevel=settings.response_gzip_level, mtime=0)
+
+
+def json_response(content: Any, accept_encoding: Optional[str] = None, status_code: int = 200) -> Response:
+    """
+    JSON response for already-validated content (bytes are sent as they are,
+    anything else is encoded with orjson), compressed when the client accepts
+    it and the body is at least RESPONSE_COMPRESSION_MIN_BYTES.
+    """
+    body = content if isinstance(content, bytes) else orjson.dumps(content)
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = negotiate_encoding(accept_encoding) if len(body) >= settings.response_compression_min_bytes else None
+    if encoding is not None:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+def analysis_response(result: dict, accept_encoding: Optional[str] = None) -> Response:
+    """The API response for a finished state, validated once and sent as (compressed) JSON"""
+    return json_response(analysis_json(result), accept_encoding)
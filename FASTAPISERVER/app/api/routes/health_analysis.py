@@ -1,32 +1,230 @@
 """Health analysis API routes"""
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, status
+from fastapi import APIRouter, Depends, UploadFile, File, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from datetime import datetime
+from app.api.assembly import analysis_document, analysis_response
 from app.models.requests import HealthAnalysisRequest, URLAnalysisRequest
 from app.models.responses import (
     HealthAnalysisResponse,
     ErrorResponse,
-    HealthCheckResponse,
-    IngredientProfileResponse
+    HealthCheckResponse
 )
-from app.services.health_agent import build_health_copilot
+from app.services.analysis_engine import analysis_engine
+from app.services.health_agent import resolve_fields
+from app.services.health_agent.deadline import new_deadline
+from app.services.health_agent.streaming import StreamSink
+from app.services.readiness import readiness
+from app.services.shared_cache import cache_key, file_digest, result_cache
 from app.utils.file_handler import file_handler
 from app.utils.logger import logger
+from app.utils.metrics import metrics
+from app.utils.profiling import profiler, requested_mode
+from app.utils.tracing import span
 from app.config.settings import settings
-from langchain_google_genai import ChatGoogleGenerativeAI
-import os
+import json
+import time
+import asyncio
+from typing import AsyncIterator, FrozenSet, List, Optional
 
 router = APIRouter(prefix="/api/v1", tags=["health-analysis"])
 
-# Initialize LLM
-llm = ChatGoogleGenerativeAI(
-    model=settings.gemini_model,
-    temperature=settings.gemini_temperature,
-    google_api_key=settings.google_api_key
+# State keys `response_document` reads; only these go into the result cache
+RESPONSE_STATE_KEYS = (
+    "brand_name", "ingredients_list", "user_clinical_profile", "ingredient_knowledge_base",
+    "clinical_risk_analysis", "product_alternatives", "final_conversational_insight",
+    "decision_color", "degraded_stages", "extraction_status", "decision", "prescreen_result",
 )
 
-# Build health copilot workflow
-health_copilot = build_health_copilot(llm)
+def cacheable_result(result: dict) -> Optional[dict]:
+    """The response part of a finished state, or None when it must not be reused (degraded or unreadable label)"""
+    if result.get("degraded_stages") or (result.get("extraction_status") or "ok") != "ok":
+        return None
+    cached = {key: result[key] for key in RESPONSE_STATE_KEYS if key in result}
+    cached["ingredient_knowledge_base"] = [
+        item.model_dump() if hasattr(item, "model_dump") else item
+        for item in result.get("ingredient_knowledge_base", [])
+    ]
+    return cached
+
+
+def result_cache_key(inputs: dict, fields: Optional[FrozenSet[str]]) -> str:
+    """Same label images, health profile, field set and app version -> same analysis"""
+    image_paths = inputs.get("image_paths") or [inputs["image_path"]]
+    return cache_key(
+        settings.app_version,
+        file_digest(image_paths),
+        inputs.get("user_raw_health", ""),
+        sorted(fields) if fields else "all"
+    )
+
+
+def parse_projection(mode: Optional[str], fields: Optional[str]) -> FrozenSet[str]:
+    """Resolve the `mode` / comma-separated `fields` query parameters (422 on unknown names)"""
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    try:
+        return resolve_fields(mode, field_list)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+
+def shed_when_unready():
+    """Refuse an analysis up front while Groq or Gemini is down (see /api/v1/ready) instead of failing it after 30s"""
+    reason = readiness.shed_reason()
+    if reason:
+        metrics.increment("requests_shed_total")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Analysis temporarily unavailable: {reason}",
+            headers={"Retry-After": str(max(1, int(settings.readiness_probe_interval_seconds)))}
+        )
+
+
+class AnalysisAbandoned(Exception):
+    """The hard request timeout passed (the client already got a 504); the rest of the graph is skipped"""
+
+
+def label_inputs(file_paths: List[str], user_health_profile: str) -> dict:
+    """Graph inputs for one or more saved label panels"""
+    return {
+        "image_path": file_paths[0],
+        "image_paths": file_paths,
+        "user_raw_health": user_health_profile
+    }
+
+
+def run_analysis(
+    inputs: dict,
+    fields: Optional[FrozenSet[str]] = None,
+    sink: Optional[StreamSink] = None,
+    profile: Optional[str] = None,
+    abandon_at: Optional[float] = None
+) -> dict:
+    """
+    Run the health copilot graph (pruned to `fields`) under a fresh request deadline (blocking)
+    
+    An identical earlier request (same images, profile and fields) is answered
+    from the shared result cache by any worker. `profile` ("sampling" or
+    "deterministic") saves a profile of the run under the request's trace id.
+    Past `abandon_at` (epoch seconds) no further node starts and
+    AnalysisAbandoned is raised, so a timed-out request stops spending quota.
+    """
+    image_paths = inputs.get("image_paths") or [inputs["image_path"]]
+    with profiler.profile(profile), span("analysis", images=len(image_paths), fields=sorted(fields) if fields else "all", streamed=sink is not None) as trace:
+        key = result_cache_key(inputs, fields)
+        cached = result_cache.get(key)
+        trace.set(result_cache_hit=cached is not None)
+        if cached is not None:
+            logger.info(f"Analysis served from the result cache for brand: {cached.get('brand_name', 'Unknown')}")
+            if sink and cached.get("decision"):
+                sink("decision", {"decision_color": cached.get("decision_color"), "decision": cached["decision"]})
+            return cached
+        
+        graph = analysis_engine.get(fields)
+        config = {"configurable": {"stream_sink": sink}} if sink else None
+        # invoke() step by step, so the run can stop between nodes
+        for result in graph.stream({**inputs, "deadline": new_deadline(), "degraded_stages": []}, config=config, stream_mode="values"):
+            if abandon_at is not None and time.time() > abandon_at:
+                trace.set(abandoned=True)
+                raise AnalysisAbandoned(f"Analysis abandoned after the {settings.request_timeout_seconds:.0f}s time limit")
+        trace.set(
+            ingredients=len(result.get("ingredients_list") or []),
+            extraction_status=result.get("extraction_status") or "ok",
+            degraded_stages=list(result.get("degraded_stages") or [])
+        )
+        cacheable = cacheable_result(result)
+        if cacheable is not None:
+            result_cache.set(key, cacheable)
+        return result
+
+
+async def run_analysis_async(
+    inputs: dict,
+    fields: Optional[FrozenSet[str]] = None,
+    sink: Optional[StreamSink] = None,
+    profile: Optional[str] = None,
+    cleanup_paths: Optional[List[str]] = None
+) -> dict:
+    """
+    Run the graph in a worker thread, bounded by the hard request timeout
+
+    A thread cannot be cancelled: after a timeout the graph stops at its next
+    node, and `cleanup_paths` (the label images) are deleted only once the
+    thread is done with them.
+    """
+    abandon_at = time.time() + settings.request_timeout_seconds
+    run = asyncio.ensure_future(asyncio.to_thread(run_analysis, inputs, fields, sink, profile, abandon_at))
+
+    def finished(run: asyncio.Future):
+        if cleanup_paths:
+            file_handler.cleanup_files(cleanup_paths)
+        if not run.cancelled() and isinstance(run.exception(), AnalysisAbandoned):
+            logger.info("Timed-out analysis stopped")
+
+    run.add_done_callback(finished)
+    try:
+        # shield: a timeout must not mark the run done while its thread still reads the images
+        return await asyncio.wait_for(asyncio.shield(run), timeout=settings.request_timeout_seconds)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Analysis exceeded the {settings.request_timeout_seconds:.0f}s time limit"
+        )
+
+
+def sse_event(event: str, data: dict) -> str:
+    """One Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_analysis_events(
+    inputs: dict,
+    fields: Optional[FrozenSet[str]],
+    file_paths: List[str]
+) -> AsyncIterator[str]:
+    """
+    Run the analysis and yield its progress as SSE frames.
+
+    Events: `decision` (engine verdict and color), `section` / `section_complete`
+    (designer section boundaries), `token` (designer text chunks), `replace`
+    (fallback insight after a designer timeout), then `done` with the full
+    response or `error`.
+    """
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def sink(event: str, data: dict):
+        # Called from the graph's worker thread
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    task = asyncio.ensure_future(run_analysis_async(inputs, fields, sink, cleanup_paths=file_paths))
+    try:
+        while not task.done():
+            getter = asyncio.ensure_future(events.get())
+            await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield sse_event(*getter.result())
+            else:
+                getter.cancel()
+        # Events queued before the graph finished
+        while not events.empty():
+            yield sse_event(*events.get_nowait())
+
+        try:
+            result = task.result()
+        except HTTPException as e:
+            yield sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+            return
+        except Exception as e:
+            logger.error(f"Error during streamed analysis: {e}", exc_info=True)
+            yield sse_event("error", {"status_code": 500, "detail": f"Analysis failed: {str(e)}"})
+            return
+        logger.info(f"Streamed analysis complete for brand: {result.get('brand_name', 'Unknown')}")
+        yield sse_event("done", analysis_document(result))
+    finally:
+        # Cancelled before the analysis started (it deletes the images itself once it has)
+        if task.cancelled():
+            file_handler.cleanup_files(file_paths)
 
 
 @router.get("/health", response_model=HealthCheckResponse)
@@ -39,16 +237,27 @@ async def health_check():
     )
 
 
-@router.post("/analyze", response_model=HealthAnalysisResponse)
+@router.post("/analyze", response_model=HealthAnalysisResponse, dependencies=[Depends(shed_when_unready)])
 async def analyze_food_label(
-    file: UploadFile = File(..., description="Food label image"),
-    user_health_profile: str = File(..., description="User's health profile")
+    request: Request,
+    file: List[UploadFile] = File(..., description="Food label image(s); repeat for front/back/side panels"),
+    user_health_profile: str = File(..., description="User's health profile"),
+    mode: Optional[str] = Query(None, description="quick, standard or full (default)"),
+    fields: Optional[str] = Query(None, description="Comma-separated response fields to compute"),
+    x_profile: Optional[str] = Header(None, description="sampling or deterministic: profile this request"),
+    x_profile_token: Optional[str] = Header(None, description="Must match PROFILING_TOKEN for X-Profile to count")
 ):
     """
-    Analyze a food product label from an uploaded image
+    Analyze a food product label from one or more uploaded images
     
-    - **file**: Food label image (jpg, png, webp)
+    - **file**: Food label image (jpg, png, webp); send the field once per panel
+      (up to MAX_LABEL_IMAGES) when brand, ingredients and nutrition table are on
+      different sides. Panels are read concurrently and merged.
     - **user_health_profile**: User's health conditions or dietary restrictions
+    - **mode** / **fields**: Only run the pipeline stages needed for these outputs
+      (`quick` = brand, ingredients, conflicts and decision color from one vision call)
+    - **X-Profile** / **X-Profile-Token** headers: Save a profile of this request
+      under its trace id (see `/api/v1/profiles`)
     
     Returns detailed health analysis including:
     - Brand and ingredient extraction
@@ -58,89 +267,90 @@ async def analyze_food_label(
     - Conversational health insights
     """
     
-    file_path = None
+    projection = parse_projection(mode, fields)
     
     try:
-        logger.info(f"Received analysis request for file: {file.filename}")
+        logger.info(f"Received analysis request for files: {', '.join(f.filename for f in file)}")
         
-        # Save uploaded file
-        file_path = file_handler.save_upload_file(file)
+        # Save uploaded files (deleted by the analysis once its graph run is over)
+        file_paths = file_handler.save_upload_files(file)
         
         # Prepare inputs for health copilot
-        inputs = {
-            "image_path": file_path,
-            "user_raw_health": user_health_profile
-        }
+        inputs = label_inputs(file_paths, user_health_profile)
         
         logger.info("Running health copilot analysis...")
         
         # Run health copilot workflow
-        result = health_copilot.invoke(inputs)
+        result = await run_analysis_async(
+            inputs, projection, profile=requested_mode(x_profile, x_profile_token), cleanup_paths=file_paths
+        )
         
         logger.info(f"Analysis complete for brand: {result.get('brand_name', 'Unknown')}")
         
-        # Convert ingredient knowledge base to response models
-        ingredient_profiles = []
-        for item in result.get("ingredient_knowledge_base", []):
-            # Handle both dict and Pydantic model
-            if hasattr(item, 'dict'):
-                item_dict = item.dict() if hasattr(item, 'dict') else item.model_dump()
-            else:
-                item_dict = item
-            
-            ingredient_profiles.append(IngredientProfileResponse(
-                name=item_dict.get("name", "Unknown"),
-                manufacturing=item_dict.get("manufacturing", "Unknown"),
-                regulatory_gap=item_dict.get("regulatory_gap", "No data"),
-                health_risks=item_dict.get("health_risks", "No data"),
-                nova_score=item_dict.get("nova_score", 3)
-            ))
-        
-        # Build response
-        response = HealthAnalysisResponse(
-            success=True,
-            brand_name=result.get("brand_name", "Unknown"),
-            ingredients_list=result.get("ingredients_list", []),
-            user_clinical_profile=result.get("user_clinical_profile", ""),
-            ingredient_knowledge_base=ingredient_profiles,
-            clinical_risk_analysis=result.get("clinical_risk_analysis", ""),
-            product_alternatives=result.get("product_alternatives", []),
-            final_conversational_insight=result.get("final_conversational_insight", ""),
-            decision_color=result.get("decision_color", "#EAB308")  # Default yellow
-        )
-        
-        return response
+        return analysis_response(result, request.headers.get("accept-encoding"))
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error during analysis: {e}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Analysis failed: {str(e)}"
         )
+
+
+@router.post("/analyze/stream", dependencies=[Depends(shed_when_unready)])
+async def analyze_food_label_stream(
+    file: List[UploadFile] = File(..., description="Food label image(s); repeat for front/back/side panels"),
+    user_health_profile: str = File(..., description="User's health profile"),
+    mode: Optional[str] = Query(None, description="quick, standard or full (default)"),
+    fields: Optional[str] = Query(None, description="Comma-separated response fields to compute")
+):
+    """
+    Analyze an uploaded food label, streaming progress as Server-Sent Events
     
-    finally:
-        # Cleanup uploaded file
-        if file_path and os.path.exists(file_path):
-            file_handler.cleanup_file(file_path)
+    Same inputs as `/analyze`. The decision color arrives as soon as the scoring
+    engine runs and the conversational insight streams token by token; the last
+    event (`done`) carries the same body `/analyze` returns.
+    """
+    
+    projection = parse_projection(mode, fields)
+    logger.info(f"Received streaming analysis request for files: {', '.join(f.filename for f in file)}")
+    
+    # Validate and save before the stream starts so upload errors are plain 4xx responses
+    file_paths = file_handler.save_upload_files(file)
+    inputs = label_inputs(file_paths, user_health_profile)
+    
+    return StreamingResponse(
+        stream_analysis_events(inputs, projection, file_paths),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
-@router.post("/analyze-url", response_model=HealthAnalysisResponse)
-async def analyze_food_label_from_url(request: URLAnalysisRequest):
+@router.post("/analyze-url", response_model=HealthAnalysisResponse, dependencies=[Depends(shed_when_unready)])
+async def analyze_food_label_from_url(
+    request: URLAnalysisRequest,
+    http_request: Request,
+    mode: Optional[str] = Query(None, description="quick, standard or full (default)"),
+    fields: Optional[str] = Query(None, description="Comma-separated response fields to compute")
+):
     """
     Analyze a food product label from an image URL
     
     - **image_url**: Public URL of the food label image
     - **user_health_profile**: User's health conditions or dietary restrictions
+    - **mode** / **fields**: Only run the pipeline stages needed for these outputs
     
     Returns the same detailed analysis as the upload endpoint
     """
     
-    file_path = None
+    projection = parse_projection(mode, fields)
     
     try:
         logger.info(f"Received analysis request for URL: {request.image_url}")
         
-        # Download image from URL
+        # Download image from URL (deleted by the analysis once its graph run is over)
         file_path = file_handler.download_from_url(request.image_url)
         
         # Prepare inputs for health copilot
@@ -152,40 +362,11 @@ async def analyze_food_label_from_url(request: URLAnalysisRequest):
         logger.info("Running health copilot analysis...")
         
         # Run health copilot workflow
-        result = health_copilot.invoke(inputs)
+        result = await run_analysis_async(inputs, projection, cleanup_paths=[file_path])
         
         logger.info(f"Analysis complete for brand: {result.get('brand_name', 'Unknown')}")
         
-        # Convert ingredient knowledge base to response models
-        ingredient_profiles = []
-        for item in result.get("ingredient_knowledge_base", []):
-            # Handle both dict and Pydantic model
-            if hasattr(item, 'dict'):
-                item_dict = item.dict() if hasattr(item, 'dict') else item.model_dump()
-            else:
-                item_dict = item
-            
-            ingredient_profiles.append(IngredientProfileResponse(
-                name=item_dict.get("name", "Unknown"),
-                manufacturing=item_dict.get("manufacturing", "Unknown"),
-                regulatory_gap=item_dict.get("regulatory_gap", "No data"),
-                health_risks=item_dict.get("health_risks", "No data"),
-                nova_score=item_dict.get("nova_score", 3)
-            ))
-        
-        # Build response
-        response = HealthAnalysisResponse(
-            success=True,
-            brand_name=result.get("brand_name", "Unknown"),
-            ingredients_list=result.get("ingredients_list", []),
-            user_clinical_profile=result.get("user_clinical_profile", ""),
-            ingredient_knowledge_base=ingredient_profiles,
-            clinical_risk_analysis=result.get("clinical_risk_analysis", ""),
-            product_alternatives=result.get("product_alternatives", []),
-            final_conversational_insight=result.get("final_conversational_insight", "")
-        )
-        
-        return response
+        return analysis_response(result, http_request.headers.get("accept-encoding"))
         
     except HTTPException:
         raise
@@ -195,8 +376,3 @@ async def analyze_food_label_from_url(request: URLAnalysisRequest):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Analysis failed: {str(e)}"
         )
-    
-    finally:
-        # Cleanup downloaded file
-        if file_path and os.path.exists(file_path):
-            file_handler.cleanup_file(file_path)
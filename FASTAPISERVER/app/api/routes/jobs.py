@@ -0,0 +1,154 @@
+"""Background analysis job API routes"""
+
+from typing import List, Optional
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Request, status
+from app.api.assembly import analysis_document, json_response
+from app.models.responses import (
+    HealthAnalysisResponse,
+    JobSubmitResponse,
+    JobStatusResponse,
+    JobTimingResponse,
+    JobQueueStatsResponse,
+)
+from app.api.routes.health_analysis import run_analysis, label_inputs, shed_when_unready
+from app.services.job_queue import Job, JobQueue, JobStatus, QueueFullError
+from app.services.shared_cache import SharedCache
+from app.utils.file_handler import file_handler
+from app.utils.logger import logger
+from app.config.settings import settings
+
+router = APIRouter(prefix="/api/v1", tags=["jobs"])
+
+# Job state published for the other server processes, so a poll can land on any worker
+job_snapshots = SharedCache("job", settings.job_result_ttl_seconds)
+
+
+def run_job(inputs: dict) -> dict:
+    """Run the analysis and build its response document, once, in the job's thread (polls return it as is)"""
+    return analysis_document(run_analysis(inputs))
+
+
+def job_snapshot(job: Job) -> dict:
+    """JSON-friendly status, timing and (once completed) response of a job"""
+    snapshot = {
+        "job_id": job.id,
+        "status": job.status.value,
+        "created_at": job.created_at.isoformat(),
+        "timing": job.timing(),
+        "error": job.error,
+    }
+    if job.status == JobStatus.COMPLETED:
+        snapshot["response"] = job.result
+    return snapshot
+
+
+def publish_job(job: Job):
+    job_snapshots.set(job.id, job_snapshot(job))
+
+
+# Shared job queue running the health copilot graph
+job_queue = JobQueue(
+    runner=run_job,
+    workers=settings.job_workers,
+    max_depth=settings.job_queue_max_depth,
+    result_ttl_seconds=settings.job_result_ttl_seconds,
+    on_update=publish_job if settings.workers > 1 else None,
+)
+
+
+def _get_job_or_404(job_id: str) -> dict:
+    """Snapshot of a job run by this worker (live) or another worker (as last published)"""
+    job = job_queue.get(job_id)
+    snapshot: Optional[dict] = job_snapshot(job) if job is not None else None
+    if snapshot is None and settings.workers > 1:
+        snapshot = job_snapshots.get(job_id)
+    if snapshot is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} not found or expired"
+        )
+    return snapshot
+
+
+@router.post(
+    "/jobs",
+    response_model=JobSubmitResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(shed_when_unready)]
+)
+async def submit_analysis_job(
+    file: List[UploadFile] = File(..., description="Food label image(s); repeat for front/back/side panels"),
+    user_health_profile: str = File(..., description="User's health profile")
+):
+    """
+    Queue a food label analysis and return immediately with a job id
+
+    Poll `GET /api/v1/jobs/{job_id}` for status and fetch the analysis from
+    `GET /api/v1/jobs/{job_id}/result` once it has completed.
+    """
+
+    file_paths = []
+
+    try:
+        # Reject before touching the upload when we are already at capacity
+        job_queue.check_capacity()
+
+        file_paths = file_handler.save_upload_files(file)
+        inputs = label_inputs(file_paths, user_health_profile)
+        job = job_queue.submit(inputs, cleanup=lambda: file_handler.cleanup_files(file_paths))
+    except QueueFullError as e:
+        file_handler.cleanup_files(file_paths)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"{e}, please retry shortly",
+            headers={"Retry-After": "5"}
+        )
+
+    logger.info(f"Accepted analysis job {job.id} for files: {', '.join(f.filename for f in file)}")
+
+    return JobSubmitResponse(
+        job_id=job.id,
+        status=job.status.value,
+        status_url=f"/api/v1/jobs/{job.id}",
+        result_url=f"/api/v1/jobs/{job.id}/result"
+    )
+
+
+@router.get("/jobs/stats", response_model=JobQueueStatsResponse)
+async def get_job_queue_stats():
+    """Queue depth, worker utilisation and recent job timing averages"""
+    return JobQueueStatsResponse(**job_queue.stats())
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str):
+    """Get the status and timing of an analysis job"""
+    job = _get_job_or_404(job_id)
+
+    return JobStatusResponse(
+        job_id=job["job_id"],
+        status=job["status"],
+        created_at=job["created_at"],
+        timing=JobTimingResponse(**job["timing"]),
+        error=job["error"]
+    )
+
+
+@router.get("/jobs/{job_id}/result", response_model=HealthAnalysisResponse)
+async def get_job_result(job_id: str, request: Request):
+    """Fetch the analysis produced by a completed job"""
+    job = _get_job_or_404(job_id)
+
+    if job["status"] == JobStatus.FAILED:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Analysis failed: {job['error']}"
+        )
+    if job["status"] != JobStatus.COMPLETED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job is still {job['status']}"
+        )
+
+    # Validated once, when the job completed
+    return json_response(job["response"], request.headers.get("accept-encoding"))
@@ -0,0 +1,32 @@
+"""Metrics API routes"""
+
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+from app.services.governor import governor
+from app.services.resilience import circuit_breakers
+from app.utils.metrics import metrics
+
+router = APIRouter(prefix="/api/v1", tags=["metrics"])
+
+
+@router.get("/metrics")
+async def get_metrics(format: str = Query("json", description="json or prometheus")):
+    """
+    Export in-process metrics
+
+    Includes governor queue wait times per provider, current in-flight
+    and queued call counts, and the circuit breaker state per upstream host.
+    """
+    provider_stats = governor.stats()
+    circuits = circuit_breakers.states()
+
+    if format == "prometheus":
+        lines = [metrics.render_prometheus()]
+        for provider, stats in provider_stats.items():
+            lines.append(f'governor_in_flight{{provider="{provider}"}} {stats["in_flight"]}\n')
+            lines.append(f'governor_queued{{provider="{provider}"}} {stats["queued"]}\n')
+        for host, state in circuits.items():
+            lines.append(f'circuit_open{{host="{host}"}} {int(state != "closed")}\n')
+        return PlainTextResponse("".join(lines))
+
+    return {**metrics.snapshot(), "providers": provider_stats, "circuits": circuits}
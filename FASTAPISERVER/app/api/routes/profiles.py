@@ -0,0 +1,45 @@
+"""Saved request profile API routes"""
+
+import hmac
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import FileResponse
+from app.models.responses import ProfileInfoResponse
+from app.utils.profiling import list_profiles, profile_path
+from app.config.settings import settings
+
+router = APIRouter(prefix="/api/v1", tags=["profiles"])
+
+
+def require_profiling_token(x_profile_token: Optional[str] = Header(None)):
+    """Profiles expose code paths and timings: only serve them to holders of PROFILING_TOKEN"""
+    if not settings.profiling_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiling is disabled (set PROFILING_TOKEN)")
+    if not x_profile_token or not hmac.compare_digest(x_profile_token, settings.profiling_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid X-Profile-Token")
+
+
+@router.get("/profiles", response_model=List[ProfileInfoResponse], dependencies=[Depends(require_profiling_token)])
+async def get_profiles():
+    """
+    List saved request profiles, newest first
+
+    Only the newest PROFILE_KEEP are kept. Profiles live on the worker that
+    served the request.
+    """
+    return list_profiles()
+
+
+@router.get("/profiles/{name}", dependencies=[Depends(require_profiling_token)])
+async def download_profile(name: str):
+    """
+    Download a saved profile
+
+    `.speedscope.json` files open in https://www.speedscope.app; `.pstats`
+    files load with `python -m pstats` or snakeviz.
+    """
+    path = profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Profile {name} not found")
+    media_type = "application/json" if name.endswith(".json") else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=name)
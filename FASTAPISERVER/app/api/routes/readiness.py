@@ -0,0 +1,51 @@
+"""Readiness API route"""
+
+from datetime import datetime
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.api.routes.jobs import job_queue
+from app.services.analysis_engine import analysis_engine
+from app.services.governor import governor
+from app.services.readiness import readiness
+from app.config.settings import settings
+
+router = APIRouter(prefix="/api/v1", tags=["health-analysis"])
+
+
+@router.get("/ready")
+async def readiness_check():
+    """
+    Whether this worker should receive analysis traffic (200) or not (503)
+
+    Reads the background prober's latest results (Groq and Gemini keys, the
+    OpenFoodFacts and Wikipedia APIs, the shared cache) plus the live job
+    queue depth and engine warm-up state; nothing is called per request.
+    `unready` when Groq or Gemini is down or the job queue is full,
+    `starting` until the first probe round and the engine build finish,
+    `degraded` (still 200) when only enrichment sources or the cache fail.
+    """
+    report = readiness.report()
+    queue = job_queue.stats()
+    status, reasons = report["status"], report["reasons"]
+
+    if queue["queued"] >= queue["max_depth"]:
+        status = "unready"
+        reasons.append("job queue full")
+    if not analysis_engine.ready and analysis_engine.warmup_mode != "lazy" and status != "unready":
+        status = "starting"
+        reasons.append("analysis engine warming up")
+
+    ready = status in ("ready", "degraded")
+    body = {
+        **report,
+        "status": status,
+        "reasons": reasons,
+        "engine_ready": analysis_engine.ready,
+        "job_queue": {key: queue[key] for key in ("queued", "running", "max_depth")},
+        "providers": governor.stats(),
+        "timestamp": datetime.now().isoformat(),
+    }
+    headers = {"Cache-Control": "no-store"}
+    if not ready:
+        headers["Retry-After"] = str(max(1, int(settings.readiness_probe_interval_seconds)))
+    return JSONResponse(body, status_code=200 if ready else 503, headers=headers)
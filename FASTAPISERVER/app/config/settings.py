@@ -16,6 +16,7 @@ class Settings(BaseSettings):
     # Server Configuration
     host: str = "0.0.0.0"
     port: int = 8000
+    workers: int = 1  # Uvicorn worker processes (run.py); provider rate limits are split between them
     
     # Google AI Configuration
     google_api_key: str
@@ -24,6 +25,15 @@ class Settings(BaseSettings):
     
     # Groq Configuration (for Llama 3.2-11B Vision - FREE!)
     groq_api_key: str
+
+    # Model Routing (per-node Gemini models; empty = GEMINI_MODEL)
+    profiler_model: str = "gemini-2.5-flash-lite"  # Short rewrite of the user's health profile
+    research_model: str = ""
+    risk_model: str = ""
+    designer_model: str = ""
+    # Vision cascade: fast model first, stronger model only when its result fails validation (empty = no escalation)
+    vision_model: str = "meta-llama/llama-4-scout-17b-16e-instruct"
+    vision_escalation_model: str = "meta-llama/llama-4-maverick-17b-128e-instruct"
     
     # CORS Configuration  
     cors_origins_str: str = "http://localhost:3000,http://localhost:5173,http://localhost:5174,https://ingredisense-psi.vercel.app,https://ingredisense-1.onrender.com"
@@ -37,6 +47,7 @@ class Settings(BaseSettings):
     upload_dir: str = "uploads"
     max_file_size: int = 10 * 1024 * 1024  # 10MB
     allowed_extensions_str: str = "jpg,jpeg,png,webp"
+    max_label_images: int = 4  # Panels (front, back, side) accepted per analysis
     
     @property
     def allowed_extensions(self) -> set:
@@ -48,7 +59,104 @@ class Settings(BaseSettings):
     # Logging Configuration
     log_level: str = "INFO"
     log_file: str = "logs/app.log"
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_backup_count: int = 5
+    log_json_console: bool = False  # Console as JSON lines (the log file always is)
+    log_queue_size: int = 10000  # Records waiting for the writer thread; beyond this they are dropped
+    log_message_max_chars: int = 4000
+    log_payload_max_chars: int = 2000  # Per field of a log_payload() record
+    log_payload_sample_rate: float = 0.05  # Fraction of verbose payloads (raw model output) that are logged
+
+    # Tracing Configuration
+    trace_exporter: str = "jsonl"  # jsonl (TRACE_FILE), otlp (OTLP_ENDPOINT) or none
+    trace_file: str = "logs/traces.jsonl"
+    trace_file_max_bytes: int = 50 * 1024 * 1024  # Rotated to <file>.1 beyond this
+    otlp_endpoint: str = "http://127.0.0.1:4318/v1/traces"  # OTLP/HTTP JSON collector
+    trace_queue_size: int = 10000  # Finished spans waiting for export; beyond this they are dropped
+
+    # Response Configuration
+    response_compression_min_bytes: int = 1024  # Smaller JSON bodies are sent uncompressed
+    response_gzip_level: int = 6
+    response_brotli_quality: int = 5  # br is offered only when the Brotli package is installed
+
+    # Profiling Configuration
+    profiling_token: str = ""  # Enables the X-Profile header on /analyze and the /profiles endpoints
+    profile_sample_rate: float = 0.0  # Fraction of /analyze requests profiled without being asked
+    profile_mode: str = "sampling"  # sampling (speedscope JSON) or deterministic (cProfile pstats)
+    profile_sample_interval_ms: float = 5.0
+    profile_max_concurrent: int = 1  # Requests profiled at once per worker; others run unprofiled
+    profile_dir: str = "logs/profiles"
+    profile_keep: int = 50  # Newest profiles kept on disk
+
+    # Request Deadline Configuration
+    request_slo_seconds: float = 30.0  # Time budget per analysis; stages degrade as it runs low
+    request_timeout_seconds: float = 45.0  # Hard cap after which the API returns 504
+
+    # Startup: when LLM clients and graphs are built (eager = before serving, background, lazy = first request)
+    warmup_mode: str = "background"
+
+    # Label Extraction
+    label_extraction_max_attempts: int = 2  # 2 = one retry on a preprocessed image when the label is unreadable
     
+    # Executors (CPU-bound work and internal thread pools)
+    cpu_workers: int = 2  # Processes for image encoding and large JSON parsing; 0 = run inline
+    cpu_offload_min_bytes: int = 65536  # Smaller payloads are processed inline (cheaper than IPC)
+    llm_call_workers: int = 32  # Threads running time-boxed / streaming LLM calls
+    prefetch_workers: int = 16  # Threads for ingredient enrichment started during extraction
+    label_panel_workers: int = 8  # Threads reading the panels of a multi-image label
+
+    # Background Job Queue Configuration
+    job_workers: int = 2  # Concurrent graph runs
+    job_queue_max_depth: int = 20  # Pending jobs before new submissions are rejected
+    job_result_ttl_seconds: int = 900  # How long finished jobs stay retrievable
+
+    # Readiness Probes (/api/v1/ready)
+    readiness_probe_interval_seconds: float = 30.0  # Upstream and cache probes per worker; 0 = no probing
+    readiness_probe_timeout_seconds: float = 5.0
+    readiness_failure_threshold: int = 2  # Consecutive failed probes before a check counts as down
+    readiness_shed_load: bool = True  # Refuse analyses with 503 while Groq or Gemini is down
+
+    # Upstream Rate Limits (requests/min, tokens/min and max concurrent calls per provider)
+    groq_requests_per_minute: int = 30
+    groq_tokens_per_minute: int = 30000
+    groq_max_in_flight: int = 4
+    gemini_requests_per_minute: int = 60
+    gemini_tokens_per_minute: int = 1000000
+    gemini_max_in_flight: int = 8
+    openfoodfacts_requests_per_minute: int = 100
+    openfoodfacts_max_in_flight: int = 4
+    wikipedia_requests_per_minute: int = 300
+    wikipedia_max_in_flight: int = 10
+    governor_max_wait_seconds: float = 30.0  # Give up waiting for a provider slot after this
+
+    # Upstream Endpoints (point them at `python -m app.utils.upstream_standins` for load tests)
+    groq_base_url: str = "https://api.groq.com"
+    gemini_base_url: str = ""  # Empty = Google's endpoint over gRPC; a URL switches to the REST transport
+    wikipedia_base_url: str = "https://en.wikipedia.org"
+    openfoodfacts_base_url: str = "https://world.openfoodfacts.org"  # Product search
+    openfoodfacts_category_base_url: str = "https://in.openfoodfacts.org"  # Category pages for alternatives
+
+    # Circuit Breakers, Retries and Negative Caching (Wikipedia / OpenFoodFacts)
+    breaker_failure_threshold: int = 5  # Consecutive failures that open a host's circuit
+    breaker_open_seconds: float = 10.0  # First open period; doubles on each consecutive trip
+    breaker_max_open_seconds: float = 300.0
+    upstream_max_retries: int = 1
+    upstream_retry_base_delay: float = 0.2  # Backoff base (seconds), full jitter
+    upstream_retry_max_delay: float = 2.0
+    negative_cache_ttl_seconds: int = 86400  # How long known misses (e.g. Wikipedia 404s) are remembered
+    negative_cache_max_entries: int = 50000
+
+    # Shared Cache (extraction, ingredient and result caches, shared by all workers)
+    cache_url: str = "sqlite:///cache/ingredisense.sqlite3"  # memory://, sqlite:///path, http://host:port or a comma-separated list of stores; empty = off
+    cache_max_entries: int = 100000  # memory / SQLite backends
+    cache_timeout_seconds: float = 0.25  # Networked store calls; a slow store counts as a miss
+    cache_replicas: int = 2  # Stores holding each key when CACHE_URL lists several (reads fall back to the others)
+    cache_virtual_nodes: int = 160  # Hash ring points per store; more = more even spread
+    extraction_cache_ttl_seconds: int = 2592000  # Same label photos -> same extraction (30 days)
+    ingredient_cache_ttl_seconds: int = 604800  # Wikipedia summaries / OpenFoodFacts products (a week)
+    wikipedia_cache_max_entries: int = 20000  # Per-process summaries in front of the shared cache
+    result_cache_ttl_seconds: int = 86400  # Full analyses for an identical label + health profile
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,12 +1,44 @@
 """FastAPI main application"""
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
 from app.config.settings import settings
 from app.middleware.cors import add_cors_middleware
 from app.middleware.error_handler import add_exception_handlers
+from app.middleware.tracing import add_tracing_middleware
 from app.api.routes.health_analysis import router as health_router
+from app.api.routes.jobs import router as jobs_router, job_queue
+from app.api.routes.metrics import router as metrics_router
+from app.api.routes.profiles import router as profiles_router
+from app.api.routes.readiness import router as readiness_router
 from app.utils.logger import logger
+from app.utils.executors import executors
+from app.utils.tracing import tracer
+from app.services.analysis_engine import analysis_engine
+from app.services.readiness import readiness
+from app.services.shared_cache import close_cache_backend
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start workers and warm up the analysis engine; stop them on shutdown"""
+    logger.info(f"Starting {settings.app_name} v{settings.app_version}")
+    logger.info(f"Debug mode: {settings.debug}")
+    logger.info(f"CORS origins: {settings.cors_origins}")
+    executors.start()
+    await job_queue.start()
+    await analysis_engine.start()
+    await readiness.start()
+    yield
+    logger.info(f"Shutting down {settings.app_name}")
+    await readiness.stop()
+    await analysis_engine.stop()
+    await job_queue.stop()
+    executors.shutdown()
+    close_cache_backend()
+    tracer.shutdown()
+
 
 # Create FastAPI application
 app = FastAPI(
@@ -15,30 +47,22 @@ app = FastAPI(
     description="AI-powered food label analysis and health risk assessment API",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
-# Add middleware
+# Add middleware (tracing last, so it wraps CORS and times the whole request)
 add_cors_middleware(app)
+add_tracing_middleware(app)
 
 # Add exception handlers
 add_exception_handlers(app)
 
 # Include routers
 app.include_router(health_router)
-
-
-@app.on_event("startup")
-async def startup_event():
-    """Run on application startup"""
-    logger.info(f"Starting {settings.app_name} v{settings.app_version}")
-    logger.info(f"Debug mode: {settings.debug}")
-    logger.info(f"CORS origins: {settings.cors_origins}")
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Run on application shutdown"""
-    logger.info(f"Shutting down {settings.app_name}")
+app.include_router(jobs_router)
+app.include_router(metrics_router)
+app.include_router(profiles_router)
+app.include_router(readiness_router)
 
 
 @app.get("/", tags=["root"])
@@ -48,7 +72,8 @@ async def root():
         "message": f"Welcome to {settings.app_name}",
         "version": settings.app_version,
         "docs": "/docs",
-        "health": "/api/v1/health"
+        "health": "/api/v1/health",
+        "ready": "/api/v1/ready"
     })
 
 
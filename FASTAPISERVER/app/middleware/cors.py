@@ -13,6 +13,7 @@ def add_cors_middleware(app):
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Trace-Id"],
     )
     
     return app
@@ -32,7 +32,8 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException):
             "success": False,
             "error": exc.detail,
             "detail": None
-        }
+        },
+        headers=getattr(exc, "headers", None)
     )
 
 
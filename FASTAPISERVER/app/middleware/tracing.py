@@ -0,0 +1,40 @@
+"""Trace id per HTTP request: a root span, the X-Trace-Id response header and log correlation"""
+
+from app.utils.request_context import new_request_id
+from app.utils.tracing import span
+
+TRACE_HEADER = "X-Trace-Id"
+
+
+class TracingMiddleware:
+    """
+    Binds a trace id (the caller's X-Trace-Id if it is 32 hex chars, else a
+    new one) as the request id and wraps the request in a root span that
+    ends when the last body chunk is sent, so streamed responses are timed
+    in full.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        incoming = dict(scope.get("headers") or []).get(TRACE_HEADER.lower().encode())
+        trace_id = new_request_id(incoming.decode("latin-1") if incoming else None)
+
+        with span(f"{scope['method']} {scope['path']}", method=scope["method"], path=scope["path"]) as root:
+            async def send_with_trace_id(message):
+                if message["type"] == "http.response.start":
+                    root.set(status_code=message["status"])
+                    message["headers"] = [*message.get("headers", []), (TRACE_HEADER.lower().encode(), trace_id.encode())]
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace_id)
+
+
+def add_tracing_middleware(app):
+    """Add request tracing to the FastAPI application (register it last so it runs outermost)"""
+    app.add_middleware(TracingMiddleware)
+    return app
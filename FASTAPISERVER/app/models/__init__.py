@@ -1,7 +1,16 @@
 """Pydantic models module"""
 
 from .requests import HealthAnalysisRequest, URLAnalysisRequest
-from .responses import HealthAnalysisResponse, ErrorResponse, IngredientProfileResponse
+from .responses import (
+    HealthAnalysisResponse,
+    ErrorResponse,
+    IngredientProfileResponse,
+    DecisionResponse,
+    ConflictResponse,
+    JobSubmitResponse,
+    JobStatusResponse,
+    JobQueueStatsResponse,
+)
 
 __all__ = [
     "HealthAnalysisRequest",
@@ -9,4 +18,9 @@ __all__ = [
     "HealthAnalysisResponse",
     "ErrorResponse",
     "IngredientProfileResponse",
+    "DecisionResponse",
+    "ConflictResponse",
+    "JobSubmitResponse",
+    "JobStatusResponse",
+    "JobQueueStatsResponse",
 ]
@@ -14,6 +14,28 @@ class IngredientProfileResponse(BaseModel):
     nova_score: int = Field(..., description="NOVA processing score (1-4)")
 
 
+class DecisionResponse(BaseModel):
+    """Quick Decision computed by the local scoring engine"""
+    
+    level: str = Field(..., description="safe, moderate, concerns or skip")
+    color: str = Field(..., description="Hex color for the Quick Decision")
+    verdict: str = Field(..., description="Short verdict sentence")
+    score: float = Field(..., description="Weighted nutrient/processing score (higher is worse)")
+    reasons: List[str] = Field(default_factory=list, description="Flags behind the verdict")
+    traffic_lights: Dict[str, str] = Field(default_factory=dict, description="green/amber/red per nutrient")
+    basis: str = Field(..., description="per_100g, per_serving, ingredients or none")
+
+
+class ConflictResponse(BaseModel):
+    """Allergen, diet or nutrient-limit conflict found by the rule-based pre-screen"""
+    
+    kind: str = Field(..., description="allergen, diet or nutrient")
+    subject: str = Field(..., description="Canonical ingredient group or nutrient")
+    ingredient: str = Field(..., description="Label text that triggered the conflict")
+    severity: str = Field(..., description="hard (forces a Skip verdict) or soft")
+    message: str = Field(..., description="Human-readable explanation")
+
+
 class HealthAnalysisResponse(BaseModel):
     """Complete health analysis response"""
     
@@ -33,7 +55,23 @@ class HealthAnalysisResponse(BaseModel):
     )
     decision_color: Optional[str] = Field(
         None,
-        description="Hex color for Quick Decision section (green=#22C55E, yellow=#EAB308, red=#EF4444)"
+        description="Hex color for Quick Decision section (green=#22C55E, yellow=#EAB308, orange=#F97316, red=#EF4444, gray=#6B7280 when unreadable)"
+    )
+    decision: Optional[DecisionResponse] = Field(
+        None,
+        description="Deterministic Quick Decision from label nutrition and NOVA scores (source of decision_color)"
+    )
+    conflicts: List[ConflictResponse] = Field(
+        default_factory=list,
+        description="Pre-screen conflicts between the label and the user's allergies, diet and nutrient limits"
+    )
+    degraded_stages: List[str] = Field(
+        default_factory=list,
+        description="Pipeline stages that fell back to degraded mode to meet the time budget"
+    )
+    extraction_status: str = Field(
+        "ok",
+        description="Label read quality: ok, low_confidence or unreadable (analysis is skipped unless ok)"
     )
     
     class Config:
@@ -82,3 +120,56 @@ class HealthCheckResponse(BaseModel):
     status: str = Field("healthy", description="Service status")
     version: str = Field(..., description="API version")
     timestamp: str = Field(..., description="Current server time")
+
+
+class JobTimingResponse(BaseModel):
+    """Timing breakdown for a background job"""
+    
+    queue_wait_seconds: float = Field(..., description="Time spent waiting for a worker")
+    run_seconds: Optional[float] = Field(None, description="Time spent running the analysis")
+    total_seconds: float = Field(..., description="Time since the job was submitted")
+
+
+class JobSubmitResponse(BaseModel):
+    """Response returned when an analysis job is accepted"""
+    
+    success: bool = Field(True, description="Whether the job was queued")
+    job_id: str = Field(..., description="Identifier used to poll the job")
+    status: str = Field(..., description="Current job status")
+    status_url: str = Field(..., description="URL to poll for job status")
+    result_url: str = Field(..., description="URL to fetch the finished analysis")
+
+
+class JobStatusResponse(BaseModel):
+    """Status of a background analysis job"""
+    
+    success: bool = Field(True, description="Whether the lookup succeeded")
+    job_id: str = Field(..., description="Job identifier")
+    status: str = Field(..., description="queued, running, completed or failed")
+    created_at: str = Field(..., description="Submission time")
+    timing: JobTimingResponse = Field(..., description="Job timing stats")
+    error: Optional[str] = Field(None, description="Failure reason if the job failed")
+
+
+class JobQueueStatsResponse(BaseModel):
+    """Aggregate job queue statistics"""
+    
+    workers: int = Field(..., description="Size of the worker pool")
+    max_depth: int = Field(..., description="Pending jobs allowed before rejecting submissions")
+    queued: int = Field(..., description="Jobs waiting for a worker")
+    running: int = Field(..., description="Jobs currently running")
+    completed: int = Field(..., description="Jobs completed since startup")
+    failed: int = Field(..., description="Jobs failed since startup")
+    rejected: int = Field(..., description="Submissions rejected because the queue was full")
+    avg_queue_wait_seconds: Optional[float] = Field(None, description="Mean queue wait of recent jobs")
+    avg_run_seconds: Optional[float] = Field(None, description="Mean run time of recent jobs")
+
+
+class ProfileInfoResponse(BaseModel):
+    """A saved request profile"""
+    
+    name: str = Field(..., description="File name, used to download the profile")
+    trace_id: str = Field(..., description="Trace id of the profiled request")
+    mode: str = Field(..., description="sampling (speedscope JSON) or deterministic (pstats)")
+    size_bytes: int = Field(..., description="File size")
+    created_at: float = Field(..., description="When the profile was saved (Unix time)")
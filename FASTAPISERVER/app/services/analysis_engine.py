@@ -0,0 +1,82 @@
+"""Lazily built Gemini client and health copilot graphs"""
+
+import asyncio
+import threading
+import time
+from typing import FrozenSet, Optional
+from app.config.settings import settings
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+
+WARMUP_MODES = ("eager", "background", "lazy")
+
+
+class AnalysisEngine:
+    """
+    Owns the LLM clients and compiled graphs, built on first use.
+
+    Importing LangChain, LangGraph and the provider SDKs and compiling the
+    graph take seconds, so none of it happens at import time: the app can
+    answer `/api/v1/health` while `start` builds them per `warmup_mode`
+    ("eager" blocks startup, "background" builds in a thread, "lazy" waits for
+    the first analysis).
+    """
+
+    def __init__(self, warmup_mode: str = "background"):
+        if warmup_mode not in WARMUP_MODES:
+            logger.warning(f"Unknown WARMUP_MODE {warmup_mode!r}, using 'background'")
+            warmup_mode = "background"
+        self.warmup_mode = warmup_mode
+        self._graphs = None
+        self._lock = threading.Lock()
+        self._warmup_task: Optional[asyncio.Future] = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether the clients and graphs have been built"""
+        return self._graphs is not None
+
+    def graphs(self):
+        """The shared HealthCopilotGraphs, building the Gemini client and agent nodes on first call"""
+        if self._graphs is not None:
+            return self._graphs
+        with self._lock:
+            if self._graphs is None:
+                start = time.monotonic()
+                from app.services.health_agent import HealthCopilotGraphs
+                from app.services.health_agent.routing import chat_model
+
+                self._graphs = HealthCopilotGraphs(chat_model(settings.gemini_model))
+                elapsed = time.monotonic() - start
+                metrics.observe("engine_build_seconds", elapsed)
+                logger.info(f"Analysis engine built in {elapsed:.2f}s")
+            return self._graphs
+
+    def get(self, fields: Optional[FrozenSet[str]] = None):
+        """Compiled graph for `fields` (see HealthCopilotGraphs.get)"""
+        return self.graphs().get(fields)
+
+    def warm_up(self):
+        """Build the clients and compile the full graph, which most requests use (blocking)"""
+        try:
+            self.get(None)
+        except Exception as e:
+            # The first request retries the build and reports the error
+            logger.error(f"Analysis engine warm-up failed: {e}", exc_info=True)
+
+    async def start(self):
+        """Warm up according to `warmup_mode`"""
+        if self.warmup_mode == "eager":
+            await asyncio.to_thread(self.warm_up)
+        elif self.warmup_mode == "background":
+            self._warmup_task = asyncio.ensure_future(asyncio.to_thread(self.warm_up))
+
+    async def stop(self):
+        """Wait for an unfinished background warm-up so shutdown doesn't interrupt a build"""
+        if self._warmup_task is not None and not self._warmup_task.done():
+            await self._warmup_task
+        self._warmup_task = None
+
+
+# Global analysis engine shared by every route
+analysis_engine = AnalysisEngine(settings.warmup_mode)
@@ -0,0 +1,13 @@
+"""Cache backends shared across worker processes"""
+
+from .backends import CacheBackend, MemoryBackend, SQLiteBackend, RemoteBackend, create_backend
+
+__all__ = ["CacheBackend", "MemoryBackend", "SQLiteBackend", "RemoteBackend", "ShardedBackend", "create_backend"]
+
+
+def __getattr__(name: str):
+    # Sharding logs through the app logger (which reads settings); the stand-in server must not need it
+    if name == "ShardedBackend":
+        from .sharded import ShardedBackend
+        return ShardedBackend
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
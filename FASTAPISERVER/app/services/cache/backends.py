@@ -0,0 +1,259 @@
+"""Key-value cache backends: in-process, SQLite file and a networked store"""
+
+import base64
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import quote, urlparse
+
+
+class CacheBackend(ABC):
+    """
+    Byte-valued store with per-entry TTL, shared by whoever points at the same
+    location. Implementations may raise on I/O errors; callers treat that as a miss.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Value for `key`, or None if missing or expired"""
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl_seconds: float):
+        """Store `value` under `key` for `ttl_seconds`"""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Remove `key` if present"""
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """Values of the `keys` that are present (backends override this with one round trip)"""
+        values = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                values[key] = value
+        return values
+
+    def close(self):
+        """Release connections"""
+
+
+class MemoryBackend(CacheBackend):
+    """Bounded LRU dict in this process (one copy per worker; the networked store's stand-in uses it too)"""
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl_seconds: float):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    One SQLite file in WAL mode shared by every worker process on the host.
+
+    WAL lets readers run alongside the single writer, so lookups from all
+    workers proceed in parallel; each thread keeps its own connection.
+    Expired rows are purged (and the table trimmed to `max_entries`) every
+    `PURGE_EVERY` writes.
+    """
+
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL) WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; wait up to 5s for another worker's write lock
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl_seconds: float):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, sqlite3.Binary(value), time.time() + ttl_seconds)
+        )
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.PURGE_EVERY == 0
+        if purge:
+            self.purge()
+
+    def delete(self, key: str):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        keys = list(dict.fromkeys(keys))
+        values = {}
+        conn, now = self._conn(), time.time()
+        # SQLite caps bound parameters; 500 is well under every build's limit
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows = conn.execute(
+                f"SELECT key, value FROM cache WHERE key IN ({','.join('?' * len(batch))}) AND expires_at > ?",
+                (*batch, now)
+            )
+            values.update((key, bytes(value)) for key, value in rows)
+        return values
+
+    def purge(self):
+        """Drop expired rows, then the soonest-expiring rows beyond `max_entries`"""
+        conn = self._conn()
+        conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        excess = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at LIMIT ?)", (excess,)
+            )
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+class RemoteBackend(CacheBackend):
+    """
+    Networked store spoken to over HTTP, for caches shared across hosts:
+    `GET` / `PUT` / `DELETE {base_url}/v1/cache/{key}` with the TTL as a
+    `ttl` query parameter (a 404 is a miss), and `POST {base_url}/v1/mget`
+    with `{"keys": [...]}` returning `{key: base64 value}` for the hits.
+    `python -m app.services.cache.server` runs a local stand-in.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 0.25):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            import requests
+
+            session = self._local.session = requests.Session()
+        return session
+
+    def _url(self, key: str) -> str:
+        return f"{self.base_url}/v1/cache/{quote(key, safe='')}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        response = self._session().get(self._url(key), timeout=self.timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.content
+
+    def set(self, key: str, value: bytes, ttl_seconds: float):
+        response = self._session().put(
+            self._url(key), data=value, params={"ttl": ttl_seconds}, timeout=self.timeout
+        )
+        response.raise_for_status()
+
+    def delete(self, key: str):
+        self._session().delete(self._url(key), timeout=self.timeout).raise_for_status()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        response = self._session().post(f"{self.base_url}/v1/mget", json={"keys": keys}, timeout=self.timeout)
+        response.raise_for_status()
+        return {key: base64.b64decode(value) for key, value in response.json().items()}
+
+    def close(self):
+        session = getattr(self._local, "session", None)
+        if session is not None:
+            session.close()
+
+
+def create_backend(
+    url: str,
+    max_entries: int = 100000,
+    timeout: float = 0.25,
+    replicas: int = 2,
+    virtual_nodes: int = 160
+) -> CacheBackend:
+    """
+    Backend for a cache URL: `memory://`, `sqlite:///relative/path.db`,
+    `sqlite:////absolute/path.db`, `http(s)://host:port` (networked store), or
+    several comma-separated store URLs (sharded across them by consistent hashing,
+    each key kept on `replicas` of them)
+    """
+    if "," in url:
+        from .sharded import ShardedBackend
+
+        peers = [peer.strip() for peer in url.split(",") if peer.strip()]
+        return ShardedBackend(
+            {peer: create_backend(peer, max_entries, timeout) for peer in peers},
+            replicas=replicas,
+            virtual_nodes=virtual_nodes
+        )
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        return MemoryBackend(max_entries)
+    if parsed.scheme == "sqlite":
+        path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else ""
+        if not path:
+            raise ValueError(f"SQLite cache URL needs a file path: {url!r}")
+        return SQLiteBackend(path, max_entries)
+    if parsed.scheme in ("http", "https"):
+        return RemoteBackend(url, timeout)
+    raise ValueError(f"Unsupported cache URL {url!r} (use memory://, sqlite:///path or http://host:port)")
@@ -0,0 +1,107 @@
+"""
+Local stand-in for the networked cache store (the `RemoteBackend` protocol over a MemoryBackend)
+
+    python -m app.services.cache.server --port 6390
+    CACHE_URL=http://127.0.0.1:6390 python run.py --workers 4
+"""
+
+import argparse
+import base64
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, unquote, urlparse
+from app.services.cache.backends import MemoryBackend
+
+KEY_PREFIX = "/v1/cache/"
+
+
+def make_handler(store: MemoryBackend):
+    class CacheRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, so clients reuse connections
+        disable_nagle_algorithm = True  # Headers and body go out as separate writes
+
+        def _key(self) -> Optional[str]:
+            path = urlparse(self.path).path
+            if not path.startswith(KEY_PREFIX) or len(path) == len(KEY_PREFIX):
+                self._reply(404)
+                return None
+            return unquote(path[len(KEY_PREFIX):])
+
+        def _reply(self, status: int, body: bytes = b""):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/v1/health":
+                return self._reply(200, b"ok")
+            key = self._key()
+            if key is not None:
+                value = store.get(key)
+                if value is None:
+                    self._reply(404)
+                else:
+                    self._reply(200, value)
+
+        def do_PUT(self):
+            key = self._key()
+            if key is None:
+                return
+            value = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                ttl = float(parse_qs(urlparse(self.path).query).get("ttl", ["3600"])[0])
+            except ValueError:
+                return self._reply(400, b"invalid ttl")
+            store.set(key, value, ttl)
+            self._reply(204)
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/v1/mget":
+                return self._reply(404)
+            try:
+                keys = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))["keys"]
+            except (ValueError, KeyError, TypeError):
+                return self._reply(400, b"expected {\"keys\": [...]}")
+            hits = {key: base64.b64encode(value).decode("ascii") for key, value in store.get_many(keys).items()}
+            self._reply(200, json.dumps(hits).encode("utf-8"))
+
+        def do_DELETE(self):
+            key = self._key()
+            if key is not None:
+                store.delete(key)
+                self._reply(204)
+
+        def log_message(self, format, *args):
+            pass  # One line per cache call would drown everything else
+
+    return CacheRequestHandler
+
+
+def serve(host: str = "127.0.0.1", port: int = 6390, max_entries: int = 100000) -> ThreadingHTTPServer:
+    """The stand-in, bound but not yet serving; call `serve_forever()` (or run it in a thread)"""
+    server = ThreadingHTTPServer((host, port), make_handler(MemoryBackend(max_entries)))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    parser.add_argument("--max-entries", type=int, default=100000)
+    args = parser.parse_args()
+    server = serve(args.host, args.port, args.max_entries)
+    print(f"Cache stand-in listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
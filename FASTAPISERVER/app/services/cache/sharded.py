@@ -0,0 +1,159 @@
+"""Consistent-hash sharding of one logical cache over several peer cache nodes"""
+
+import bisect
+import concurrent.futures
+import hashlib
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+from app.utils.logger import logger
+from .backends import CacheBackend
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Consistent-hash ring with `virtual_nodes` points per node, so keys spread
+    evenly and adding or removing a node moves only ~1/N of them.
+    """
+
+    def __init__(self, nodes: Iterable[str], virtual_nodes: int = 160):
+        self.nodes = list(dict.fromkeys(nodes))
+        if not self.nodes:
+            raise ValueError("A hash ring needs at least one node")
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(virtual_nodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def nodes_for(self, key: str, count: int = 1) -> List[str]:
+        """The first `count` distinct nodes clockwise from the key: its primary, then its replicas"""
+        count = min(count, len(self.nodes))
+        start = bisect.bisect(self._hashes, _hash(key))
+        found: List[str] = []
+        for i in range(len(self._owners)):
+            node = self._owners[(start + i) % len(self._owners)]
+            if node not in found:
+                found.append(node)
+                if len(found) == count:
+                    break
+        return found
+
+
+class ShardedBackend(CacheBackend):
+    """
+    One cache spread over peer nodes by consistent hashing.
+
+    Each key is written to its primary node and `replicas - 1` successors.
+    Reads go to the first healthy owner; a peer that errors is skipped for
+    `retry_after_seconds` and its keys are read from the next replica, so
+    losing a node costs neither errors nor (with replicas >= 2) hit rate.
+    `get_many` groups keys by owner and asks every node once, in parallel.
+    """
+
+    def __init__(
+        self,
+        peers: Dict[str, CacheBackend],
+        replicas: int = 2,
+        virtual_nodes: int = 160,
+        retry_after_seconds: float = 5.0
+    ):
+        self.peers = dict(peers)
+        self.replicas = max(1, min(replicas, len(self.peers)))
+        self.ring = HashRing(self.peers, virtual_nodes)
+        self.retry_after_seconds = retry_after_seconds
+        self._down_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(2, len(self.peers)), thread_name_prefix="cache-peer"
+        )
+
+    def _healthy(self, node: str) -> bool:
+        with self._lock:
+            return self._down_until.get(node, 0.0) <= time.monotonic()
+
+    def _mark_down(self, node: str, error: Exception):
+        with self._lock:
+            already_down = self._down_until.get(node, 0.0) > time.monotonic()
+            self._down_until[node] = time.monotonic() + self.retry_after_seconds
+        if not already_down:
+            logger.warning(f"Cache peer {node} failed ({error}); using replicas for {self.retry_after_seconds:.0f}s")
+
+    def _mark_up(self, node: str):
+        if node in self._down_until:
+            with self._lock:
+                self._down_until.pop(node, None)
+
+    def _owners(self, key: str) -> List[str]:
+        """Owners of a key, healthy ones first (down ones are still tried last)"""
+        owners = self.ring.nodes_for(key, self.replicas)
+        return sorted(owners, key=lambda node: not self._healthy(node))
+
+    def get(self, key: str) -> Optional[bytes]:
+        error: Optional[Exception] = None
+        for node in self._owners(key):
+            try:
+                value = self.peers[node].get(key)
+            except Exception as e:
+                self._mark_down(node, e)
+                error = e
+                continue
+            self._mark_up(node)
+            return value
+        if error is not None:
+            raise error
+        return None
+
+    def set(self, key: str, value: bytes, ttl_seconds: float):
+        written, error = 0, None
+        for node in self.ring.nodes_for(key, self.replicas):
+            if not self._healthy(node):
+                continue
+            try:
+                self.peers[node].set(key, value, ttl_seconds)
+                written += 1
+            except Exception as e:
+                self._mark_down(node, e)
+                error = e
+        if not written and error is not None:
+            raise error
+
+    def delete(self, key: str):
+        for node in self.ring.nodes_for(key, self.replicas):
+            try:
+                self.peers[node].delete(key)
+            except Exception as e:
+                self._mark_down(node, e)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        values: Dict[str, bytes] = {}
+        # Each key's owners in preference order; a failed node passes its keys to the next owner
+        pending = {key: self._owners(key) for key in dict.fromkeys(keys)}
+        while pending:
+            by_node: Dict[str, List[str]] = defaultdict(list)
+            for key, owners in pending.items():
+                by_node[owners[0]].append(key)
+            futures = {
+                node: self._pool.submit(self.peers[node].get_many, node_keys)
+                for node, node_keys in by_node.items()
+            }
+            retry = {}
+            for node, future in futures.items():
+                try:
+                    values.update(future.result())
+                    self._mark_up(node)
+                except Exception as e:
+                    self._mark_down(node, e)
+                    for key in by_node[node]:
+                        if len(pending[key]) > 1:
+                            retry[key] = pending[key][1:]
+            pending = retry
+        return values
+
+    def close(self):
+        for peer in self.peers.values():
+            peer.close()
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,144 @@
+"""
+In-process fake cache cluster for exercising sharding and failover without real peers
+
+The checks below run with `python -m app.services.cache.testing`.
+
+Keys spread evenly over the ring:
+
+>>> cluster = FakeCacheCluster(3)
+>>> backend = cluster.backend(replicas=1)
+>>> keys = [f"key-{i}" for i in range(3000)]
+>>> for key in keys:
+...     backend.set(key, b"v", 60)
+>>> all(800 < entries < 1200 for entries in cluster.distribution().values())
+True
+
+With two replicas, reads survive a failed node and it is tried again after
+`retry_after_seconds`:
+
+>>> cluster = FakeCacheCluster(3)
+>>> backend = cluster.backend(replicas=2, retry_after_seconds=0.05)
+>>> for key in keys[:300]:
+...     backend.set(key, key.encode(), 60)
+>>> cluster.fail("node-1")
+>>> all(backend.get(key) == key.encode() for key in keys[:300])
+True
+>>> cluster.recover("node-1")
+>>> time.sleep(0.1)
+>>> before = cluster.peers["node-1"].calls["get"]
+>>> all(backend.get(key) == key.encode() for key in keys[:300])
+True
+>>> cluster.peers["node-1"].calls["get"] > before
+True
+
+Adding a node moves only about a quarter of the keys, all onto the new node:
+
+>>> old = cluster.backend(replicas=1)
+>>> cluster.add_node()
+'node-3'
+>>> new = cluster.backend(replicas=1)
+>>> moved = [key for key in keys if old.ring.nodes_for(key) != new.ring.nodes_for(key)]
+>>> 0.15 < len(moved) / len(keys) < 0.35, {new.ring.nodes_for(key)[0] for key in moved}
+(True, {'node-3'})
+
+`get_many` asks each node once, and still answers with a node down:
+
+>>> cluster = FakeCacheCluster(3)
+>>> backend = cluster.backend(replicas=2)
+>>> for key in keys[:300]:
+...     backend.set(key, b"v", 60)
+>>> len(backend.get_many(keys[:300])), [peer.calls["get_many"] for peer in cluster.peers.values()]
+(300, [1, 1, 1])
+>>> cluster.fail("node-0")
+>>> len(backend.get_many(keys[:300]))
+300
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, Optional
+from .backends import CacheBackend, MemoryBackend
+from .sharded import ShardedBackend
+
+
+class PeerDown(ConnectionError):
+    """Raised by a FakePeer that has been taken down"""
+
+
+class FakePeer(CacheBackend):
+    """A MemoryBackend node that counts round trips and can be taken down and brought back"""
+
+    def __init__(self, name: str, max_entries: int = 100000):
+        self.name = name
+        self.store = MemoryBackend(max_entries)
+        self.down = False
+        self.calls: Dict[str, int] = {"get": 0, "set": 0, "delete": 0, "get_many": 0}
+        self._lock = threading.Lock()
+
+    def _call(self, op: str):
+        with self._lock:
+            self.calls[op] += 1
+        if self.down:
+            raise PeerDown(f"{self.name} is down")
+
+    def get(self, key: str) -> Optional[bytes]:
+        self._call("get")
+        return self.store.get(key)
+
+    def set(self, key: str, value: bytes, ttl_seconds: float):
+        self._call("set")
+        self.store.set(key, value, ttl_seconds)
+
+    def delete(self, key: str):
+        self._call("delete")
+        self.store.delete(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        self._call("get_many")
+        return self.store.get_many(keys)
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+
+class FakeCacheCluster:
+    """
+    `nodes` FakePeers behind a ShardedBackend:
+
+        cluster = FakeCacheCluster(3)
+        backend = cluster.backend(replicas=2)
+        cluster.fail("node-1")      # reads fall back to replicas
+        cluster.add_node()          # a bigger ring over the same peers
+    """
+
+    def __init__(self, nodes: int = 3):
+        self.peers: Dict[str, FakePeer] = {}
+        for _ in range(nodes):
+            self.add_node()
+
+    def add_node(self) -> str:
+        name = f"node-{len(self.peers)}"
+        self.peers[name] = FakePeer(name)
+        return name
+
+    def backend(self, replicas: int = 2, virtual_nodes: int = 160, retry_after_seconds: float = 5.0) -> ShardedBackend:
+        """A client over the current peers (call again after `add_node`, as a redeploy would)"""
+        return ShardedBackend(dict(self.peers), replicas, virtual_nodes, retry_after_seconds)
+
+    def fail(self, name: str):
+        self.peers[name].down = True
+
+    def recover(self, name: str):
+        self.peers[name].down = False
+
+    def distribution(self) -> Dict[str, int]:
+        """Entries held by each peer"""
+        return {name: len(peer) for name, peer in self.peers.items()}
+
+    def round_trips(self) -> Dict[str, int]:
+        return {name: sum(peer.calls.values()) for name, peer in self.peers.items()}
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
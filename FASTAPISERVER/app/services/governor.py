@@ -0,0 +1,425 @@
+"""Per-provider rate limiting and concurrency governor for upstream calls"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import queue
+import threading
+import time
+from collections import deque, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional
+from app.config.settings import settings
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+from app.utils.executors import executors
+from app.utils.request_context import get_request_id
+from app.utils.tracing import current_span, span
+
+
+class GovernorTimeout(Exception):
+    """Raised when a call waits (or runs) longer than its allowed budget"""
+
+
+# Runs time-boxed LLM calls so the caller can stop waiting on them
+_call_executor = executors.thread_pool("governor-call", settings.llm_call_workers)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for budget accounting"""
+    return max(1, len(text) // 4)
+
+
+@dataclass
+class ProviderLimits:
+    """Quota for one upstream provider"""
+    requests_per_minute: float
+    tokens_per_minute: Optional[float] = None
+    max_in_flight: int = 4
+
+    def per_worker(self, workers: int) -> "ProviderLimits":
+        """This quota split between `workers` processes that each run their own governor"""
+        if workers <= 1:
+            return self
+        return ProviderLimits(
+            requests_per_minute=self.requests_per_minute / workers,
+            tokens_per_minute=self.tokens_per_minute / workers if self.tokens_per_minute else None,
+            max_in_flight=max(1, self.max_in_flight // workers),
+        )
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at rate_per_minute"""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta: float):
+        """Debit (positive) or credit (negative) tokens after the fact"""
+        self.level = min(self.capacity, self.level - delta)
+
+
+class _Waiter:
+    __slots__ = ("key", "tokens", "enqueued")
+
+    def __init__(self, key: str, tokens: int):
+        self.key = key
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+
+
+class _ProviderState:
+    """Buckets, in-flight count and per-request FIFO queues for one provider"""
+
+    def __init__(self, name: str, limits: ProviderLimits):
+        self.name = name
+        self.limits = limits
+        self.requests = TokenBucket(limits.requests_per_minute)
+        self.tokens = TokenBucket(limits.tokens_per_minute) if limits.tokens_per_minute else None
+        self.in_flight = 0
+        # Round-robin over request keys; each key has its own FIFO of waiters
+        self.queues: "OrderedDict[str, deque]" = OrderedDict()
+
+    def enqueue(self, waiter: _Waiter):
+        self.queues.setdefault(waiter.key, deque()).append(waiter)
+
+    def head(self) -> Optional[_Waiter]:
+        for queue in self.queues.values():
+            return queue[0]
+        return None
+
+    def pop_head(self):
+        key, queue = next(iter(self.queues.items()))
+        queue.popleft()
+        # Rotate the served request to the back so other requests get a turn
+        del self.queues[key]
+        if queue:
+            self.queues[key] = queue
+
+    def remove(self, waiter: _Waiter):
+        queue = self.queues.get(waiter.key)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self.queues[waiter.key]
+
+    def admit_wait(self, waiter: _Waiter, now: float) -> Optional[float]:
+        """0 if the waiter can go now, seconds to wait for buckets, or None if blocked on concurrency"""
+        if self.in_flight >= self.limits.max_in_flight:
+            return None
+        wait = self.requests.wait_time(1, now)
+        if self.tokens is not None and waiter.tokens:
+            wait = max(wait, self.tokens.wait_time(waiter.tokens, now))
+        return wait
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self.queues.values())
+
+
+class Permit:
+    """A granted provider slot; release it (or use as a context manager) when the call ends"""
+
+    def __init__(self, governor: "ProviderGovernor", provider: str, tokens: int):
+        self.governor = governor
+        self.provider = provider
+        self.tokens = tokens
+        self._released = False
+
+    def settle(self, actual_tokens: Optional[int]):
+        """Reconcile the token estimate with the provider-reported usage"""
+        if actual_tokens is not None:
+            self.governor._adjust_tokens(self.provider, actual_tokens - self.tokens)
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.governor._release(self.provider)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class ProviderGovernor:
+    """
+    Central admission control for upstream providers.
+
+    Each provider gets a requests/min bucket, an optional tokens/min bucket and
+    a max in-flight limit. Waiting calls are served round-robin across request
+    ids so one large analysis cannot starve the others.
+    """
+
+    def __init__(self, limits: Dict[str, ProviderLimits], max_wait_seconds: float):
+        self.max_wait_seconds = max_wait_seconds
+        self._cond = threading.Condition()
+        self._providers = {name: _ProviderState(name, lim) for name, lim in limits.items()}
+
+    def acquire(self, provider: str, tokens: int = 0, timeout: Optional[float] = None) -> Permit:
+        """Block until the provider admits one call costing `tokens`"""
+        state = self._providers.get(provider)
+        if state is None:
+            return Permit(self, provider, 0)
+
+        timeout = self.max_wait_seconds if timeout is None else timeout
+        waiter = _Waiter(get_request_id(), tokens)
+        deadline = waiter.enqueued + timeout
+
+        with self._cond:
+            state.enqueue(waiter)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if state.head() is waiter:
+                        wait = state.admit_wait(waiter, now)
+                        if wait == 0:
+                            state.pop_head()
+                            state.requests.take(1)
+                            if state.tokens is not None and tokens:
+                                state.tokens.take(tokens)
+                            state.in_flight += 1
+                            break
+                    remaining = deadline - now
+                    # Fail fast when the buckets cannot refill before the deadline
+                    if remaining <= 0 or (wait and wait > remaining):
+                        state.remove(waiter)
+                        metrics.increment("governor_timeouts_total", labels={"provider": provider})
+                        raise GovernorTimeout(f"Timed out waiting {timeout:.1f}s for a {provider} slot")
+                    self._cond.wait(min(remaining, wait) if wait else remaining)
+            finally:
+                # Let the next head re-check admission
+                self._cond.notify_all()
+
+        queue_wait = time.monotonic() - waiter.enqueued
+        metrics.observe("governor_queue_wait_seconds", queue_wait, labels={"provider": provider})
+        # Time the calling node spent waiting for slots
+        waiting_span = current_span()
+        if waiting_span is not None:
+            waiting_span.add("governor_wait_ms", round(queue_wait * 1000, 1))
+        if queue_wait > 1:
+            logger.debug(f"Waited {queue_wait:.2f}s for {provider} slot")
+        return Permit(self, provider, tokens)
+
+    async def acquire_async(self, provider: str, tokens: int = 0, timeout: Optional[float] = None) -> Permit:
+        """Async variant; waits in a thread so the caller's event loop stays responsive"""
+        waiting = asyncio.ensure_future(asyncio.to_thread(self.acquire, provider, tokens, timeout))
+        try:
+            return await asyncio.shield(waiting)
+        except asyncio.CancelledError:
+            # The thread keeps waiting; a slot it gets after we stopped listening has no owner
+            waiting.add_done_callback(_release_unclaimed)
+            raise
+
+    def call(
+        self,
+        provider: str,
+        fn: Callable[..., Any],
+        *args,
+        tokens: int = 0,
+        wait_timeout: Optional[float] = None,
+        **kwargs
+    ) -> Any:
+        """Run a blocking upstream call under the provider's limits"""
+        with self.acquire(provider, tokens, wait_timeout) as permit:
+            result = self._timed_call(provider, fn, *args, **kwargs)
+            permit.settle(_reported_tokens(result))
+            return result
+
+    def invoke_llm(self, llm: Any, prompt: Any, provider: str = "gemini", timeout: Optional[float] = None) -> Any:
+        """
+        `llm.invoke(prompt)` under the provider's limits.
+
+        With a timeout the whole call (slot wait + generation) is bounded; an
+        overrunning call is abandoned but keeps its slot until it really ends.
+        """
+        tokens = estimate_tokens(_prompt_text(prompt))
+        if timeout is None:
+            return self.call(provider, llm.invoke, prompt, tokens=tokens)
+
+        started = time.monotonic()
+        permit = self.acquire(provider, tokens, timeout)
+        future = _call_executor.submit(
+            contextvars.copy_context().run, self._timed_call, provider, llm.invoke, prompt
+        )
+        future.add_done_callback(lambda _: permit.release())
+        try:
+            result = future.result(timeout=max(0.0, timeout - (time.monotonic() - started)))
+        except concurrent.futures.TimeoutError:
+            metrics.increment("governor_call_timeouts_total", labels={"provider": provider})
+            raise GovernorTimeout(f"{provider} call exceeded its {timeout:.1f}s budget")
+        permit.settle(_reported_tokens(result))
+        return result
+
+    def stream_llm(self, llm: Any, prompt: Any, provider: str = "gemini", timeout: Optional[float] = None) -> Iterator[Any]:
+        """
+        `llm.stream(prompt)` under the provider's limits, yielding chunks as they arrive.
+
+        The stream runs in a worker thread that holds the slot until it ends;
+        the timeout bounds slot wait + generation. A stream the caller stops
+        reading (timeout or early close) is closed at its next chunk.
+        """
+        tokens = estimate_tokens(_prompt_text(prompt))
+        started = time.monotonic()
+        permit = self.acquire(provider, tokens, timeout)
+        chunks: queue.Queue = queue.Queue()
+        done = object()
+        abandoned = threading.Event()
+
+        def produce():
+            usage = None
+            try:
+                first = True
+                for chunk in llm.stream(prompt):
+                    if abandoned.is_set():
+                        # Closing the provider stream stops generation and frees the slot
+                        break
+                    if first:
+                        first = False
+                        metrics.observe("llm_first_token_seconds", time.monotonic() - started, labels={"provider": provider})
+                    # Gemini reports usage on the final chunk
+                    usage = _reported_tokens(chunk) or usage
+                    chunks.put(chunk)
+                permit.settle(usage)
+                call_span = current_span()
+                if call_span is not None:
+                    call_span.set(model=_model_name(llm), total_tokens=usage, streamed=True)
+                chunks.put(done)
+            except Exception as e:
+                metrics.increment("governor_call_errors_total", labels={"provider": provider})
+                chunks.put(e)
+            finally:
+                permit.release()
+
+        _call_executor.submit(contextvars.copy_context().run, self._timed_call, provider, produce)
+        try:
+            while True:
+                try:
+                    wait = None if timeout is None else max(0.0, timeout - (time.monotonic() - started))
+                    item = chunks.get(timeout=wait)
+                except queue.Empty:
+                    metrics.increment("governor_call_timeouts_total", labels={"provider": provider})
+                    raise GovernorTimeout(f"{provider} stream exceeded its {timeout:.1f}s budget")
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            abandoned.set()
+
+    def _timed_call(self, provider: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        start = time.monotonic()
+        with span(f"upstream.{provider}", provider=provider,
+                  model=kwargs.get("model") or _model_name(getattr(fn, "__self__", None))) as call_span:
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                metrics.increment("governor_call_errors_total", labels={"provider": provider})
+                raise
+            finally:
+                metrics.observe("governor_call_seconds", time.monotonic() - start, labels={"provider": provider})
+            call_span.set(total_tokens=_reported_tokens(result), status_code=getattr(result, "status_code", None))
+            return result
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Current queue depth and in-flight count per provider"""
+        with self._cond:
+            return {
+                name: {"in_flight": state.in_flight, "queued": state.queued}
+                for name, state in self._providers.items()
+            }
+
+    def _release(self, provider: str):
+        state = self._providers.get(provider)
+        if state is None:
+            return
+        with self._cond:
+            state.in_flight -= 1
+            self._cond.notify_all()
+
+    def _adjust_tokens(self, provider: str, delta: int):
+        state = self._providers.get(provider)
+        if state is None or state.tokens is None:
+            return
+        with self._cond:
+            state.tokens.adjust(delta)
+            self._cond.notify_all()
+
+
+def _release_unclaimed(waiting: "asyncio.Future"):
+    """Release the permit of an acquisition whose awaiter was cancelled"""
+    if not waiting.cancelled() and waiting.exception() is None:
+        waiting.result().release()
+
+
+def _prompt_text(prompt: Any) -> str:
+    """Prompt text for token estimation (a string or a list of chat messages)"""
+    if isinstance(prompt, (list, tuple)):
+        return "\n".join(str(getattr(m, "content", m)) for m in prompt)
+    return str(prompt)
+
+
+def _model_name(llm: Any) -> Optional[str]:
+    """Model of a LangChain chat model (None for other callables)"""
+    name = getattr(llm, "model", None) or getattr(llm, "model_name", None)
+    return name if isinstance(name, str) else None
+
+
+def _reported_tokens(result: Any) -> Optional[int]:
+    """Total tokens reported by a LangChain message or an OpenAI-style completion"""
+    usage = getattr(result, "usage_metadata", None)
+    if isinstance(usage, dict) and usage.get("total_tokens"):
+        return usage["total_tokens"]
+    usage = getattr(result, "usage", None)
+    total = getattr(usage, "total_tokens", None)
+    return total if isinstance(total, int) else None
+
+
+# Account-wide provider quotas; each of the WORKERS processes enforces its share
+_PROVIDER_LIMITS = {
+    "groq": ProviderLimits(
+        requests_per_minute=settings.groq_requests_per_minute,
+        tokens_per_minute=settings.groq_tokens_per_minute,
+        max_in_flight=settings.groq_max_in_flight,
+    ),
+    "gemini": ProviderLimits(
+        requests_per_minute=settings.gemini_requests_per_minute,
+        tokens_per_minute=settings.gemini_tokens_per_minute,
+        max_in_flight=settings.gemini_max_in_flight,
+    ),
+    "openfoodfacts": ProviderLimits(
+        requests_per_minute=settings.openfoodfacts_requests_per_minute,
+        max_in_flight=settings.openfoodfacts_max_in_flight,
+    ),
+    "wikipedia": ProviderLimits(
+        requests_per_minute=settings.wikipedia_requests_per_minute,
+        max_in_flight=settings.wikipedia_max_in_flight,
+    ),
+}
+
+# Global governor shared by every request in this worker
+governor = ProviderGovernor(
+    limits={name: limits.per_worker(settings.workers) for name, limits in _PROVIDER_LIMITS.items()},
+    max_wait_seconds=settings.governor_max_wait_seconds,
+)
@@ -1,6 +1,14 @@
 """Health Agent service module"""
 
-from .workflow import build_health_copilot
+from .projection import resolve_fields
 from .state import HealthCoPilotState
 
-__all__ = ["build_health_copilot", "HealthCoPilotState"]
+__all__ = ["build_health_copilot", "HealthCopilotGraphs", "resolve_fields", "HealthCoPilotState"]
+
+
+def __getattr__(name: str):
+    # The graph pulls in LangGraph, LangChain and the provider SDKs; import it on first use only
+    if name in ("build_health_copilot", "HealthCopilotGraphs"):
+        from . import workflow
+        return getattr(workflow, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,70 @@
+import time
+from typing import List, Optional
+from app.config.settings import settings
+from app.utils.logger import logger
+
+# Fraction of the request SLO that must still be left for a stage to run in
+# full mode. Below it the stage degrades to its cheap deterministic fallback.
+STAGE_BUDGET_FRACTIONS = {
+    "extraction_escalation": 0.75, # Stronger vision model for a label that failed validation
+    "extraction_retry": 0.70, # Second, preprocessed vision pass on an unreadable label
+    "enrichment": 0.60,      # Wikipedia + OpenFoodFacts lookups per ingredient
+    "alternatives": 0.45,    # OpenFoodFacts category search for alternatives
+    "designer_prompt": 0.30, # Full designer prompt (otherwise compact prompt)
+}
+
+# Floor applied to per-call timeouts so a nearly-expired budget still gets one quick try
+MIN_CALL_TIMEOUT = 0.5
+
+
+def new_deadline() -> float:
+    """Absolute deadline (epoch seconds) for a request starting now"""
+    return time.time() + settings.request_slo_seconds
+
+
+class Deadline:
+    """
+    View over the request deadline carried in HealthCoPilotState.
+
+    Nodes create one per invocation, hand it to tool calls for timeouts, and
+    return the stages it recorded as degraded.
+    """
+
+    def __init__(self, expires_at: Optional[float], slo_seconds: Optional[float] = None):
+        self.expires_at = expires_at
+        self.slo_seconds = slo_seconds or settings.request_slo_seconds
+        self.degraded: List[str] = []
+
+    @classmethod
+    def from_state(cls, state) -> "Deadline":
+        return cls(state.get("deadline"))
+
+    def remaining(self) -> float:
+        """Seconds left in the budget (infinite when no deadline was set)"""
+        if self.expires_at is None:
+            return float("inf")
+        return max(0.0, self.expires_at - time.time())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def allows(self, stage: str) -> bool:
+        """Whether enough budget is left to run `stage` in full mode"""
+        return self.remaining() >= STAGE_BUDGET_FRACTIONS[stage] * self.slo_seconds
+
+    def timeout(self, cap: float) -> float:
+        """Per-call timeout: the stage's own cap, shortened to the remaining budget"""
+        return max(MIN_CALL_TIMEOUT, min(cap, self.remaining()))
+
+    def budget(self) -> Optional[float]:
+        """Timeout for calls with no cap of their own (None when no deadline was set)"""
+        if self.expires_at is None:
+            return None
+        return max(MIN_CALL_TIMEOUT, self.remaining())
+
+    def degrade(self, stage: str, reason: str = "low time budget"):
+        """Record that `stage` fell back to degraded mode"""
+        if stage not in self.degraded:
+            self.degraded.append(stage)
+            logger.warning(f"Stage '{stage}' degraded: {reason} ({self.remaining():.1f}s left)")
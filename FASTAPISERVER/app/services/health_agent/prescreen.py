@@ -0,0 +1,379 @@
+import re
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+# Canonical ingredient groups and the label terms that denote them
+CANONICAL_TERMS = {
+    "peanut": ("peanut", "groundnut", "arachis", "monkey nut", "moongphali"),
+    "tree_nut": ("almond", "cashew", "walnut", "pistachio", "hazelnut", "pecan", "macadamia",
+                 "brazil nut", "pine nut", "tree nut", "kaju", "badam", "pista", "akhrot"),
+    "milk": ("milk", "dairy", "butter", "cream", "cheese", "whey", "casein", "caseinate", "lactose", "ghee",
+             "curd", "paneer", "yogurt", "yoghurt", "dahi", "khoa", "khoya", "malai", "makhan", "chhena",
+             "milk solids", "lactalbumin"),
+    "egg": ("egg", "albumin", "ovalbumin", "mayonnaise"),
+    "gluten": ("wheat", "maida", "atta", "semolina", "sooji", "suji", "rava", "rawa", "dalia", "barley", "rye", "malt",
+               "gluten", "spelt", "couscous", "triticale"),
+    "soy": ("soy", "soya", "soybean", "tofu", "edamame"),
+    "sesame": ("sesame", "til", "tahini", "gingelly"),
+    "fish": ("fish", "anchovy", "tuna", "salmon", "sardine", "mackerel", "cod", "fish sauce"),
+    "shellfish": ("shellfish", "shrimp", "prawn", "crab", "lobster", "oyster", "mussel", "clam", "squid"),
+    "mustard": ("mustard", "sarson"),
+    "celery": ("celery", "celeriac"),
+    "sulphite": ("sulphite", "sulfite", "sulphur dioxide", "sulfur dioxide", "metabisulphite", "metabisulfite"),
+    "meat": ("chicken", "beef", "pork", "mutton", "lamb", "bacon", "ham", "lard", "tallow",
+             "meat", "animal fat", "animal rennet"),
+    "gelatin": ("gelatin", "gelatine"),
+    "honey": ("honey",),
+}
+
+# Plant-based look-alikes: label term -> group it does NOT belong to despite the wording
+EXEMPT_TERMS = {
+    "coconut milk": "milk", "almond milk": "milk", "soy milk": "milk", "soya milk": "milk",
+    "oat milk": "milk", "rice milk": "milk", "coconut cream": "milk", "cream of tartar": "milk",
+    "cocoa butter": "milk", "peanut butter": "milk", "nut butter": "milk", "shea butter": "milk",
+    "butter bean": "milk", "nutmeg": "tree_nut", "coconut": "tree_nut", "buckwheat": "gluten",
+    "cream of wheat": "milk", "cream of rice": "milk", "cream of coconut": "milk", "milk thistle": "milk",
+    "almond butter": "milk", "cashew butter": "milk", "coconut butter": "milk", "apple butter": "milk",
+    "mango butter": "milk", "kokum butter": "milk", "eggless mayonnaise": "egg", "vegan mayonnaise": "egg",
+    "egg plant": "egg", "butternut": "milk",
+}
+
+# Words a term may run straight into on a label ("Wheatflour", "Cashewnut", "Soyabean oil", "Buttermilk")
+COMPOUND_SUFFIXES = ("flour", "powder", "fat", "nut", "bean", "oil", "solids", "germ", "bran", "milk", "butter",
+                     "protein", "white", "yolk")
+
+# Terms naming a whole group: "egg-free mayonnaise" or "non-dairy cream" clears the group for the ingredient
+GROUP_NAMES = {
+    "peanut", "tree nut", "milk", "dairy", "egg", "gluten", "soy", "soya", "sesame", "fish", "shellfish",
+    "mustard", "celery", "sulphite", "sulfite", "meat", "gelatin", "gelatine", "honey",
+}
+
+# Words users write in their allergy list -> canonical groups
+ALLERGY_ALIASES = {
+    "peanut": {"peanut"}, "groundnut": {"peanut"},
+    "nut": {"peanut", "tree_nut"}, "tree nut": {"tree_nut"},
+    "almond": {"tree_nut"}, "cashew": {"tree_nut"}, "walnut": {"tree_nut"}, "pistachio": {"tree_nut"},
+    "hazelnut": {"tree_nut"},
+    "milk": {"milk"}, "dairy": {"milk"}, "lactose": {"milk"}, "casein": {"milk"},
+    "egg": {"egg"},
+    "gluten": {"gluten"}, "wheat": {"gluten"}, "celiac": {"gluten"}, "coeliac": {"gluten"},
+    "soy": {"soy"}, "soya": {"soy"},
+    "sesame": {"sesame"},
+    "fish": {"fish"}, "seafood": {"fish", "shellfish"}, "shellfish": {"shellfish"},
+    "shrimp": {"shellfish"}, "prawn": {"shellfish"},
+    "mustard": {"mustard"}, "celery": {"celery"},
+    "sulphite": {"sulphite"}, "sulfite": {"sulphite"},
+}
+
+# Diet -> canonical groups it excludes
+DIET_FORBIDDEN = {
+    "vegan": {"meat", "fish", "shellfish", "milk", "egg", "honey", "gelatin"},
+    "vegetarian": {"meat", "fish", "shellfish", "gelatin"},
+    "pescatarian": {"meat", "gelatin"},
+}
+
+# Condition keywords -> per-serving nutrient limits (soft conflicts when exceeded)
+CONDITION_LIMITS = {
+    ("hypertension", "blood pressure", "kidney", "renal"): {"sodium_mg": 400},
+    ("diabet", "blood sugar", "insulin", "pcos", "pcod"): {"sugars_g": 10},
+    ("heart", "cardiac", "cholesterol"): {"saturated_fat_g": 5, "sodium_mg": 400},
+    ("keto",): {"carbohydrates_g": 10},
+}
+
+NUTRIENT_NAMES = {
+    "sodium_mg": ("sodium", "mg"),
+    "sugars_g": ("sugar", "g"),
+    "saturated_fat_g": ("saturated fat", "g"),
+    "carbohydrates_g": ("carbohydrates", "g"),
+}
+
+_SECTION_RE = re.compile(
+    r"(medical conditions|allergies|dietary preferences|health goals)\s*:\s*(.*?)(?=\.\s*(?:medical conditions|allergies|dietary preferences|health goals)\s*:|\.?\s*$)",
+    re.IGNORECASE | re.DOTALL,
+)
+# Free-text allergy cues, each its own pass ("X allerg" would otherwise swallow "I am allergic to ...")
+_ALLERGIC_TO_RE = re.compile(r"allergic to ([a-z ,&]+)", re.IGNORECASE)
+_NAMED_ALLERGY_RE = re.compile(r"([a-z ]+?) allerg", re.IGNORECASE)
+# Wording around a matched term that cancels it ("gluten-free", "no added honey", "without egg")
+_NEGATION_AFTER = re.compile(r"^\s*-?\s*free\b", re.IGNORECASE)
+_NEGATION_BEFORE = re.compile(r"\b(?:no|without|free from|non)\s*-?\s*(?:added\s+)?$", re.IGNORECASE)
+# Whole-word diet names, not preceded by "non" ("non-vegetarian" is no diet restriction)
+_DIET_RES = {diet: re.compile(rf"(?<!non)(?<!non-)(?<!non )\b{diet}s?\b", re.IGNORECASE) for diet in DIET_FORBIDDEN}
+# Allergy aliases, longest first
+_ALLERGY_ALIAS_RES = [
+    (re.compile(rf"\b{re.escape(alias)}"), groups)
+    for alias, groups in sorted(ALLERGY_ALIASES.items(), key=lambda item: -len(item[0]))
+]
+_PRECAUTION_RE = re.compile(r"may contain|traces? of|processed in a facility|manufactured in a facility", re.IGNORECASE)
+
+
+class _Automaton:
+    """Aho-Corasick automaton over lowercase terms; finds every term occurrence in one pass"""
+
+    def __init__(self, terms: Dict[str, str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, str]]] = [[]]
+        for term, canonical in terms.items():
+            self._add(term, canonical)
+        self._build()
+
+    def _add(self, term: str, canonical: str):
+        node = 0
+        for char in term:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((term, canonical))
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def iter(self, text: str) -> Iterator[Tuple[int, int, str, str]]:
+        """Yield (start, end, term, canonical) for every match in text"""
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for term, canonical in self._out[node]:
+                yield index - len(term) + 1, index + 1, term, canonical
+
+
+# Built once at import: every label term -> its canonical group ("!group" for exemptions)
+_MATCHER = _Automaton({
+    **{term: canonical for canonical, terms in CANONICAL_TERMS.items() for term in terms},
+    **{term: f"!{group}" for term, group in EXEMPT_TERMS.items()},
+})
+
+
+def _is_word_match(text: str, start: int, end: int) -> bool:
+    """
+    Whole-word match, allowing plural 's'/'es' and a compound suffix
+    (so 'egg' matches 'eggs' and 'eggwhite' but not 'eggplant')
+    """
+    if start > 0 and text[start - 1].isalnum():
+        return False
+    rest = text[end:]
+    for compound in ("",) + COMPOUND_SUFFIXES:
+        for plural in ("", "s", "es"):
+            suffix = compound + plural
+            if rest.startswith(suffix) and (len(rest) == len(suffix) or not rest[len(suffix)].isalnum()):
+                return True
+    return False
+
+
+def _paren_scopes(text: str) -> List[int]:
+    """Per character: 0 outside parentheses, n inside the n-th top-level "(...)" group"""
+    scopes, depth, group = [], 0, 0
+    for char in text:
+        if char == "(":
+            if depth == 0:
+                group += 1
+            depth += 1
+        scopes.append(group if depth else 0)
+        if char == ")" and depth:
+            depth -= 1
+    return scopes
+
+
+def find_canonical_terms(text: str) -> List[Tuple[str, str, bool]]:
+    """
+    (canonical, matched term, negated) for each whole-word term in an ingredient string
+
+    A negated group name negates the whole group within its part of the
+    ingredient, but not inside a parenthesised sub-ingredient list it is not in.
+
+    >>> find_canonical_terms("Egg-free mayonnaise")
+    [('egg', 'egg', True), ('egg', 'mayonnaise', True)]
+    >>> find_canonical_terms("Cream of wheat")
+    [('gluten', 'wheat', False)]
+    >>> find_canonical_terms("Non-dairy creamer (sodium caseinate)")
+    [('milk', 'dairy', True), ('milk', 'caseinate', False)]
+
+    Compound and Indian-English spellings:
+
+    >>> [find_canonical_terms(t) for t in ("Buttermilk powder", "Milkfat", "Cashewnuts", "Soyabean oil", "Wheatflour")]
+    [[('milk', 'butter', False)], [('milk', 'milk', False)], [('tree_nut', 'cashew', False)], [('soy', 'soya', False)], [('gluten', 'wheat', False)]]
+    >>> [find_canonical_terms(t) for t in ("Groundnut oil", "Kaju", "Rava", "Khoya")]
+    [[('peanut', 'groundnut', False)], [('tree_nut', 'kaju', False)], [('gluten', 'rava', False)], [('milk', 'khoya', False)]]
+    >>> find_canonical_terms("Butternut squash"), find_canonical_terms("Eggplant"), find_canonical_terms("Coconutmilk")
+    ([], [], [])
+    """
+    lowered = text.lower()
+    matches, exempt = [], []
+    for start, end, term, canonical in _MATCHER.iter(lowered):
+        if not _is_word_match(lowered, start, end):
+            continue
+        if canonical.startswith("!"):
+            exempt.append((start, end, canonical[1:]))
+        else:
+            matches.append((start, end, term, canonical))
+
+    scopes = _paren_scopes(lowered)
+    found, negated_groups = [], set()
+    for start, end, term, canonical in matches:
+        if any(s <= start and end <= e and group == canonical for s, e, group in exempt):
+            continue
+        negated = bool(_NEGATION_AFTER.match(lowered[end:]) or _NEGATION_BEFORE.search(lowered[:start]))
+        if negated and term in GROUP_NAMES:
+            negated_groups.add((canonical, scopes[start]))
+        found.append((canonical, term, negated, scopes[start]))
+    return [(canonical, term, negated or (canonical, scope) in negated_groups) for canonical, term, negated, scope in found]
+
+
+@dataclass
+class HealthProfile:
+    """Structured view of the free-text health profile sent by the client"""
+    allergens: Set[str] = field(default_factory=set)
+    diets: Set[str] = field(default_factory=set)
+    conditions: List[str] = field(default_factory=list)
+    nutrient_limits: Dict[str, float] = field(default_factory=dict)
+
+    def forbidden(self) -> Dict[str, str]:
+        """Canonical group -> why it is forbidden (allergies take precedence over diets)"""
+        reasons = {}
+        for diet in sorted(self.diets):
+            for group in DIET_FORBIDDEN[diet]:
+                reasons.setdefault(group, f"not {diet}")
+        for group in self.allergens:
+            reasons[group] = "your allergy"
+        return reasons
+
+
+def _allergens_from_text(text: str) -> Set[str]:
+    """
+    Canonical groups named in an allergy list
+
+    >>> sorted(_allergens_from_text("tree nuts"))
+    ['tree_nut']
+    >>> sorted(_allergens_from_text("nuts, milk"))
+    ['milk', 'peanut', 'tree_nut']
+    """
+    allergens = set()
+    for item in re.split(r",|/|&|\band\b", text.lower()):
+        item = item.strip().rstrip("s")
+        for pattern, groups in _ALLERGY_ALIAS_RES:
+            # A matched alias is blanked out, so "nut" cannot match again inside "tree nut"
+            item, count = pattern.subn(" ", item)
+            if count:
+                allergens |= groups
+    return allergens
+
+
+def parse_health_profile(raw: str) -> HealthProfile:
+    """
+    Parse "Medical conditions: ... . Allergies: ... . Dietary preferences: ..."
+    (the format the frontend sends), falling back to free-text cues.
+
+    >>> sorted(parse_health_profile("Dietary preferences: Vegetarian").diets)
+    ['vegetarian']
+    >>> sorted(parse_health_profile("Dietary preferences: Non-vegetarian").diets)
+    []
+    >>> sorted(parse_health_profile("I am allergic to peanuts and shellfish").allergens)
+    ['peanut', 'shellfish']
+    """
+    profile = HealthProfile()
+    raw = raw or ""
+    sections = {name.lower(): value for name, value in _SECTION_RE.findall(raw)}
+
+    if "allergies" in sections:
+        profile.allergens = _allergens_from_text(sections["allergies"])
+    else:
+        for pattern in (_ALLERGIC_TO_RE, _NAMED_ALLERGY_RE):
+            for listed in pattern.findall(raw):
+                profile.allergens |= _allergens_from_text(listed)
+
+    diet_text = sections.get("dietary preferences", raw).lower()
+    profile.diets = {diet for diet in DIET_FORBIDDEN if _DIET_RES[diet].search(diet_text)}
+
+    condition_text = sections.get("medical conditions", raw).lower()
+    profile.conditions = [c.strip() for c in condition_text.split(",") if c.strip()] if "medical conditions" in sections else []
+    for keywords, limits in CONDITION_LIMITS.items():
+        if any(re.search(rf"\b{re.escape(kw)}", condition_text) for kw in keywords):
+            for nutrient, limit in limits.items():
+                profile.nutrient_limits[nutrient] = min(limit, profile.nutrient_limits.get(nutrient, limit))
+    return profile
+
+
+@dataclass
+class Conflict:
+    kind: str  # allergen, diet or nutrient
+    subject: str  # canonical group or nutrient
+    ingredient: str  # label text that triggered it
+    severity: str  # hard or soft
+    message: str
+
+
+@dataclass
+class PrescreenResult:
+    conflicts: List[Conflict] = field(default_factory=list)
+
+    @property
+    def hard(self) -> List[Conflict]:
+        return [c for c in self.conflicts if c.severity == "hard"]
+
+    @property
+    def soft(self) -> List[Conflict]:
+        return [c for c in self.conflicts if c.severity == "soft"]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"conflicts": [asdict(c) for c in self.conflicts]}
+
+
+def prescreen(profile: HealthProfile, ingredients: List[str], nutrition: Optional[Dict[str, Any]] = None) -> PrescreenResult:
+    """
+    Match the ingredient list against the profile's forbidden groups and nutrient limits.
+
+    A forbidden ingredient is a hard conflict; "may contain" warnings and
+    exceeded nutrient limits are soft conflicts.
+
+    >>> profile = parse_health_profile("Allergies: milk, tree nuts, soy")
+    >>> labels = ["Wheat flour", "Buttermilk powder", "Cashewnut", "Soyabean oil", "Sugar"]
+    >>> [(c.subject, c.severity) for c in prescreen(profile, labels).conflicts]
+    [('milk', 'hard'), ('tree_nut', 'hard'), ('soy', 'hard')]
+    """
+    result = PrescreenResult()
+    forbidden = profile.forbidden()
+    seen = set()
+
+    if forbidden:
+        for ingredient in ingredients:
+            precaution = bool(_PRECAUTION_RE.search(ingredient))
+            for canonical, term, negated in find_canonical_terms(ingredient):
+                if negated or canonical not in forbidden or (canonical, precaution) in seen:
+                    continue
+                seen.add((canonical, precaution))
+                reason = forbidden[canonical]
+                kind = "allergen" if reason == "your allergy" else "diet"
+                label = canonical.replace("_", " ")
+                if precaution:
+                    message = f"May contain {label} ({reason})"
+                else:
+                    message = f"Contains {label} via '{ingredient.strip()}' ({reason})"
+                result.conflicts.append(Conflict(kind, canonical, ingredient.strip(), "soft" if precaution else "hard", message))
+
+    for nutrient, limit in profile.nutrient_limits.items():
+        value = (nutrition or {}).get(nutrient)
+        if isinstance(value, (int, float)) and value > limit:
+            name, unit = NUTRIENT_NAMES[nutrient]
+            result.conflicts.append(Conflict(
+                "nutrient", nutrient, f"{value}{unit}", "soft",
+                f"{value}{unit} {name} per serving is above your {limit}{unit} limit"
+            ))
+    return result
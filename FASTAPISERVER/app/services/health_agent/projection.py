@@ -0,0 +1,63 @@
+from typing import FrozenSet, Iterable, Optional
+
+# Main-path nodes in execution order
+NODE_ORDER = ("extract", "prescreen", "profile", "research", "decide", "analyze", "design")
+
+# Nodes each node needs to have run first (decide uses research's NOVA scores only when present)
+NODE_DEPENDENCIES = {
+    "extract": set(),
+    "prescreen": {"extract"},
+    "profile": {"extract"},
+    "research": {"extract"},
+    "decide": {"extract", "prescreen"},
+    "analyze": {"prescreen", "profile", "research"},
+    "design": {"profile", "research", "decide", "analyze"},
+}
+
+# Response field -> node that produces it
+FIELD_NODES = {
+    "brand_name": "extract",
+    "ingredients_list": "extract",
+    "extraction_status": "extract",
+    "degraded_stages": "extract",
+    "conflicts": "prescreen",
+    "user_clinical_profile": "profile",
+    "ingredient_knowledge_base": "research",
+    "product_alternatives": "research",
+    "decision": "decide",
+    "decision_color": "decide",
+    "clinical_risk_analysis": "analyze",
+    "final_conversational_insight": "design",
+}
+
+# Named field profiles: quick = one vision call + local rules/scoring
+MODE_FIELDS = {
+    "quick": frozenset({"brand_name", "ingredients_list", "extraction_status", "conflicts", "decision", "decision_color"}),
+    "standard": frozenset(FIELD_NODES) - {"final_conversational_insight"},
+    "full": frozenset(FIELD_NODES),
+}
+
+
+def resolve_fields(mode: Optional[str] = None, fields: Optional[Iterable[str]] = None) -> FrozenSet[str]:
+    """Requested response fields from a mode name and/or explicit field list (default: full)"""
+    if mode is not None and mode not in MODE_FIELDS:
+        raise ValueError(f"Unknown mode '{mode}'. Valid modes: {', '.join(MODE_FIELDS)}")
+    requested = set(MODE_FIELDS[mode]) if mode else set()
+    if fields:
+        unknown = set(fields) - set(FIELD_NODES)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}. Valid fields: {', '.join(FIELD_NODES)}")
+        requested |= set(fields)
+    return frozenset(requested) if requested else MODE_FIELDS["full"]
+
+
+def required_nodes(fields: Optional[Iterable[str]] = None) -> FrozenSet[str]:
+    """Smallest set of main-path nodes that produces `fields` (all nodes when None)"""
+    pending = {"extract"} | {FIELD_NODES[f] for f in (fields if fields is not None else FIELD_NODES)}
+    selected = set()
+    while pending:
+        node = pending.pop()
+        if node not in selected:
+            selected.add(node)
+            pending |= NODE_DEPENDENCIES[node]
+    return frozenset(selected)
@@ -0,0 +1,352 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from app.services.governor import estimate_tokens
+from app.utils.metrics import metrics
+
+# Per-section token budgets for the dynamic part of each prompt. Sections are
+# cut to their budget; the static instruction blocks below are never cut.
+SECTION_BUDGETS = {
+    "profile": 150,
+    "risks": 250,
+    "ingredient_table": 600,
+    "ingredients": 120,
+    "alternatives": 80,
+}
+
+# Longest text kept per ingredient-table cell (characters)
+TABLE_CELL_CHARS = 90
+
+# Static designer instructions. Sent as the system message so the identical
+# prefix can be served from the provider's context cache across requests.
+DESIGNER_INSTRUCTIONS = """**STRICT OUTPUT FORMAT – NO EXCEPTIONS:**
+You MUST include ALL 6 components below. Competition judging focuses on co-pilot behavior and HONEST UNCERTAINTY.
+
+You are an AI health co-pilot for a 21-year-old user (72kg, 176cm, BMI 23.2, ~2000 cal/day needs).
+
+The request CONTEXT (product, nutrition, profile, risks, ingredient table, alternatives, engine verdict) is given in the user message.
+
+**ANTI-JARGON RULES (CRITICAL):**
+❌ NEVER use: "mast cell degranulation", "Mycobacterium tuberculosis", "3-MCPD esters", "cytokine release", "histamine pathways"
+✅ ALWAYS use: "immune cells releasing chemicals", "the TB bacteria", "palm oil processing byproducts", "inflammation signals", "allergy response"
+
+**TALK LIKE A HELPFUL FRIEND, NOT A SCIENTIST.**
+
+**CRITICAL: NO SPECULATION WITHOUT EVIDENCE**
+❌ NEVER say: "Some spices can be mixed with harmful things" (speculative without proof)
+✅ ONLY mention confirmed ingredients from the label
+✅ Put uncertain connections in "What I'm Unsure About" section
+✅ If making claims, qualify: "Some studies suggest..." or "In certain cases..."
+
+**CRITICAL: DATA INTEGRITY - NO HALLUCINATION**
+1. If NUTRITION FACTS in the label data below shows "EXTRACTED FROM LABEL" → USE THOSE EXACT VALUES
+2. NEVER estimate or guess when actual data exists
+3. If data shows "80 kcal per 25g" → say exactly that, NOT "around 140 calories"
+4. If truly no data → be honest: "The label's nutrition facts weren't readable"
+5. Don't mix actual data with estimates in the same response
+
+**CONDITION-AWARE NUTRITION ANALYSIS (AI-DRIVEN):**
+When analyzing nutrition for the user's health conditions:
+1. IDENTIFY which nutrients are most relevant to their specific conditions based on your medical knowledge
+2. If user has recovery/chronic conditions → highlight protein, iron, calories in your analysis
+3. If user has metabolic conditions → focus on sugars, carbs, sodium
+4. If user has cardiovascular concerns → emphasize fats, sodium, cholesterol
+5. EXPLAIN why specific nutrients matter for THEIR condition in plain language
+6. Example: If user recovering from illness and label shows Iron → mention "This provides iron which supports energy during recovery"
+
+**SMART ALLERGY-SAFE ALTERNATIVES (AI-DRIVEN):**
+When suggesting alternatives:
+1. Analyze user's health profile for any allergy/sensitivity indicators
+2. If user has allergies/sensitivities → AVOID recommending common allergens as "safer"
+3. Consider common allergens: tree nuts, peanuts, dairy, gluten, soy, shellfish, eggs
+4. If user has respiratory/sinus issues → prefer low-histamine options, avoid common allergens
+5. NEVER recommend a higher-allergen food as "safer" than a low-allergen food
+6. If current product is already low-allergen (fruits, dates) → say "This is already a good choice"
+
+**CRITICAL: QUICK DECISION IS ALREADY DECIDED**
+Our nutrition scoring engine rated this product (ENGINE VERDICT in CONTEXT, with its flags).
+- The Quick Decision MUST start with exactly the ENGINE VERDICT and then give the main reason in plain language
+- Do NOT contradict this verdict anywhere in the response
+
+**CRITICAL: USE THESE EXACT SECTION HEADERS - NO VARIATIONS!**
+You MUST include these 6 sections with EXACT header names:
+1. 🤔 Scanning your [product name]...
+2. **Quick Decision:** [content]
+3. **Why This Matters To You:**
+4. **Tradeoffs:** [content]
+5. **What I'm Unsure About:**
+6. **Better Options:**
+
+DO NOT use variations like "Carbohydrates and Fiber Labeling" or "Ground Spices Blend" as top-level headers!
+These should be INSIDE the "What I'm Unsure About:" section.
+
+MANDATORY OUTPUT STRUCTURE:
+
+🤔 Scanning your [product name]...
+
+**Quick Decision:** [ENGINE VERDICT] [Main reason in one plain sentence]
+
+
+**Why This Matters To You:**
+- **[Condition 1]**: [QUANTIFY with exact % of daily needs. Use ACTUAL nutrition data if available. Example: "This 264-calorie serving (per 50g) is 13% of your ~2000 daily needs" - NOT "Let's estimate 264 calories"]
+- **[Condition 2]**: [Explain WHAT ingredient IS in simple terms + regulatory fact. Example: "White sesame (FDA-required allergen label since 2023) can trigger severe allergic reactions"]
+- **[Condition 3]**: [Use SIMPLE mechanism. Example: "Refined flour spikes blood sugar, which can worsen inflammation" NOT "histamine pathways"]
+
+**Tradeoffs:** [One sentence: benefit vs risk + age context in plain language. Example: "A healthy, nutrient-dense snack that supports your energy needs, just wash thoroughly as the label instructs."]
+
+**What I'm Unsure About:**
+List 2-3 specific uncertainties with honest explanations:
+- **[Missing Label Info]**: [What's not on the label + why it matters. Example: "Ground Spices Blend: Label doesn't list which spices - can't confirm if turmeric is present, which can interact with some TB medications"]
+- **[Processing Details]**: [Unspecified processing methods + impact. Example: "Palm Oil Processing: Label doesn't specify refined vs unrefined, making it hard to quantify exact byproduct levels"]
+- **[Conflicting Evidence]**: [If research is mixed. Example: "Research is mixed on whether X affects Y in people under 25"]
+
+**Better Options:** 🛒 [SPECIFIC product brands with store names - ONLY if current product has significant issues, otherwise say "This is already a good choice!" or suggest complementary items]
+- [Brand Name] (Why it's better: specific reason, available at: BigBasket/Amazon India)
+
+CRITICAL REQUIREMENTS:
+
+1. **Nutrition Quantification** (EXACT math):
+   - Daily calorie needs: ~2000 for 21-year-old male, 72kg
+   - If you have ACTUAL calorie data, say "This 264-calorie serving" NOT "Let's estimate 264 calories"
+   - Calculate exact percentages: "X calories = Y% of daily needs"
+   - Relate to specific conditions: "TB patients often need lower sodium than the 192mg here"
+
+2. **Plain English ONLY**:
+   - Replace ALL scientific terms with conversational language
+   - Use analogies: "immune system going into overdrive" NOT "cytokine release"
+   - Test: Would a non-scientist friend understand this?
+
+3. **Honest Uncertainty** (CRITICAL - 30% of score):
+   - MUST include "What I'm Unsure About" section
+   - Be specific about what's missing from the label
+   - Explain why the uncertainty matters
+   - Don't speculate - admit when you don't know
+
+4. **Actionable Alternatives**:
+   - SPECIFIC brand names (Hippeas, Terra, Simple Mills, etc.)
+   - Include WHERE to buy ("available at Target", "online delivery")
+   - DON'T just say "roasted chickpeas" - say "Hippeas Chickpea Puffs"
+
+5. **Age/BMI Personalization**:
+   - Use exact stats: "As a 21-year-old with healthy BMI 23.2..."
+   - Age-specific recovery: "Your body can handle mild inflammation better at 21, but TB needs extra care"
+
+6. **Evidence-Based Only**:
+   - Only mention confirmed ingredients from the label
+   - If ingredient is vague (like "Ground Spices"), put concerns in "What I'm Unsure About"
+   - Don't make claims about ingredients that might not be present
+
+7. **Co-Pilot Feel**:
+   - Do the work FOR the user (give brands, not suggestions to research)
+   - Be proactive ("Here are 2 options I found for you")
+   - Friendly emoji use: 🛒 for shopping, ⚠️ for warnings
+
+GOOD EXAMPLES:
+- "This 264-calorie serving (per 50g) is 13% of your ~2000 daily needs - adds up if you snack regularly"
+- "White sesame can trigger severe allergic reactions (FDA requires labeling since 2023)"
+- "Refined flour spikes blood sugar, which can worsen sinus swelling"
+- "🛒 Try Hippeas Chickpea Puffs (Target, $4) or Terra Veggie Chips (lower fat)"
+- "At 21, your immune system bounces back quickly, but TB means being extra careful"
+
+BAD EXAMPLES (avoid):
+- "Let's estimate 264 calories" (if you have actual data!)
+- "Some spices can be mixed with lead" (speculative without proof)
+- "Triggers mast cell degranulation" (too technical)
+- "Try roasted chickpeas" (not specific enough)
+- Missing "What I'm Unsure About" section (automatic point deduction!)
+
+Generate NOW. Sound like a smart, helpful friend who ADMITS when they don't know something - NOT a research paper.
+
+REMINDER: You MUST include ALL 6 sections with these EXACT headers:
+1. Scanning message with 🤔
+2. **Quick Decision:**
+3. **Why This Matters To You:**
+4. **Tradeoffs:**
+5. **What I'm Unsure About:**
+6. **Better Options:**"""
+
+COMPACT_DESIGNER_INSTRUCTIONS = """You are a friendly AI health co-pilot. Use plain language, no jargon, and only facts from the context.
+
+Reply briefly using EXACTLY these headers:
+🤔 Scanning your [product name]...
+**Quick Decision:** [ENGINE VERDICT + one reason; never contradict this verdict]
+**Why This Matters To You:** [1-3 bullets tied to the user's conditions]
+**Tradeoffs:** [one sentence]
+**What I'm Unsure About:** [1-2 bullets on missing label info]
+**Better Options:** [1-2 of the available alternatives, or "This is already a good choice!"]"""
+
+RISK_INSTRUCTIONS = """SYSTEM: Clinical Reasoning Engine.
+TASK: Conduct a risk analysis of the product for this user.
+1. Identify direct conflicts between user health and ingredient manufacturing.
+2. Highlight 'Regulatory Gaps' (e.g., banned in EU but user is consuming it).
+3. Quantify uncertainty if scientific data is conflicting.
+PRE-SCREEN FLAGS are already verified; do not re-derive them."""
+
+PROFILER_INSTRUCTIONS = """SYSTEM: Clinical Health Profiler.
+TASK: Convert user symptoms or diseases into precise bio-chemical triggers (e.g., 'Hypertension' -> 'Sodium/Vasoconstrictors')."""
+
+NATURAL_FOOD_HINT = """PRODUCT TYPE: NATURAL WHOLE FOOD (like dates, fruits, nuts). Such foods are generally SAFE and BENEFICIAL for most people. For Better Options: say "This is already a healthy choice!" and suggest complementary foods, NOT processed alternatives like chips."""
+
+NUTRITION_FIELDS = (
+    ("calories", "kcal", ""),
+    ("total_fat_g", "g", "fat"),
+    ("saturated_fat_g", "g", "sat fat"),
+    ("sodium_mg", "mg", "sodium"),
+    ("carbohydrates_g", "g", "carbs"),
+    ("fiber_g", "g", "fiber"),
+    ("sugars_g", "g", "sugars"),
+    ("protein_g", "g", "protein"),
+    ("potassium_mg", "mg", "potassium"),
+    ("iron_mg", "mg", "iron"),
+)
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """Cut text to roughly `budget` tokens, preferring a sentence or line boundary"""
+    text = (text or "").strip()
+    if estimate_tokens(text) <= budget:
+        return text
+    cut = text[:budget * 4]
+    boundary = max(cut.rfind(". "), cut.rfind("\n"))
+    if boundary > len(cut) // 2:
+        cut = cut[:boundary + 1]
+    return cut.rstrip() + " …"
+
+
+def _field(item: Any, name: str, default: Any = "") -> Any:
+    if isinstance(item, dict):
+        return item.get(name, default)
+    return getattr(item, name, default)
+
+
+def _cell(value: Any) -> str:
+    text = " ".join(str(value).split()).replace("|", "/")
+    return text if len(text) <= TABLE_CELL_CHARS else text[:TABLE_CELL_CHARS - 1] + "…"
+
+
+def ingredient_table(kb: Optional[List[Any]], budget: int, priority: Iterable[str] = ()) -> str:
+    """
+    Pipe-separated table of the ingredient knowledge base.
+
+    Rows are ordered by relevance (pre-screen hits first, then most processed)
+    and dropped from the bottom once the table would exceed `budget` tokens.
+    """
+    priority = {p.lower() for p in priority}
+    rows = []
+    seen = set()
+    for index, item in enumerate(kb or []):
+        name = str(_field(item, "name", "")).strip()
+        if not name or name.lower() in seen:
+            continue
+        seen.add(name.lower())
+        nova = _field(item, "nova_score", 3)
+        rank = (0 if name.lower() in priority else 1, -(nova if isinstance(nova, int) else 3), index)
+        row = " | ".join([
+            _cell(name), str(nova), _cell(_field(item, "manufacturing")),
+            _cell(_field(item, "regulatory_gap")), _cell(_field(item, "health_risks")),
+        ])
+        rows.append((rank, row))
+    rows.sort()
+
+    header = "name | nova | manufacturing | regulatory | health risks"
+    lines, used = [header], estimate_tokens(header)
+    for _, row in rows:
+        cost = estimate_tokens(row)
+        if used + cost > budget:
+            lines.append(f"({len(rows) - len(lines) + 1} lower-risk ingredients omitted)")
+            break
+        lines.append(row)
+        used += cost
+    return "\n".join(lines)
+
+
+def nutrition_line(nutrition: Optional[Dict[str, Any]], has_data: bool) -> str:
+    """One-line nutrition summary, or an explicit 'not readable' instruction"""
+    if not has_data:
+        return ("NOT READABLE from the label. Be honest about this, do NOT estimate values; say "
+                "\"The label's nutrition facts weren't readable in the image\".")
+    parts = [f"per {nutrition.get('serving_size') or 'serving'}"]
+    for key, unit, label in NUTRITION_FIELDS:
+        value = nutrition.get(key)
+        if value is not None:
+            parts.append(f"{label} {value}{unit}".strip())
+    return "EXTRACTED FROM LABEL, USE THESE EXACT VALUES: " + ", ".join(parts)
+
+
+def off_summary(product: Dict[str, Any]) -> str:
+    """The few OpenFoodFacts product fields that help an ingredient assessment"""
+    parts = []
+    if product.get("nova_group"):
+        parts.append(f"NOVA {product['nova_group']}")
+    for key, label in (("categories_tags", "category"), ("additives_tags", "additives"), ("allergens_tags", "allergens")):
+        tags = [t.split(":", 1)[-1] for t in product.get(key) or []][:4]
+        if tags:
+            parts.append(f"{label}: {', '.join(tags)}")
+    return "; ".join(parts) or "no details"
+
+
+def _context_block(sections: List[Tuple[str, str]]) -> str:
+    lines = [f"{name}:{'' if value.startswith(chr(10)) else ' '}{value}" for name, value in sections if value]
+    return "CONTEXT:\n" + "\n".join(lines)
+
+
+def _record(node: str, messages: List[BaseMessage]) -> List[BaseMessage]:
+    metrics.observe("prompt_tokens", sum(estimate_tokens(m.content) for m in messages), labels={"node": node})
+    return messages
+
+
+def profiler_messages(raw_health: str) -> List[BaseMessage]:
+    return _record("profile", [
+        SystemMessage(content=PROFILER_INSTRUCTIONS),
+        HumanMessage(content=f"INPUT: {truncate_to_tokens(raw_health, SECTION_BUDGETS['profile'] * 2)}"),
+    ])
+
+
+def risk_messages(profile: str, kb: List[Any], flags: List[str]) -> List[BaseMessage]:
+    context = _context_block([
+        ("USER", truncate_to_tokens(profile, SECTION_BUDGETS["profile"])),
+        ("PRE-SCREEN FLAGS", "; ".join(flags) or "none"),
+        ("PRODUCT DATA", "\n" + ingredient_table(kb, SECTION_BUDGETS["ingredient_table"])),
+    ])
+    return _record("analyze", [SystemMessage(content=RISK_INSTRUCTIONS), HumanMessage(content=context)])
+
+
+def designer_messages(
+    brand: str,
+    ingredients: List[str],
+    nutrition: Optional[Dict[str, Any]],
+    has_nutrition: bool,
+    profile: str,
+    risks: str,
+    kb: List[Any],
+    alts: List[str],
+    decision: Dict[str, Any],
+    natural_food: bool = False,
+    priority: Iterable[str] = (),
+    compact: bool = False,
+) -> List[BaseMessage]:
+    """
+    Designer prompt as [static system instructions, per-request context].
+
+    Ingredients already described in the table are not repeated, and every
+    free-text section is cut to its SECTION_BUDGETS entry.
+    """
+    table_budget = SECTION_BUDGETS["ingredient_table"] // (3 if compact else 1)
+    table = ingredient_table(kb, table_budget, priority) if kb else ""
+    described = {str(_field(item, "name", "")).lower() for item in kb or []}
+    extra = list(dict.fromkeys(i for i in ingredients if i.lower() not in described))
+    reasons = ", ".join(decision.get("reasons", [])) or "no major nutrient flags"
+
+    context = _context_block([
+        ("Product", brand),
+        ("ENGINE VERDICT", f"{decision.get('verdict', 'OK in moderation.')} (flags: {reasons})"),
+        ("Other Ingredients" if table else "Key Ingredients",
+         truncate_to_tokens(", ".join(extra), SECTION_BUDGETS["ingredients"])),
+        ("NUTRITION FACTS", nutrition_line(nutrition, has_nutrition)),
+        ("User Health Profile", truncate_to_tokens(profile, SECTION_BUDGETS["profile"])),
+        ("Risk Analysis", truncate_to_tokens(risks, SECTION_BUDGETS["risks"] // (2 if compact else 1))),
+        ("Ingredient Details", "\n" + table if table else ""),
+        ("Available Alternatives", truncate_to_tokens("; ".join(alts), SECTION_BUDGETS["alternatives"])),
+        ("Note", NATURAL_FOOD_HINT if natural_food else ""),
+    ])
+    instructions = COMPACT_DESIGNER_INSTRUCTIONS if compact else DESIGNER_INSTRUCTIONS
+    return _record("design", [SystemMessage(content=instructions), HumanMessage(content=context)])
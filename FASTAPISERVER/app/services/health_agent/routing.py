@@ -0,0 +1,52 @@
+from typing import Dict
+from langchain_google_genai import ChatGoogleGenerativeAI
+from app.config.settings import settings
+from app.utils.logger import logger
+
+# Graph node -> setting naming its Gemini model
+NODE_MODEL_SETTINGS = {
+    "profile": "profiler_model",
+    "research": "research_model",
+    "analyze": "risk_model",
+    "design": "designer_model",
+}
+
+
+def chat_model(model: str) -> ChatGoogleGenerativeAI:
+    """Gemini client for `model`, sent to GEMINI_BASE_URL over REST when one is set"""
+    endpoint = {"client_options": {"api_endpoint": settings.gemini_base_url}, "transport": "rest"} if settings.gemini_base_url else {}
+    return ChatGoogleGenerativeAI(
+        model=model,
+        temperature=settings.gemini_temperature,
+        google_api_key=settings.google_api_key,
+        **endpoint
+    )
+
+
+class ModelRouter:
+    """
+    Chat model for each LLM node, from the *_MODEL settings.
+
+    Nodes without an override (or whose override is GEMINI_MODEL) share the
+    default instance; each other model name gets one instance.
+    """
+
+    def __init__(self, default_llm: ChatGoogleGenerativeAI):
+        self.default_llm = default_llm
+        self._by_model: Dict[str, ChatGoogleGenerativeAI] = {}
+        self._by_node: Dict[str, ChatGoogleGenerativeAI] = {}
+        for node, setting in NODE_MODEL_SETTINGS.items():
+            model = self.model_name(node)
+            if model == settings.gemini_model:
+                self._by_node[node] = default_llm
+                continue
+            if model not in self._by_model:
+                self._by_model[model] = chat_model(model)
+                logger.info(f"Model routing: {node} -> {model}")
+            self._by_node[node] = self._by_model[model]
+
+    def model_name(self, node: str) -> str:
+        return getattr(settings, NODE_MODEL_SETTINGS[node]) or settings.gemini_model
+
+    def llm(self, node: str) -> ChatGoogleGenerativeAI:
+        return self._by_node.get(node, self.default_llm)
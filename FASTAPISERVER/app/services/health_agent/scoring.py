@@ -0,0 +1,226 @@
+import re
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional
+
+# Quick Decision levels, mildest first: (color, verdict shown before any LLM text)
+DECISION_LEVELS = {
+    "safe": ("#22C55E", "Generally safe!"),
+    "moderate": ("#EAB308", "OK in moderation."),
+    "concerns": ("#F97316", "Not ideal, consider alternatives."),
+    "skip": ("#EF4444", "Skip this one."),
+}
+
+# UK FSA front-of-pack thresholds per 100g (foods) / 100ml (drinks): (green up to, red above)
+FOOD_THRESHOLDS = {
+    "total_fat_g": (3.0, 17.5),
+    "saturated_fat_g": (1.5, 5.0),
+    "sugars_g": (5.0, 22.5),
+    "sodium_mg": (120.0, 600.0),  # Salt 0.3g / 1.5g
+}
+DRINK_THRESHOLDS = {
+    "total_fat_g": (1.5, 8.75),
+    "saturated_fat_g": (0.75, 2.5),
+    "sugars_g": (2.5, 11.25),
+    "sodium_mg": (120.0, 300.0),  # Salt 0.3g / 0.75g
+}
+# Per-portion red thresholds (>30% of reference intake) used when serving size is unknown
+PORTION_RED_THRESHOLDS = {
+    "total_fat_g": 21.0,
+    "saturated_fat_g": 6.0,
+    "sugars_g": 27.0,
+    "sodium_mg": 960.0,  # Salt 2.4g
+}
+
+NUTRIENT_LABELS = {
+    "total_fat_g": "fat",
+    "saturated_fat_g": "saturated fat",
+    "sugars_g": "sugar",
+    "sodium_mg": "sodium",
+}
+
+# Health-profile keywords -> nutrients that matter more for that condition
+CONDITION_WEIGHTS = {
+    ("hypertension", "blood pressure", "bp", "kidney", "renal"): {"sodium_mg": 2.0},
+    ("heart", "cardiac", "cardio", "stroke"): {"sodium_mg": 2.0, "saturated_fat_g": 2.0},
+    ("cholesterol", "ldl", "fatty liver"): {"saturated_fat_g": 2.0, "total_fat_g": 1.5},
+    ("diabet", "blood sugar", "insulin", "pcos", "pcod", "keto"): {"sugars_g": 2.0},
+    ("obes", "weight loss", "overweight"): {"sugars_g": 1.5, "total_fat_g": 1.5},
+}
+_CONDITION_PATTERNS = [
+    (re.compile(r"\b(?:" + "|".join(map(re.escape, keywords)) + ")"), boosts)
+    for keywords, boosts in CONDITION_WEIGHTS.items()
+]
+
+LIGHT_POINTS = {"green": 0, "amber": 1, "red": 2}
+
+# Weighted score upper bounds for each level (above the last one: skip)
+LEVEL_SCORE_LIMITS = (("safe", 1.0), ("moderate", 3.0), ("concerns", 5.0))
+
+_SERVING_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(g|gm|gms|grams?|ml|l)\b", re.IGNORECASE)
+
+
+@dataclass
+class Decision:
+    """Deterministic Quick Decision computed from label nutrition and NOVA scores"""
+    level: str
+    color: str
+    verdict: str
+    score: float
+    reasons: List[str] = field(default_factory=list)
+    traffic_lights: Dict[str, str] = field(default_factory=dict)
+    basis: str = "none"  # per_100g, per_serving, ingredients or none
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def parse_serving_size(serving_size: Optional[str]) -> tuple:
+    """'30g' -> (30.0, False), '250 ml' -> (250.0, True); (None, False) if unparseable"""
+    if not serving_size:
+        return None, False
+    match = _SERVING_RE.search(str(serving_size))
+    if not match:
+        return None, False
+    amount, unit = float(match.group(1)), match.group(2).lower()
+    if unit == "l":
+        return amount * 1000, True
+    return amount, unit == "ml"
+
+
+def condition_weights(user_health: str) -> Dict[str, float]:
+    """
+    Nutrient weights for the user's conditions (1.0 for nutrients no condition mentions)
+
+    >>> weights = condition_weights("Heart disease, high cholesterol")
+    >>> weights["sodium_mg"], weights["saturated_fat_g"], weights["total_fat_g"], weights["sugars_g"]
+    (2.0, 2.0, 1.5, 1.0)
+    """
+    text = (user_health or "").lower()
+    weights = {nutrient: 1.0 for nutrient in NUTRIENT_LABELS}
+    for pattern, boosts in _CONDITION_PATTERNS:
+        if pattern.search(text):
+            for nutrient, weight in boosts.items():
+                weights[nutrient] = max(weights[nutrient], weight)
+    return weights
+
+
+def traffic_lights(nutrition: Optional[Dict[str, Any]]) -> tuple:
+    """Per-nutrient green/amber/red lights and the basis they were computed on"""
+    if not nutrition:
+        return {}, "none"
+    grams, is_drink = parse_serving_size(nutrition.get("serving_size"))
+    lights = {}
+    if grams:
+        thresholds = DRINK_THRESHOLDS if is_drink else FOOD_THRESHOLDS
+        for nutrient, (green_max, red_min) in thresholds.items():
+            value = nutrition.get(nutrient)
+            if value is None:
+                continue
+            per_100 = float(value) * 100.0 / grams
+            lights[nutrient] = "green" if per_100 <= green_max else "red" if per_100 > red_min else "amber"
+        return lights, "per_100g"
+    # Unknown serving size: judge the listed values as one portion
+    for nutrient, red_min in PORTION_RED_THRESHOLDS.items():
+        value = nutrition.get(nutrient)
+        if value is None:
+            continue
+        value = float(value)
+        lights[nutrient] = "red" if value > red_min else "amber" if value > red_min / 4 else "green"
+    return lights, "per_serving" if lights else "none"
+
+
+def average_nova(ingredient_kb: Optional[List[Any]]) -> Optional[float]:
+    scores = []
+    for item in ingredient_kb or []:
+        score = item.get("nova_score") if isinstance(item, dict) else getattr(item, "nova_score", None)
+        if isinstance(score, (int, float)):
+            scores.append(score)
+    return sum(scores) / len(scores) if scores else None
+
+
+def score_product(
+    nutrition: Optional[Dict[str, Any]],
+    user_health: str = "",
+    ingredient_kb: Optional[List[Any]] = None,
+    hard_conflicts: Optional[List[str]] = None,
+    has_allergies: bool = False
+) -> Decision:
+    """
+    Score a product for this user.
+
+    Each nutrient light earns 0/1/2 points times the condition weight; a
+    mostly ultra-processed ingredient list adds up to 2 more. A red light on
+    a nutrient the user's condition is sensitive to, or any hard pre-screen
+    conflict (allergen/diet), is always "skip". A user with allergies the
+    pre-screen found no match for gets "moderate" at best: the verdict is
+    shown before the risk analysis and the scan can miss a label spelling.
+
+    >>> low = {"serving_size": "100g", "total_fat_g": 2, "saturated_fat_g": 1, "sugars_g": 5, "sodium_mg": 100}
+    >>> score_product(low).level, score_product(low).color
+    ('safe', '#22C55E')
+    >>> score_product(low, has_allergies=True).level
+    'moderate'
+    >>> score_product(low, hard_conflicts=["Contains milk via 'Whey' (your allergy)"]).level
+    'skip'
+
+    Amber lights add 1 point each, red lights 2 (times the condition weight):
+
+    >>> amber = {"serving_size": "100g", "total_fat_g": 10, "saturated_fat_g": 3, "sugars_g": 10, "sodium_mg": 300}
+    >>> score_product(amber).level, score_product(amber).score
+    ('concerns', 4.0)
+    >>> sweet = dict(low, sugars_g=10)
+    >>> score_product(sweet).level, score_product(sweet, "Type 2 diabetes").level
+    ('safe', 'moderate')
+    >>> salty = dict(low, sodium_mg=700)
+    >>> score_product(salty).level, score_product(salty, "Hypertension").level
+    ('moderate', 'skip')
+    >>> score_product(None).level, score_product(None).basis
+    ('moderate', 'none')
+    """
+    lights, basis = traffic_lights(nutrition)
+    weights = condition_weights(user_health)
+    reasons = []
+    score = 0.0
+    condition_red = False
+
+    for nutrient, light in lights.items():
+        score += LIGHT_POINTS[light] * weights[nutrient]
+        if light == "red":
+            sensitive = weights[nutrient] > 1.0
+            condition_red = condition_red or sensitive
+            reasons.append(f"High {NUTRIENT_LABELS[nutrient]}" + (" for your condition" if sensitive else ""))
+
+    nova = average_nova(ingredient_kb)
+    if nova is not None:
+        if nova >= 3.5:
+            score += 2
+            reasons.append("Mostly ultra-processed ingredients")
+        elif nova >= 2.5:
+            score += 1
+        if basis == "none":
+            basis = "ingredients"
+
+    if hard_conflicts:
+        level = "skip"
+        reasons = list(hard_conflicts) + reasons
+    elif basis == "none":
+        level = "moderate"
+        reasons.append("Not enough label data for a confident verdict")
+    elif condition_red:
+        level = "skip"
+    else:
+        level = next((name for name, limit in LEVEL_SCORE_LIMITS if score <= limit), "skip")
+    if level == "safe" and has_allergies:
+        level = "moderate"
+        reasons.append("Check the label for your allergens")
+
+    color, verdict = DECISION_LEVELS[level]
+    return Decision(
+        level=level,
+        color=color,
+        verdict=verdict,
+        score=round(score, 2),
+        reasons=reasons,
+        traffic_lights={NUTRIENT_LABELS[n]: light for n, light in lights.items()},
+        basis=basis,
+    )
@@ -1,15 +1,23 @@
-from typing import TypedDict, List, Dict, Any, Optional
+import operator
+from typing import TypedDict, List, Dict, Any, Optional, Annotated
 
 class HealthCoPilotState(TypedDict):
     image_path: str
+    image_paths: Optional[List[str]]  # Every label panel (front/back/side) when several were uploaded
     user_raw_health: str
     brand_name: str
     ingredients_list: List[str]
     nutrition_facts: Optional[Dict[str, Any]]  # Nutrition data from label
+    extraction_status: Optional[str]  # ok / low_confidence / unreadable
+    extraction_attempts: int  # Vision passes made on the label so far
+    enrichment_prefetch: Optional[Any]  # EnrichmentPrefetch started while the label was streaming
     user_clinical_profile: str
+    prescreen_result: Optional[Dict[str, Any]]  # Rule-based allergen/diet/nutrient-limit conflicts
     ingredient_knowledge_base: List[Dict[str, Any]]
     clinical_risk_analysis: str
     product_alternatives: List[str]
     final_conversational_insight: str
-    decision_color: Optional[str]  # Hex color for Quick Decision (green/yellow/red)
-
+    decision_color: Optional[str]  # Hex color for Quick Decision (green/yellow/orange/red, gray if unreadable)
+    decision: Optional[Dict[str, Any]]  # Scoring engine verdict (level, color, reasons, traffic lights)
+    deadline: Optional[float]  # Absolute request deadline (epoch seconds)
+    degraded_stages: Annotated[List[str], operator.add]  # Stages that fell back to degraded mode
@@ -0,0 +1,127 @@
+import re
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Designer sections in the order the prompt asks for them
+SECTION_HEADERS = ("Quick Decision", "Why This Matters To You", "Tradeoffs", "What I'm Unsure About", "Better Options")
+
+# "**Quick Decision:**" as prompted, also "**Quick Decision**:"; only complete headers match
+_HEADER_RE = re.compile(r"\*\*(" + "|".join(map(re.escape, SECTION_HEADERS)) + r")(?::\*\*|\*\*:)")
+
+Event = Tuple[str, Dict[str, Any]]
+StreamSink = Callable[[str, Dict[str, Any]], None]
+
+
+def stream_sink(config: Optional[Dict[str, Any]]) -> Optional[StreamSink]:
+    """The `stream_sink(event, data)` callback passed via the graph's configurable, if any"""
+    return ((config or {}).get("configurable") or {}).get("stream_sink")
+
+
+def emit(config: Optional[Dict[str, Any]], event: str, data: Dict[str, Any]):
+    sink = stream_sink(config)
+    if sink is not None:
+        sink(event, data)
+
+
+def chunk_text(chunk: Any) -> str:
+    """Text of a LangChain message chunk (content may be a string or a list of parts)"""
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, list):
+        return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return content or ""
+
+
+class SectionParser:
+    """
+    Finds designer section headers in streamed text as it arrives.
+
+    `feed` returns ("section", {"name"}) when a header completes and
+    ("section_complete", {"name", "text"}) for the section it closes; a header
+    split across chunks is reported once its last character arrives.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._scan_from = 0
+        self._current: Optional[str] = None
+        self._current_start = 0
+
+    def feed(self, chunk: str) -> List[Event]:
+        events: List[Event] = []
+        if not chunk:
+            return events
+        self.text += chunk
+        # Scan everything after the last header, so a header split across chunks is found later
+        for match in _HEADER_RE.finditer(self.text, self._scan_from):
+            events.extend(self._close_current(match.start()))
+            self._current, self._current_start = match.group(1), match.end()
+            self._scan_from = match.end()
+            events.append(("section", {"name": self._current}))
+        return events
+
+    def close(self) -> List[Event]:
+        """Completes the last open section"""
+        return self._close_current(len(self.text))
+
+    def _close_current(self, end: int) -> List[Event]:
+        if self._current is None:
+            return []
+        name, self._current = self._current, None
+        return [("section_complete", {"name": name, "text": self.text[self._current_start:end].strip()})]
+
+
+def _string_end(text: str, start: int) -> int:
+    """Index of the unescaped quote closing a JSON string whose body starts at `start` (-1 if not yet seen)"""
+    i = start
+    while True:
+        i = text.find('"', i)
+        if i < 0:
+            return -1
+        backslashes = 0
+        while i - backslashes - 1 >= start and text[i - backslashes - 1] == "\\":
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return i
+        i += 1
+
+
+class JsonArrayStreamParser:
+    """
+    Reports the strings of one JSON array (e.g. `"ingredients": [...]`) from
+    streamed model output as each string closes, long before the whole
+    document can be parsed. Non-string items are skipped.
+    """
+
+    def __init__(self, key: str = "ingredients"):
+        self._key_re = re.compile(r'"' + re.escape(key) + r'"\s*:\s*\[')
+        self.text = ""
+        self._pos: Optional[int] = None  # Next unread index inside the array
+        self._closed = False
+
+    def feed(self, chunk: str) -> List[str]:
+        items: List[str] = []
+        self.text += chunk
+        if self._closed:
+            return items
+        if self._pos is None:
+            match = self._key_re.search(self.text)
+            if not match:
+                return items
+            self._pos = match.end()
+        while self._pos < len(self.text):
+            char = self.text[self._pos]
+            if char == "]":
+                self._closed = True
+                break
+            if char != '"':
+                self._pos += 1
+                continue
+            end = _string_end(self.text, self._pos + 1)
+            if end < 0:
+                break  # String still streaming
+            try:
+                items.append(json.loads(self.text[self._pos:end + 1]))
+            except ValueError:
+                pass
+            self._pos = end + 1
+        return items
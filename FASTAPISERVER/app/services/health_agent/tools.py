@@ -1,90 +1,91 @@
 import os
-import cv2
+import re
 import json
-import base64
 import asyncio
+import contextvars
+import threading
+import concurrent.futures
 import aiohttp
 import requests
-from bs4 import BeautifulSoup
-from typing import List, Optional
+from collections import Counter
+from urllib.parse import quote, urlparse
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
 from pydantic import BaseModel, Field
 from langchain_google_genai import ChatGoogleGenerativeAI
 from groq import Groq
 from app.config.settings import settings
-from app.utils.logger import logger
+from app.services.governor import governor, estimate_tokens, GovernorTimeout
+from app.services.shared_cache import (
+    cache_key,
+    extraction_cache,
+    file_digest,
+    off_ingredient_cache,
+    wikipedia_cache,
+)
+from app.services.resilience import (
+    TRANSIENT_ERRORS,
+    TTLCache,
+    TTLSet,
+    UpstreamError,
+    is_transient_status,
+    resilient_call,
+    resilient_call_async,
+)
+from .deadline import Deadline
+from .prompts import off_summary
+from .scoring import parse_serving_size
+from .streaming import JsonArrayStreamParser
+from app.utils.logger import log_payload, logger
+from app.utils.tracing import annotate, span
+from app.utils.metrics import metrics
+from app.utils.executors import executors
+from app.utils import cpu_tasks
 
+# Max completion tokens requested from the vision model
+LABEL_EXTRACTION_MAX_TOKENS = 2048
 
-class NutritionFacts(BaseModel):
-    """Nutrition facts from the label"""
-    serving_size: Optional[str] = Field(default=None, description="Serving size (e.g., '50g', '1 cup')")
-    calories: Optional[int] = Field(default=None, description="Calories per serving")
-    total_fat_g: Optional[float] = Field(default=None, description="Total fat in grams")
-    saturated_fat_g: Optional[float] = Field(default=None, description="Saturated fat in grams")
-    sodium_mg: Optional[int] = Field(default=None, description="Sodium in milligrams")
-    carbohydrates_g: Optional[float] = Field(default=None, description="Total carbohydrates in grams")
-    fiber_g: Optional[float] = Field(default=None, description="Dietary fiber in grams")
-    sugars_g: Optional[float] = Field(default=None, description="Sugars in grams")
-    protein_g: Optional[float] = Field(default=None, description="Protein in grams")
+# Per-call timeout caps (seconds); a request deadline can only shorten them
+VISION_TIMEOUT = 60
+WIKIPEDIA_TIMEOUT = 5
+OFF_INGREDIENT_TIMEOUT = 5
+OFF_CATEGORY_TIMEOUT = 1
+OFF_ALTERNATIVES_TIMEOUT = 10
 
+WIKIPEDIA_BASE_URL = settings.wikipedia_base_url.rstrip("/")
+# Circuit breaker key: host[:port], so stand-ins sharing a machine keep separate circuits
+WIKIPEDIA_HOST = urlparse(WIKIPEDIA_BASE_URL).netloc
+# REST summary: the lead extract as ~1-2 KB of JSON instead of a 100+ KB article; redirects are followed
+WIKIPEDIA_SUMMARY_URL = f"{WIKIPEDIA_BASE_URL}/api/rest_v1/page/summary/{{title}}"
+WIKIPEDIA_HEADERS = {"User-Agent": "IngrediSense/1.0 (food label analysis)", "Accept": "application/json"}
+# Tried once when an ingredient name lands on a disambiguation page ("Salt", "Starch")
+WIKIPEDIA_DISAMBIGUATION_SUFFIX = " (food)"
+# Client errors that mean the host is unreachable (these count against its circuit breaker)
+WIKIPEDIA_TRANSIENT_ERRORS = TRANSIENT_ERRORS + (aiohttp.ClientConnectionError,)
 
-class LabelExtraction(BaseModel):
-    brand: str = Field(
-        description="Primary brand or manufacturer name as printed on the product label"
-    )
-    ingredients: List[str] = Field(
-        description="Ordered list of ingredients exactly as declared on the label, excluding quantities, addresses, claims, or marketing text"
-    )
-    nutrition: Optional[NutritionFacts] = Field(
-        default=None,
-        description="Nutrition facts from the nutrition table if visible on the label"
-    )
+OFF_SEARCH_URL = f"{settings.openfoodfacts_base_url.rstrip('/')}/cgi/search.pl"
+OFF_CATEGORY_URL = f"{settings.openfoodfacts_category_base_url.rstrip('/')}/category/{{category}}.json"
+# Same for the blocking OpenFoodFacts calls
+OFF_TRANSIENT_ERRORS = TRANSIENT_ERRORS + (requests.ConnectionError, requests.Timeout)
 
+# Label extraction outcomes used to route the graph after the extract node
+EXTRACTION_OK = "ok"
+EXTRACTION_LOW_CONFIDENCE = "low_confidence"
+EXTRACTION_UNREADABLE = "unreadable"
 
-class IngredientProfile(BaseModel):
-    name: str = Field(
-        description="Standardized ingredient name used for scientific and regulatory reference"
-    )
-    manufacturing: str = Field(
-        description="Production origin of the ingredient such as natural, synthetic, fermented, or ultra-processed"
-    )
-    regulatory_gap: str = Field(
-        description="Differences or concerns in regulatory approval, bans, warnings, or limits across regions or countries"
-    )
-    health_risks: str = Field(
-        description="Summary of known or suspected health effects based on clinical, epidemiological, or toxicological evidence"
-    )
-    nova_score: int = Field(
-        description="NOVA food classification score indicating degree of processing (1=minimally processed, 4=ultra-processed)"
-    )
+# Ingredient enrichment started while the vision model is still writing the label JSON
+_prefetch_executor = executors.thread_pool("enrich-prefetch", settings.prefetch_workers)
 
+# Vision passes over the panels of one multi-image label
+_panel_executor = executors.thread_pool("label-panel", settings.label_panel_workers)
 
-class ProHealthTools:
-    def __init__(self, llm: ChatGoogleGenerativeAI):
-        self.llm = llm  # Store base LLM for batch analysis
-        self.label_llm = llm.with_structured_output(LabelExtraction)
-        self.profile_llm = llm.with_structured_output(IngredientProfile)
-        # Initialize Groq client for vision (FREE & FAST!)
-        self.groq_client = Groq(api_key=settings.groq_api_key)
+# Negative caches: page titles with no Wikipedia summary / brands OpenFoodFacts has no product for
+wikipedia_misses = TTLSet(settings.negative_cache_ttl_seconds, settings.negative_cache_max_entries)
+off_category_misses = TTLSet(settings.negative_cache_ttl_seconds, settings.negative_cache_max_entries)
 
-    def extract_label_data(self, image_path: str) -> LabelExtraction:
-        """Extract brand, ingredients AND nutrition facts from food label using Groq Llama 4 Scout Vision"""
-        try:
-            # Read and encode image to base64
-            with open(image_path, "rb") as image_file:
-                image_data = base64.b64encode(image_file.read()).decode('utf-8')
-            
-            logger.info(f"Processing image with Groq Llama 4 Scout Vision: {image_path}")
-            
-            # Create vision prompt for Llama 4 Scout (UPDATED TO EXTRACT NUTRITION FACTS)
-            response = self.groq_client.chat.completions.create(
-                model="meta-llama/llama-4-scout-17b-16e-instruct",  # Current Groq vision model
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": """Look at this food label image CAREFULLY - scan ALL parts of the package including:
+# Wikipedia summary extracts by page title; the in-process tier in front of wikipedia_cache
+wikipedia_summaries = TTLCache(settings.ingredient_cache_ttl_seconds, settings.wikipedia_cache_max_entries)
+
+LABEL_EXTRACTION_PROMPT = """Look at this food label image CAREFULLY - scan ALL parts of the package including:
 - Left side
 - Right side  
 - Back panel
@@ -139,30 +140,177 @@ CRITICAL:
 - Only use null/0 if data is truly NOT visible anywhere on the label
 - Extract actual numbers from the table, don't estimate
 - Look carefully at ALL parts of the package image"""
+
+
+class NutritionFacts(BaseModel):
+    """Nutrition facts from the label"""
+    serving_size: Optional[str] = Field(default=None, description="Serving size (e.g., '50g', '1 cup')")
+    calories: Optional[int] = Field(default=None, description="Calories per serving")
+    total_fat_g: Optional[float] = Field(default=None, description="Total fat in grams")
+    saturated_fat_g: Optional[float] = Field(default=None, description="Saturated fat in grams")
+    sodium_mg: Optional[int] = Field(default=None, description="Sodium in milligrams")
+    carbohydrates_g: Optional[float] = Field(default=None, description="Total carbohydrates in grams")
+    fiber_g: Optional[float] = Field(default=None, description="Dietary fiber in grams")
+    sugars_g: Optional[float] = Field(default=None, description="Sugars in grams")
+    protein_g: Optional[float] = Field(default=None, description="Protein in grams")
+
+
+class LabelExtraction(BaseModel):
+    brand: str = Field(
+        description="Primary brand or manufacturer name as printed on the product label"
+    )
+    ingredients: List[str] = Field(
+        description="Ordered list of ingredients exactly as declared on the label, excluding quantities, addresses, claims, or marketing text"
+    )
+    nutrition: Optional[NutritionFacts] = Field(
+        default=None,
+        description="Nutrition facts from the nutrition table if visible on the label"
+    )
+
+
+class IngredientProfile(BaseModel):
+    name: str = Field(
+        description="Standardized ingredient name used for scientific and regulatory reference"
+    )
+    manufacturing: str = Field(
+        description="Production origin of the ingredient such as natural, synthetic, fermented, or ultra-processed"
+    )
+    regulatory_gap: str = Field(
+        description="Differences or concerns in regulatory approval, bans, warnings, or limits across regions or countries"
+    )
+    health_risks: str = Field(
+        description="Summary of known or suspected health effects based on clinical, epidemiological, or toxicological evidence"
+    )
+    nova_score: int = Field(
+        description="NOVA food classification score indicating degree of processing (1=minimally processed, 4=ultra-processed)"
+    )
+
+
+def _same_serving(a: Optional[str], b: Optional[str]) -> bool:
+    """Whether two serving sizes describe the same amount (unknown matches anything)"""
+    if not a or not b:
+        return True
+    grams_a, grams_b = parse_serving_size(a)[0], parse_serving_size(b)[0]
+    if grams_a and grams_b:
+        return abs(grams_a - grams_b) < 0.5
+    return a.strip().lower() == b.strip().lower()
+
+
+# Label noise around an ingredient name: "(12%)", "[E621]", "3.5%", trailing punctuation
+_LABEL_NOISE_RE = re.compile(r"\([^)]*\)|\[[^\]]*\]|\d+(?:[.,]\d+)?\s*%")
+
+
+def off_cache_key(ingredient: str) -> str:
+    """Shared-cache key of an ingredient's OpenFoodFacts product"""
+    return ingredient.strip().lower()
+
+
+def wikipedia_title(ingredient: str) -> str:
+    """Wikipedia page title for a label ingredient: 'PALM OIL (12%)' -> 'Palm oil', acronyms like MSG kept"""
+    words = _LABEL_NOISE_RE.sub(" ", ingredient).strip(" .,;:*-").split()
+    # An all-caps label ("PALM OIL") says nothing about acronyms, unless it is a single word ("MSG")
+    keep_acronyms = len(words) == 1 or not ingredient.isupper()
+    words = [w if keep_acronyms and w.isupper() and len(w) <= 4 else w.lower() for w in words]
+    if not words:
+        return ""
+    return words[0][:1].upper() + " ".join(words)[1:]
+
+
+def local_wikipedia(key: str) -> Optional[str]:
+    """Summary held by this process ("" for a known miss), or None"""
+    if key in wikipedia_misses:
+        return ""
+    return wikipedia_summaries.get(key)
+
+
+def remember_wikipedia(key: str, text: str):
+    """Keep a summary ("" for a miss) in this process, in front of the shared cache"""
+    if text:
+        wikipedia_summaries.set(key, text)
+    else:
+        wikipedia_misses.add(key)
+
+
+class StreamedCompletion(NamedTuple):
+    """Text assembled from a streamed chat completion, plus its reported usage"""
+    text: str
+    usage: Any = None
+
+
+class ProHealthTools:
+    def __init__(self, llm: ChatGoogleGenerativeAI, research_llm: Optional[ChatGoogleGenerativeAI] = None):
+        self.llm = research_llm or llm  # Store base LLM for batch analysis
+        self.label_llm = llm.with_structured_output(LabelExtraction)
+        self.profile_llm = llm.with_structured_output(IngredientProfile)
+        # Initialize Groq client for vision (FREE & FAST!)
+        self.groq_client = Groq(api_key=settings.groq_api_key, base_url=settings.groq_base_url)
+
+    def extract_label_data(
+        self,
+        image_path: str,
+        deadline: Optional[Deadline] = None,
+        preprocess: bool = False,
+        on_ingredient: Optional[Callable[[str], None]] = None,
+        model: Optional[str] = None
+    ) -> LabelExtraction:
+        """
+        Extract brand, ingredients AND nutrition facts from food label using a Groq vision model
+        (VISION_MODEL unless `model` is given)
+        
+        With preprocess=True the image is cleaned up first (grayscale, upscale,
+        contrast equalization); used to retry labels the first pass couldn't read.
+        The response is streamed and `on_ingredient` is called with each
+        ingredient as soon as the model has written it.
+        """
+        deadline = deadline or Deadline(None)
+        try:
+            # Read and encode image to base64 (in the CPU worker pool)
+            if preprocess:
+                image_data, mime_type = executors.run_cpu(cpu_tasks.preprocess_and_encode, image_path), "image/png"
+            else:
+                image_data = executors.run_cpu(cpu_tasks.encode_image_file, image_path, size=os.path.getsize(image_path))
+                mime_type = "image/jpeg"
+            
+            model = model or settings.vision_model
+            logger.info(f"Processing image with Groq vision model {model}: {image_path} (preprocessed: {preprocess})")
+            
+            # Create vision prompt (UPDATED TO EXTRACT NUTRITION FACTS)
+            response = governor.call(
+                "groq",
+                self._stream_completion,
+                on_ingredient,
+                tokens=estimate_tokens(LABEL_EXTRACTION_PROMPT) + LABEL_EXTRACTION_MAX_TOKENS,
+                wait_timeout=deadline.budget(),
+                timeout=deadline.timeout(VISION_TIMEOUT),
+                model=model,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": LABEL_EXTRACTION_PROMPT
                             },
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/jpeg;base64,{image_data}"
+                                    "url": f"data:{mime_type};base64,{image_data}"
                                 }
                             }
                         ]
                     }
                 ],
                 temperature=0.1,
-                max_tokens=2048
+                max_tokens=LABEL_EXTRACTION_MAX_TOKENS
             )
             
-            # Debug: Log the full response
-            logger.info(f"Groq API Response Object: {response}")
-            
-            extracted_text = response.choices[0].message.content.strip()
-            logger.info(f"Groq Vision raw response text: {extracted_text}")
+            extracted_text = response.text.strip()
+            log_payload("Groq Vision raw response", model=model, text=extracted_text)
             
             # Parse the JSON response - IMPROVED PARSING
             # Handle case where Groq adds explanatory text before the JSON
             if "```" in extracted_text:
-                logger.info("Detected code block, extracting JSON...")
+                logger.debug("Detected code block, extracting JSON...")
                 # Find the JSON block - it's between ``` markers
                 parts = extracted_text.split("```")
                 if len(parts) >= 2:
@@ -172,13 +320,12 @@ CRITICAL:
                     if json_block.strip().startswith("json"):
                         json_block = json_block.strip()[4:]
                     extracted_text = json_block.strip()
-                    logger.info(f"Extracted JSON from code block: {extracted_text[:200]}...")
+                    logger.debug(f"Extracted JSON from code block ({len(extracted_text)} chars)")
             
             # Try to parse JSON directly
             try:
-                logger.info("Attempting to parse JSON response...")
                 data = json.loads(extracted_text)
-                logger.info(f"Successfully parsed JSON: {data}")
+                log_payload("Parsed Groq Vision JSON", data=data)
                 
                 brand = data.get("brand", "Unknown")
                 ingredients = data.get("ingredients", [])
@@ -210,7 +357,7 @@ CRITICAL:
                 Extract brand, ingredients, and nutrition facts from this text:
                 {extracted_text}
                 """
-                result = self.label_llm.invoke(parse_prompt)
+                result = governor.invoke_llm(self.label_llm, parse_prompt, timeout=deadline.budget())
                 logger.info(f"Fallback extraction result: Brand={result.brand}, Ingredients={len(result.ingredients)}")
                 return result
             
@@ -222,73 +369,402 @@ CRITICAL:
             logger.error(f"Traceback: {traceback.format_exc()}")
             return LabelExtraction(brand="Unknown", ingredients=[], nutrition=None)
 
+    def extract_label_cascade(
+        self,
+        image_paths: List[str],
+        deadline: Optional[Deadline] = None,
+        preprocess: bool = False,
+        on_ingredient: Optional[Callable[[str], None]] = None
+    ) -> LabelExtraction:
+        """
+        Read the label panels with the fast VISION_MODEL; re-read them with
+        VISION_ESCALATION_MODEL only when the merged result fails validation
+        (no ingredients, implausible nutrition values) and time allows.
+        
+        Results that pass validation are cached by image content, so a label
+        photographed once is read once across all workers.
+        """
+        deadline = deadline or Deadline(None)
+        key = cache_key(file_digest(image_paths), preprocess, settings.vision_model, settings.vision_escalation_model)
+        cached = extraction_cache.get(key)
+        annotate(images=len(image_paths), extraction_cache_hit=cached is not None)
+        if cached is not None:
+            data = LabelExtraction(**cached)
+            logger.info(f"Label extraction served from cache: {data.brand}, {len(data.ingredients)} ingredients")
+            if on_ingredient is not None:
+                for ingredient in data.ingredients:
+                    on_ingredient(ingredient)
+            return data
+        data = self._read_label(image_paths, deadline, preprocess, on_ingredient)
+        if not self.extraction_issues(data):
+            extraction_cache.set(key, data.model_dump())
+        return data
+
+    def _read_label(
+        self,
+        image_paths: List[str],
+        deadline: Deadline,
+        preprocess: bool,
+        on_ingredient: Optional[Callable[[str], None]]
+    ) -> LabelExtraction:
+        """The vision cascade behind `extract_label_cascade`"""
+        data = self._extract_panels(image_paths, deadline, preprocess, on_ingredient)
+        issues = self.extraction_issues(data)
+        escalation = settings.vision_escalation_model
+        if not issues or not escalation or escalation == settings.vision_model:
+            return data
+        if not deadline.allows("extraction_escalation"):
+            deadline.degrade("extraction_escalation")
+            return data
+        
+        logger.info(f"Escalating label extraction to {escalation}: {'; '.join(issues)}")
+        metrics.increment("vision_escalations_total")
+        stronger = self._extract_panels(image_paths, deadline, preprocess, on_ingredient, model=escalation)
+        stronger_issues = self.extraction_issues(stronger)
+        if len(stronger_issues) <= len(issues):
+            return stronger
+        logger.info(f"Escalated extraction was worse ({'; '.join(stronger_issues)}), keeping the first result")
+        return data
+
+    def _extract_panels(
+        self,
+        image_paths: List[str],
+        deadline: Deadline,
+        preprocess: bool,
+        on_ingredient: Optional[Callable[[str], None]],
+        model: Optional[str] = None
+    ) -> LabelExtraction:
+        """One vision pass per panel, run concurrently and merged into a single extraction"""
+        if len(image_paths) == 1:
+            return self.extract_label_data(image_paths[0], deadline, preprocess, on_ingredient, model=model)
+        futures = [
+            _panel_executor.submit(
+                contextvars.copy_context().run,
+                self.extract_label_data, path, deadline, preprocess, on_ingredient, model
+            )
+            for path in image_paths
+        ]
+        return self.merge_extractions([future.result() for future in futures])
+
+    def merge_extractions(self, results: List[LabelExtraction]) -> LabelExtraction:
+        """
+        Combine per-panel extractions (front, back, side) into one label.
+        
+        Brand: the most common readable brand (earlier panels win ties).
+        Ingredients: the longest list, plus items only other panels show.
+        Nutrition: the panel with the most values wins conflicts; its gaps are
+        filled from panels that list the same (or no) serving size.
+        """
+        brands = [r.brand.strip() for r in results if r.brand and r.brand.strip().lower() not in ("", "unknown")]
+        votes = Counter(b.lower() for b in brands)
+        brand = max(brands, key=lambda b: votes[b.lower()]) if brands else "Unknown"
+        
+        by_length = sorted(results, key=lambda r: len(r.ingredients), reverse=True)
+        ingredients = list(by_length[0].ingredients)
+        seen = {ing.strip().lower() for ing in ingredients}
+        for result in by_length[1:]:
+            for ing in result.ingredients:
+                key = ing.strip().lower()
+                if key and key not in seen:
+                    seen.add(key)
+                    ingredients.append(ing)
+        
+        def listed(nutrition: NutritionFacts) -> dict:
+            return {k: v for k, v in nutrition.dict().items() if v not in (None, 0, "")}
+        
+        panels = sorted((listed(r.nutrition) for r in results if r.nutrition), key=len, reverse=True)
+        nutrition = None
+        if panels:
+            merged, conflicts = dict(panels[0]), []
+            for values in panels[1:]:
+                if not _same_serving(merged.get("serving_size"), values.get("serving_size")):
+                    continue  # Per-serving values for a different serving can't be mixed in
+                for key, value in values.items():
+                    if key not in merged:
+                        merged[key] = value
+                    elif merged[key] != value:
+                        conflicts.append(key)
+            if conflicts:
+                logger.info(f"Nutrition conflicts across panels (kept the fullest panel's values): {', '.join(sorted(set(conflicts)))}")
+            nutrition = NutritionFacts(**merged)
+        
+        logger.info(f"Merged {len(results)} label panels - Brand: {brand}, Ingredients: {len(ingredients)}, Has Nutrition: {nutrition is not None}")
+        return LabelExtraction(brand=brand, ingredients=ingredients, nutrition=nutrition)
+
+    def _stream_completion(self, on_ingredient: Optional[Callable[[str], None]], **kwargs) -> StreamedCompletion:
+        """Streamed Groq chat completion; reports each ingredient as soon as its JSON string closes"""
+        parser = JsonArrayStreamParser("ingredients")
+        usage = None
+        for chunk in self.groq_client.chat.completions.create(stream=True, **kwargs):
+            # Groq reports usage on the final chunk (under x_groq)
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or getattr(chunk, "usage", None) or usage
+            if not chunk.choices:
+                continue
+            ingredients = parser.feed(chunk.choices[0].delta.content or "")
+            if on_ingredient:
+                for ingredient in ingredients:
+                    on_ingredient(ingredient)
+        return StreamedCompletion(parser.text, usage)
+
+    def extraction_issues(self, data: LabelExtraction) -> List[str]:
+        """Validation problems that justify asking a stronger vision model (empty list = plausible)"""
+        issues = []
+        if not data.ingredients:
+            issues.append("no ingredients")
+        nutrition = data.nutrition
+        if nutrition is None:
+            return issues
+        
+        values = {k: v for k, v in nutrition.dict().items() if isinstance(v, (int, float))}
+        if any(v < 0 for v in values.values()):
+            issues.append("negative nutrition values")
+        fat, carbs, protein = (values.get(k) or 0 for k in ("total_fat_g", "carbohydrates_g", "protein_g"))
+        if (nutrition.saturated_fat_g or 0) > fat + 0.5:
+            issues.append("saturated fat above total fat")
+        if (nutrition.sugars_g or 0) > carbs + 0.5:
+            issues.append("sugars above carbohydrates")
+        grams, _ = parse_serving_size(nutrition.serving_size)
+        if grams and fat + carbs + protein > grams * 1.05:
+            issues.append("macros heavier than the serving")
+        # Energy should roughly match 9/4/4 kcal per gram of fat/carbs/protein
+        expected = 9 * fat + 4 * carbs + 4 * protein
+        calories = nutrition.calories or 0
+        if calories and expected and abs(calories - expected) > max(50, 0.5 * max(calories, expected)):
+            issues.append(f"calories ({calories}) don't match macros (~{expected:.0f})")
+        if (nutrition.sodium_mg or 0) > 5000:
+            issues.append("implausible sodium")
+        return issues
+
+    def assess_extraction(self, data: LabelExtraction) -> str:
+        """
+        Classify an extraction as ok, low_confidence or unreadable.
+        
+        Unreadable: neither ingredients nor nutrition facts were found.
+        Low confidence: most "ingredients" are OCR debris (no letters or 1-2 characters).
+        """
+        if not data.ingredients and data.nutrition is None:
+            return EXTRACTION_UNREADABLE
+        debris = [ing for ing in data.ingredients if len(ing.strip()) < 3 or not any(c.isalpha() for c in ing)]
+        if data.ingredients and len(debris) * 2 > len(data.ingredients):
+            return EXTRACTION_LOW_CONFIDENCE
+        return EXTRACTION_OK
+
     def fetch_clinical_evidence(self, ingredient: str) -> IngredientProfile:
         """Fetch clinical evidence and health information for an ingredient (legacy single-ingredient method)"""
         # This method is kept for backwards compatibility but not used in the main workflow
         return self.fetch_clinical_evidence_batch([ingredient])[0]
 
-    async def _fetch_wikipedia_async(self, session: aiohttp.ClientSession, ingredient: str) -> tuple[str, str]:
-        """Async fetch Wikipedia data for a single ingredient"""
+    async def _get_wikipedia_summary(self, session: aiohttp.ClientSession, title: str, timeout: float,
+                                     deadline: Optional[Deadline]) -> Optional[dict]:
+        """REST summary JSON for a page title (None if there is no such page)"""
+        url = WIKIPEDIA_SUMMARY_URL.format(title=quote(title.replace(" ", "_"), safe=""))
+
+        async def _get() -> Optional[dict]:
+            permit = await governor.acquire_async("wikipedia", timeout=timeout)
+            with permit:
+                async with session.get(url, headers=WIKIPEDIA_HEADERS,
+                                       timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                    if is_transient_status(response.status):
+                        raise UpstreamError(f"Wikipedia returned {response.status}")
+                    if response.status == 404:
+                        return None
+                    response.raise_for_status()
+                    body = await response.read()
+            metrics.observe("wikipedia_response_bytes", len(body))
+            return json.loads(body)
+
+        return await resilient_call_async(WIKIPEDIA_HOST, _get, deadline=deadline, transient=WIKIPEDIA_TRANSIENT_ERRORS)
+
+    async def _fetch_wikipedia_async(self, session: aiohttp.ClientSession, ingredient: str, timeout: float = WIKIPEDIA_TIMEOUT,
+                                     deadline: Optional[Deadline] = None) -> tuple[str, str]:
+        """Async fetch of the Wikipedia summary for a single ingredient (cached by page title)"""
+        title = wikipedia_title(ingredient)
+        if not title:
+            return ingredient, ""
+        key = title.lower()
+        cached = local_wikipedia(key)
+        if cached is None:
+            cached = wikipedia_cache.get(key)
+            if cached is not None:
+                remember_wikipedia(key, cached)
+        annotate(wikipedia_cache_hit=cached is not None)
+        if cached is not None:
+            return ingredient, cached
+        return await self._download_wikipedia_async(session, ingredient, title, timeout, deadline)
+
+    async def _download_wikipedia_async(self, session: aiohttp.ClientSession, ingredient: str, title: str,
+                                        timeout: float, deadline: Optional[Deadline]) -> tuple[str, str]:
+        """Fetch a page summary from Wikipedia and cache it (or the miss) under the page title"""
+        key = title.lower()
         try:
-            wiki_url = f"https://en.wikipedia.org/wiki/{ingredient.replace(' ', '_')}"
-            async with session.get(wiki_url, timeout=aiohttp.ClientTimeout(total=5)) as response:
-                html = await response.text()
-                soup = BeautifulSoup(html, "lxml")
-                wiki_text = " ".join(p.text for p in soup.select("p")[:3])
-                logger.debug(f"Fetched Wikipedia data for {ingredient}")
+            for candidate in (title, title + WIKIPEDIA_DISAMBIGUATION_SUFFIX):
+                summary = await self._get_wikipedia_summary(session, candidate, timeout, deadline)
+                if summary is None:
+                    break
+                if summary.get("type") == "disambiguation":
+                    logger.debug(f"Wikipedia page {candidate!r} is a disambiguation page")
+                    continue
+                wiki_text = summary.get("extract", "")
+                remember_wikipedia(key, wiki_text)
+                wikipedia_cache.set(key, wiki_text)
+                logger.debug(f"Fetched Wikipedia summary for {ingredient} ({summary.get('title', candidate)})")
                 return ingredient, wiki_text
+            # Remember the miss so this page is not fetched again
+            remember_wikipedia(key, "")
+            wikipedia_cache.set(key, "", ttl_seconds=settings.negative_cache_ttl_seconds)
+            logger.debug(f"No Wikipedia page for {ingredient}")
+            return ingredient, ""
         except Exception as e:
             logger.debug(f"Could not fetch Wikipedia data for {ingredient}: {e}")
             return ingredient, ""
     
-    async def _fetch_all_wikipedia_async(self, ingredients: List[str]) -> dict[str, str]:
-        """Fetch Wikipedia data for all ingredients in parallel"""
-        async with aiohttp.ClientSession() as session:
-            tasks = [self._fetch_wikipedia_async(session, ing) for ing in ingredients]
-            results = await asyncio.gather(*tasks)
-            return {ing: text for ing, text in results}
-
-    def fetch_clinical_evidence_batch(self, ingredients: List[str]) -> List[IngredientProfile]:
-        """Fetch clinical evidence for multiple ingredients in a single AI call (optimized)"""
+    async def _fetch_all_wikipedia_async(self, ingredients: List[str], timeout: float = WIKIPEDIA_TIMEOUT,
+                                         deadline: Optional[Deadline] = None) -> dict[str, str]:
+        """
+        Fetch Wikipedia data for all ingredients in parallel
+
+        Titles are looked up in this process first, then the rest in the
+        shared cache in one batched read (one round trip per cache node); only
+        the misses go to Wikipedia.
+        """
+        with span("wikipedia.batch", ingredients=len(ingredients)) as batch:
+            titles = {ing: wikipedia_title(ing) for ing in ingredients}
+            keys = {title.lower() for title in titles.values() if title}
+            cached = {key: text for key, text in ((key, local_wikipedia(key)) for key in keys) if text is not None}
+            shared = wikipedia_cache.get_many(key for key in keys if key not in cached)
+            for key, text in shared.items():
+                remember_wikipedia(key, text)
+            cached.update(shared)
+            wiki_data = {ing: cached.get(title.lower(), "") for ing, title in titles.items() if not title or title.lower() in cached}
+            misses = [ing for ing in ingredients if ing not in wiki_data]
+            batch.set(cache_hits=len(cached), fetched=len(misses))
+            if not misses:
+                return wiki_data
+            async with aiohttp.ClientSession() as session:
+                tasks = [self._download_wikipedia_async(session, ing, titles[ing], timeout, deadline) for ing in misses]
+                results = await asyncio.gather(*tasks)
+            wiki_data.update(results)
+            return wiki_data
+    
+    def _off_get(self, url: str, timeout: float, deadline: Deadline, **kwargs):
+        """GET an OpenFoodFacts URL through its circuit breaker, retry policy and the rate governor"""
+        return resilient_call(
+            urlparse(url).netloc,
+            governor.call, "openfoodfacts", requests.get, url,
+            timeout=timeout, wait_timeout=timeout, deadline=deadline, transient=OFF_TRANSIENT_ERRORS, **kwargs
+        )
+
+    def _fetch_off_ingredient(self, ingredient: str, deadline: Deadline, check_cache: bool = True) -> dict:
+        """First OpenFoodFacts product matching an ingredient name ({} on any failure)"""
+        key = off_cache_key(ingredient)
+        if check_cache:
+            cached = off_ingredient_cache.get(key)
+            annotate(off_cache_hit=cached is not None)
+            if cached is not None:
+                return cached
+        try:
+            off_url = f"{OFF_SEARCH_URL}?search_terms={ingredient}&json=1"
+            off_timeout = deadline.timeout(OFF_INGREDIENT_TIMEOUT)
+            off_data = self._off_get(off_url, off_timeout, deadline).json().get("products", [{}])[0]
+            logger.debug(f"Fetched OpenFoodFacts data for {ingredient}")
+            if off_data:
+                off_ingredient_cache.set(key, off_data)
+            return off_data
+        except Exception as e:
+            logger.debug(f"Could not fetch OpenFoodFacts data for {ingredient}: {e}")
+            return {}
+
+    def enrich_ingredient(self, ingredient: str, deadline: Deadline,
+                          cancelled: Optional[threading.Event] = None) -> tuple[str, dict]:
+        """Wikipedia text and OpenFoodFacts product for one ingredient (blocking); `cancelled` skips what is left"""
+        async def _wikipedia() -> tuple[str, str]:
+            async with aiohttp.ClientSession() as session:
+                return await self._fetch_wikipedia_async(session, ingredient, deadline.timeout(WIKIPEDIA_TIMEOUT), deadline)
+        
+        with span("enrich", ingredient=ingredient, prefetch=True):
+            _, wiki_text = asyncio.run(_wikipedia())
+            wanted = deadline.allows("enrichment") and not (cancelled is not None and cancelled.is_set())
+            off_data = self._fetch_off_ingredient(ingredient, deadline) if wanted else {}
+            return wiki_text, off_data
+
+    def fetch_clinical_evidence_batch(
+        self,
+        ingredients: List[str],
+        deadline: Optional[Deadline] = None,
+        prefetch: Optional["EnrichmentPrefetch"] = None
+    ) -> List[IngredientProfile]:
+        """
+        Fetch clinical evidence for multiple ingredients in a single AI call (optimized)
+        
+        Ingredients already enriched by `prefetch` (started during label
+        extraction) reuse those results instead of being fetched again.
+        """
         if not ingredients:
             return []
+        deadline = deadline or Deadline(None)
         
         # Process all ingredients (no limit)
         logger.info(f"Batch analyzing {len(ingredients)} ingredients in single AI call")
         
-        # Fetch Wikipedia data for ALL ingredients in PARALLEL (async)
-        logger.info(f"Fetching Wikipedia data for {len(ingredients)} ingredients in parallel...")
-        start_time = __import__('time').time()
+        # Skip Wikipedia/OpenFoodFacts enrichment entirely when the request budget is low
+        enrich = deadline.allows("enrichment")
+        if not enrich:
+            deadline.degrade("enrichment")
         
-        # Run async Wikipedia fetching in separate thread to avoid event loop conflict
-        import concurrent.futures
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future = executor.submit(asyncio.run, self._fetch_all_wikipedia_async(ingredients))
-            wikipedia_data = future.result()
+        wikipedia_data = {}
+        prefetched = {}
+        missing = ingredients
+        if enrich and prefetch is not None:
+            prefetched = prefetch.results(ingredients)
+            missing = [ing for ing in ingredients if ing not in prefetched]
+            logger.info(f"Reusing prefetched enrichment for {len(prefetched)}/{len(ingredients)} ingredients")
+        if enrich and missing:
+            # Fetch Wikipedia data for ALL ingredients in PARALLEL (async)
+            logger.info(f"Fetching Wikipedia data for {len(missing)} ingredients in parallel...")
+            start_time = __import__('time').time()
+            
+            # Run async Wikipedia fetching in separate thread to avoid event loop conflict
+            # (copy the context so the request id reaches the rate governor)
+            with concurrent.futures.ThreadPoolExecutor() as executor:
+                context = contextvars.copy_context()
+                wiki_timeout = deadline.timeout(WIKIPEDIA_TIMEOUT)
+                future = executor.submit(context.run, asyncio.run, self._fetch_all_wikipedia_async(missing, wiki_timeout, deadline))
+                wikipedia_data = future.result()
+            
+            fetch_time = __import__('time').time() - start_time
+            logger.info(f"Wikipedia parallel fetch completed in {fetch_time:.2f} seconds")
         
-        fetch_time = __import__('time').time() - start_time
-        logger.info(f"Wikipedia parallel fetch completed in {fetch_time:.2f} seconds")
+        # One batched cache read for every product the loop below would look up
+        off_cached = {}
+        if enrich and missing:
+            off_cached = off_ingredient_cache.get_many(off_cache_key(ing) for ing in missing)
+        annotate(ingredients=len(ingredients), prefetched=len(prefetched), off_cache_hits=len(off_cached), enriched=enrich)
         
         # Gather contexts with Wikipedia data
         ingredient_contexts = []
         for ing in ingredients:
-            wiki_text = wikipedia_data.get(ing, "")
-            off_data = {}
-            
-            # Try to fetch OpenFoodFacts data (sequential, but fast)
-            try:
-                off_url = f"https://world.openfoodfacts.org/cgi/search.pl?search_terms={ing}&json=1"
-                off_data = requests.get(off_url, timeout=5).json().get("products", [{}])[0]
-                logger.debug(f"Fetched OpenFoodFacts data for {ing}")
-            except Exception as e:
-                logger.debug(f"Could not fetch OpenFoodFacts data for {ing}: {e}")
+            if ing in prefetched:
+                wiki_text, off_data = prefetched[ing]
+            else:
+                wiki_text, off_data = wikipedia_data.get(ing, ""), {}
+                
+                # Stop the sequential OpenFoodFacts lookups once the budget runs low
+                if enrich and not deadline.allows("enrichment"):
+                    enrich = False
+                    deadline.degrade("enrichment")
+                
+                # Try to fetch OpenFoodFacts data (sequential, but fast)
+                if off_cache_key(ing) in off_cached:
+                    off_data = off_cached[off_cache_key(ing)]
+                elif enrich:
+                    off_data = self._fetch_off_ingredient(ing, deadline, check_cache=False)
             
             # Build context string for this ingredient
             context = f"- {ing}"
             if wiki_text:
                 context += f"\n  Wikipedia: {wiki_text[:200]}..."
             if off_data:
-                context += f"\n  OpenFoodFacts: {json.dumps(off_data)[:100]}..."
+                context += f"\n  OpenFoodFacts: {off_summary(off_data)}"
             
             ingredient_contexts.append(context)
         
@@ -312,7 +788,7 @@ Use the provided scientific context from Wikipedia and OpenFoodFacts, plus your
         try:
             # Call AI once for all ingredients
             logger.info(f"Batch analyzing {len(ingredients)} ingredients in single AI call")
-            response = self.llm.invoke(prompt)
+            response = governor.invoke_llm(self.llm, prompt, timeout=deadline.budget())
             
             # Parse JSON response
             content = response.content.strip()
@@ -351,6 +827,8 @@ Use the provided scientific context from Wikipedia and OpenFoodFacts, plus your
             
         except Exception as e:
             logger.error(f"Error in batch ingredient analysis: {e}")
+            if isinstance(e, GovernorTimeout):
+                deadline.degrade("ingredient_analysis", str(e))
             # Return default profiles for all ingredients
             return [
                 IngredientProfile(
@@ -363,11 +841,12 @@ Use the provided scientific context from Wikipedia and OpenFoodFacts, plus your
                 for ing in ingredients
             ]
 
-    def get_product_category(self, brand_name: str, ingredients: List[str]) -> tuple:
+    def get_product_category(self, brand_name: str, ingredients: List[str], deadline: Optional[Deadline] = None) -> tuple:
         """
         Extract product category using Hybrid A+C approach.
         Returns: (category, method) where method is 'keyword', 'api', or 'fallback'
         """
+        deadline = deadline or Deadline(None)
         # CATEGORY DICTIONARY - Core 20 categories covering 90% of products
         CATEGORY_KEYWORDS = {
             # Snacks
@@ -413,15 +892,22 @@ Use the provided scientific context from Wikipedia and OpenFoodFacts, plus your
                 return category, 'keyword'
         
         # STEP 2: OpenFoodFacts API (Fallback - 10% of edge cases)
+        brand_key = brand_name.strip().lower()
+        if brand_key in off_category_misses:
+            # Known miss: don't spend another round trip on it
+            logger.warning(f"Could not detect category for '{brand_name}', using generic 'snacks'")
+            return 'snacks', 'fallback'
+        
         try:
             # Search for this product on OpenFoodFacts to get its category
-            search_url = "https://world.openfoodfacts.org/cgi/search.pl"
+            search_url = OFF_SEARCH_URL
             params = {
                 "search_terms": brand_name,
                 "page_size": 1,
                 "json": 1
             }
-            response = requests.get(search_url, params=params, timeout=1)  # Fast timeout for category detection
+            category_timeout = deadline.timeout(OFF_CATEGORY_TIMEOUT)  # Fast timeout for category detection
+            response = self._off_get(search_url, category_timeout, deadline, params=params)
             data = response.json()
             
             if data.get("products"):
@@ -433,6 +919,8 @@ Use the provided scientific context from Wikipedia and OpenFoodFacts, plus your
                     category_tag = categories[-1].replace("en:", "").replace("-", " ")
                     logger.info(f"Category '{category_tag}' detected via OpenFoodFacts API")
                     return category_tag, 'api'
+            else:
+                off_category_misses.add(brand_key)
         except Exception as e:
             logger.debug(f"OpenFoodFacts category lookup failed: {e}")
         
@@ -440,22 +928,32 @@ Use the provided scientific context from Wikipedia and OpenFoodFacts, plus your
         logger.warning(f"Could not detect category for '{brand_name}', using generic 'snacks'")
         return 'snacks', 'fallback'
 
-    def find_better_alternatives(self, brand: str, ingredients: List[str], user_health: str, category: str = None) -> List[str]:
+    def find_better_alternatives(self, brand: str, ingredients: List[str], user_health: str, category: str = None, deadline: Optional[Deadline] = None) -> List[str]:
         """Find healthier alternatives using OpenFoodFacts API (fast, real products)"""
+        deadline = deadline or Deadline(None)
+        
+        # Not enough budget for the OpenFoodFacts round trips: use the curated list
+        if not deadline.allows("alternatives"):
+            deadline.degrade("alternatives")
+            return self._get_fallback_alternatives(category or brand)
+        
         try:
             logger.info(f"Finding alternatives for {brand} using OpenFoodFacts API...")
             start_time = __import__('time').time()
             
             # If no category provided, detect it from OpenFoodFacts
-            if not category:
+            if not category and brand.strip().lower() not in off_category_misses:
                 logger.info("Category not provided, detecting via OpenFoodFacts...")
-                search_url = f"https://world.openfoodfacts.org/cgi/search.pl?search_terms={brand}&json=1&page_size=1"
-                response = requests.get(search_url, timeout=5)
+                search_url = f"{OFF_SEARCH_URL}?search_terms={brand}&json=1&page_size=1"
+                lookup_timeout = deadline.timeout(OFF_INGREDIENT_TIMEOUT)
+                response = self._off_get(search_url, lookup_timeout, deadline)
                 if response.ok:
                     products = response.json().get("products", [])
                     if products:
                         category = products[0].get("categories_tags", ["snacks"])[0].replace("en:", "")
                         logger.info(f"Category '{category}' detected via OpenFoodFacts API")
+                    else:
+                        off_category_misses.add(brand.strip().lower())
             
             if not category:
                 category = "snacks"  # Default fallback
@@ -466,19 +964,20 @@ Use the provided scientific context from Wikipedia and OpenFoodFacts, plus your
             has_gluten_allergy = "gluten" in user_health.lower()
             
             # Search OpenFoodFacts INDIA for better alternatives in same category
-            search_url = f"https://in.openfoodfacts.org/category/{category}.json"
+            search_url = OFF_CATEGORY_URL.format(category=category)
             params = {
                 "page_size": 50,  # Get more to filter
                 "json": 1,
                 "fields": "product_name,brands,nutriscore_grade,nova_group,ingredients_text,allergens_tags,labels_tags"
             }
             
-            response = requests.get(search_url, params=params, timeout=10)
+            search_timeout = deadline.timeout(OFF_ALTERNATIVES_TIMEOUT)
+            response = self._off_get(search_url, search_timeout, deadline, params=params)
             if not response.ok:
                 logger.warning(f"OpenFoodFacts search failed: {response.status_code}")
                 return self._get_fallback_alternatives(category)
             
-            products = response.json().get("products", [])
+            products = executors.run_cpu(cpu_tasks.parse_json, response.content, size=len(response.content)).get("products", [])
             logger.info(f"Found {len(products)} products in category '{category}'")
             
             # Filter and score products
@@ -602,3 +1101,58 @@ Use the provided scientific context from Wikipedia and OpenFoodFacts, plus your
     def _get_generic_alternatives(self, category: str) -> List[str]:
         """Legacy fallback - redirects to new fallback"""
         return self._get_fallback_alternatives(category)
+
+
+class EnrichmentPrefetch:
+    """
+    Speculative Wikipedia/OpenFoodFacts lookups for ingredients, started as
+    soon as the streaming vision call names them so enrichment overlaps the
+    rest of label extraction. The researcher collects the results.
+    """
+
+    def __init__(self, tools: ProHealthTools, deadline: Deadline):
+        self.tools = tools
+        self.deadline = deadline
+        self._futures: Dict[str, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()  # Panels of a multi-image label stream concurrently
+        self._cancelled = threading.Event()
+
+    def submit(self, ingredient: str):
+        name = ingredient.strip()
+        # Skip repeats, OCR debris and anything the budget no longer covers
+        if len(name) < 3 or not any(c.isalpha() for c in name) or not self.deadline.allows("enrichment"):
+            return
+        with self._lock:
+            if name in self._futures or self._cancelled.is_set():
+                return
+            context = contextvars.copy_context()
+            self._futures[name] = _prefetch_executor.submit(
+                context.run, self.tools.enrich_ingredient, name, self.deadline, self._cancelled
+            )
+
+    def cancel(self):
+        """Drop lookups nobody will read (the label turned out unreadable): queued ones never start, running ones skip OpenFoodFacts"""
+        with self._lock:
+            self._cancelled.set()
+            dropped = sum(future.cancel() for future in self._futures.values())
+        if dropped:
+            logger.info(f"Cancelled {dropped} prefetched enrichment lookups")
+
+    def results(self, ingredients: List[str]) -> Dict[str, tuple]:
+        """(wikipedia_text, off_data) for each of `ingredients` that was prefetched, waiting for in-flight lookups"""
+        futures = {ing: self._futures[ing.strip()] for ing in ingredients if ing.strip() in self._futures}
+        # One budget for the whole batch, not one per lookup
+        concurrent.futures.wait(futures.values(), timeout=self.deadline.timeout(WIKIPEDIA_TIMEOUT + OFF_INGREDIENT_TIMEOUT))
+        results = {}
+        for ing, future in futures.items():
+            if not future.done() or future.cancelled():
+                logger.debug(f"Prefetched enrichment for {ing} still running; fetched again")
+                continue
+            try:
+                results[ing] = future.result()
+            except Exception as e:
+                logger.debug(f"Prefetched enrichment for {ing} unavailable: {e}")
+        return results
+
+    def __len__(self) -> int:
+        return len(self._futures)
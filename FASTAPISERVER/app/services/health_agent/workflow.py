@@ -1,24 +1,77 @@
+import threading
+from functools import partial, wraps
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Optional
 from langgraph.graph import StateGraph, END
 from .state import HealthCoPilotState
 from .nodes import AgentNodes
+from .projection import NODE_ORDER, required_nodes
 from langchain_google_genai import ChatGoogleGenerativeAI
+from app.utils.tracing import span
 
-def build_health_copilot(llm: ChatGoogleGenerativeAI):
-    """Build the health copilot workflow graph"""
-    nodes = AgentNodes(llm)
-    workflow = StateGraph(HealthCoPilotState)
 
-    workflow.add_node("extract", nodes.extractor_node)
-    workflow.add_node("profile", nodes.health_profiler_node)
-    workflow.add_node("research", nodes.researcher_node)
-    workflow.add_node("analyze", nodes.risk_analyzer_node)
-    workflow.add_node("design", nodes.conversational_designer_node)
+def _traced(name: str, handler: Callable[..., Any]) -> Callable[..., Any]:
+    """Run a node inside a `node.<name>` span (wraps keeps the signature LangGraph inspects for `config`)"""
+    @wraps(handler)
+    def run(state, *args, **kwargs):
+        with span(f"node.{name}", node=name, ingredients=len(state.get("ingredients_list") or [])) as node_span:
+            update = handler(state, *args, **kwargs)
+            if isinstance(update, dict):
+                node_span.set(updated=sorted(update), degraded_stages=update.get("degraded_stages") or None)
+            return update
+    return run
+
+
+def _compile(nodes: AgentNodes, selected: FrozenSet[str]):
+    workflow = StateGraph(HealthCoPilotState)
+    handlers = {
+        # Research runs later: start its per-ingredient lookups during extraction
+        "extract": partial(nodes.extractor_node, prefetch="research" in selected),
+        "prescreen": nodes.prescreen_node,
+        "profile": nodes.health_profiler_node,
+        "research": nodes.researcher_node,
+        "decide": nodes.decision_node,
+        "analyze": nodes.risk_analyzer_node,
+        "design": nodes.conversational_designer_node,
+    }
+    chain = [name for name in NODE_ORDER if name in selected]
+    handlers["retry_extract"] = nodes.retry_extractor_node
+    handlers["unreadable"] = nodes.unreadable_label_node
+    for name in chain + ["retry_extract", "unreadable"]:
+        workflow.add_node(name, _traced(name, handlers[name]))
 
     workflow.set_entry_point("extract")
-    workflow.add_edge("extract", "profile")
-    workflow.add_edge("profile", "research")
-    workflow.add_edge("research", "analyze")
-    workflow.add_edge("analyze", "design")
-    workflow.add_edge("design", END)
+    # Unreadable labels skip everything after extraction
+    after_extract = chain[1] if len(chain) > 1 else END
+    for source in ("extract", "retry_extract"):
+        workflow.add_conditional_edges(
+            source,
+            nodes.route_after_extraction,
+            {"continue": after_extract, "retry_extract": "retry_extract", "unreadable": "unreadable"}
+        )
+    workflow.add_edge("unreadable", END)
+    for current, following in zip(chain[1:], chain[2:] + [END]):
+        workflow.add_edge(current, following)
 
     return workflow.compile()
+
+
+def build_health_copilot(llm: ChatGoogleGenerativeAI, fields: Optional[Iterable[str]] = None):
+    """Build the health copilot workflow graph, pruned to the nodes `fields` needs"""
+    return _compile(AgentNodes(llm), required_nodes(fields))
+
+
+class HealthCopilotGraphs:
+    """Compiled graphs cached per required node set, sharing one AgentNodes instance"""
+
+    def __init__(self, llm: ChatGoogleGenerativeAI):
+        self.nodes = AgentNodes(llm)
+        self._graphs: Dict[FrozenSet[str], object] = {}
+        self._lock = threading.Lock()
+
+    def get(self, fields: Optional[Iterable[str]] = None):
+        key = required_nodes(fields)
+        with self._lock:
+            graph = self._graphs.get(key)
+            if graph is None:
+                graph = self._graphs[key] = _compile(self.nodes, key)
+            return graph
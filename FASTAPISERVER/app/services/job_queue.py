@@ -0,0 +1,227 @@
+"""In-process background job queue for long-running analyses"""
+
+import asyncio
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+from app.utils.logger import logger
+from app.utils.request_context import get_request_id, request_id_var
+from app.utils.tracing import span
+
+
+class JobStatus(str, Enum):
+    """Lifecycle states of a background job"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when the queue is at its configured depth limit"""
+
+
+@dataclass
+class Job:
+    """A single queued graph run and its timing"""
+    id: str
+    inputs: Dict[str, Any]
+    cleanup: Optional[Callable[[], None]] = None
+    status: JobStatus = JobStatus.QUEUED
+    created_at: datetime = field(default_factory=datetime.now)
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    # Trace of the request that submitted the job (the run is traced under the job id)
+    submitted_trace_id: str = "-"
+    # Monotonic timestamps for duration math
+    enqueued_mono: float = field(default_factory=time.monotonic)
+    started_mono: Optional[float] = None
+    finished_mono: Optional[float] = None
+    # Publish of the "queued" state; a worker waits for it so "running" is never overwritten
+    queued_update: Optional["asyncio.Future"] = field(default=None, repr=False)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (JobStatus.COMPLETED, JobStatus.FAILED)
+
+    def timing(self) -> Dict[str, Optional[float]]:
+        """Queue wait, run time and total time in seconds (None while unknown)"""
+        now = time.monotonic()
+        queue_end = self.started_mono if self.started_mono is not None else now
+        queue_wait = queue_end - self.enqueued_mono
+        run_time = None
+        if self.started_mono is not None:
+            run_time = (self.finished_mono or now) - self.started_mono
+        total = (self.finished_mono or now) - self.enqueued_mono
+        return {
+            "queue_wait_seconds": round(queue_wait, 3),
+            "run_seconds": round(run_time, 3) if run_time is not None else None,
+            "total_seconds": round(total, 3),
+        }
+
+
+class JobQueue:
+    """
+    Bounded asyncio queue drained by a fixed pool of workers.
+
+    The runner is a blocking callable (the compiled LangGraph) so each worker
+    executes it in a thread, keeping the event loop free for HTTP traffic.
+    `on_update` (blocking too) is called with the job when it is queued,
+    starts and finishes, e.g. to publish its state to other server processes.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[Dict[str, Any]], Dict[str, Any]],
+        workers: int,
+        max_depth: int,
+        result_ttl_seconds: int,
+        on_update: Optional[Callable[[Job], None]] = None,
+    ):
+        self.runner = runner
+        self.on_update = on_update
+        self.worker_count = max(1, workers)
+        self.max_depth = max(1, max_depth)
+        self.result_ttl_seconds = result_ttl_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._jobs: Dict[str, Job] = {}
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        # Recent finished-job timings for aggregate stats
+        self._recent_timings: deque = deque(maxlen=200)
+
+    async def start(self):
+        """Spawn the worker pool (call from the app startup hook)"""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"job-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+        logger.info(f"Job queue started with {self.worker_count} workers (max depth {self.max_depth})")
+
+    async def stop(self):
+        """Cancel workers; queued jobs are dropped and their files cleaned up"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for job in self._jobs.values():
+            if not job.is_finished:
+                self._run_cleanup(job)
+        logger.info("Job queue stopped")
+
+    @property
+    def depth(self) -> int:
+        """Number of jobs waiting for a worker"""
+        return self._queue.qsize() if self._queue else 0
+
+    def check_capacity(self):
+        """Raise QueueFullError when no more jobs can be accepted"""
+        if self.depth >= self.max_depth:
+            self._rejected += 1
+            raise QueueFullError(f"Job queue is full ({self.max_depth} pending jobs)")
+
+    def submit(self, inputs: Dict[str, Any], cleanup: Optional[Callable[[], None]] = None) -> Job:
+        """Enqueue a graph run, raising QueueFullError when over the depth limit"""
+        if self._queue is None:
+            raise RuntimeError("Job queue has not been started")
+        self._purge_expired()
+        self.check_capacity()
+
+        job = Job(id=uuid.uuid4().hex, inputs=inputs, cleanup=cleanup, submitted_trace_id=get_request_id())
+        self._jobs[job.id] = job
+        # No await since the capacity check, so concurrent submits cannot both take the last slot
+        self._queue.put_nowait(job)
+        job.queued_update = asyncio.ensure_future(asyncio.to_thread(self._notify, job))
+        logger.info(f"Queued job {job.id} (depth {self.depth})")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job by id"""
+        self._purge_expired()
+        return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Aggregate queue counters and timing averages"""
+        timings = list(self._recent_timings)
+
+        def _avg(key: str) -> Optional[float]:
+            values = [t[key] for t in timings if t[key] is not None]
+            return round(sum(values) / len(values), 3) if values else None
+
+        return {
+            "workers": self.worker_count,
+            "max_depth": self.max_depth,
+            "queued": self.depth,
+            "running": self._running,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "avg_queue_wait_seconds": _avg("queue_wait_seconds"),
+            "avg_run_seconds": _avg("run_seconds"),
+        }
+
+    async def _worker(self, index: int):
+        while True:
+            job = await self._queue.get()
+            if job.queued_update is not None:
+                await job.queued_update
+            job.status = JobStatus.RUNNING
+            job.started_mono = time.monotonic()
+            self._running += 1
+            # Upstream calls made by this job are queued fairly under its id
+            request_id_var.set(job.id)
+            await asyncio.to_thread(self._notify, job)
+            try:
+                with span("job", job_id=job.id, submitted_trace_id=job.submitted_trace_id,
+                          queue_wait_ms=round((job.started_mono - job.enqueued_mono) * 1000, 1)):
+                    job.result = await asyncio.to_thread(self.runner, job.inputs)
+                job.status = JobStatus.COMPLETED
+                self._completed += 1
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {e}", exc_info=True)
+                job.error = str(e)
+                job.status = JobStatus.FAILED
+                self._failed += 1
+            finally:
+                job.finished_mono = time.monotonic()
+                self._running -= 1
+                self._recent_timings.append(job.timing())
+                self._run_cleanup(job)
+                await asyncio.to_thread(self._notify, job)
+                self._queue.task_done()
+                logger.info(f"Job {job.id} {job.status.value} on worker {index}: {job.timing()}")
+
+    def _notify(self, job: Job):
+        if self.on_update:
+            try:
+                self.on_update(job)
+            except Exception as e:
+                logger.warning(f"Job update hook failed for job {job.id}: {e}")
+
+    def _run_cleanup(self, job: Job):
+        if job.cleanup:
+            try:
+                job.cleanup()
+            except Exception as e:
+                logger.warning(f"Cleanup failed for job {job.id}: {e}")
+            job.cleanup = None
+
+    def _purge_expired(self):
+        """Drop finished jobs older than the result TTL"""
+        cutoff = time.monotonic() - self.result_ttl_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.is_finished and job.finished_mono < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
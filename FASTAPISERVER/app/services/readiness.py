@@ -0,0 +1,227 @@
+"""Background readiness probes of the upstream APIs and the shared cache"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+from app.config.settings import settings
+from app.services.governor import GovernorTimeout, governor
+from app.services.resilience import circuit_breakers
+from app.services.shared_cache import cache_backend
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+from app.utils.tracing import span
+
+GEMINI_DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com"
+# Cheap authenticated reads: they check the key and the service without spending tokens
+GROQ_MODELS_URL = f"{settings.groq_base_url.rstrip('/')}/openai/v1/models"
+GEMINI_MODEL_URL = f"{(settings.gemini_base_url or GEMINI_DEFAULT_BASE_URL).rstrip('/')}/v1beta/models/{{model}}"
+OPENFOODFACTS_PROBE_URL = f"{settings.openfoodfacts_base_url.rstrip('/')}/api/v2/product/3017620422003.json?fields=code"
+WIKIPEDIA_PROBE_URL = f"{settings.wikipedia_base_url.rstrip('/')}/api/rest_v1/page/summary/Salt"
+PROBE_HEADERS = {"User-Agent": "IngrediSense/1.0 (readiness probe)", "Accept": "application/json"}
+# Circuit breaker host behind each HTTP check
+CIRCUIT_HOSTS = {
+    "openfoodfacts": urlparse(settings.openfoodfacts_base_url).netloc,
+    "wikipedia": urlparse(settings.wikipedia_base_url).netloc,
+}
+
+# Analyses cannot run without these; the others only degrade enrichment
+CRITICAL_CHECKS = ("groq", "gemini")
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _http():
+    """requests.Session shared by the HTTP probes (kept alive, so latency excludes the TLS handshake)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+
+                _session = requests.Session()
+                _session.headers.update(PROBE_HEADERS)
+    return _session
+
+
+def _get(provider: str, url: str, **kwargs):
+    """GET under the provider's rate limits; raises on a non-2xx answer"""
+    timeout = settings.readiness_probe_timeout_seconds
+    response = governor.call(provider, _http().get, url, timeout=timeout, wait_timeout=timeout, **kwargs)
+    if response.status_code >= 400:
+        raise RuntimeError(f"HTTP {response.status_code}")
+    return response
+
+
+def probe_groq():
+    _get("groq", GROQ_MODELS_URL, headers={"Authorization": f"Bearer {settings.groq_api_key}"})
+
+
+def probe_gemini():
+    _get("gemini", GEMINI_MODEL_URL.format(model=settings.gemini_model), headers={"x-goog-api-key": settings.google_api_key})
+
+
+def probe_openfoodfacts():
+    _get("openfoodfacts", OPENFOODFACTS_PROBE_URL)
+
+
+def probe_wikipedia():
+    _get("wikipedia", WIKIPEDIA_PROBE_URL)
+
+
+def probe_cache():
+    """Write and read back a key through the CACHE_URL backend"""
+    backend = cache_backend()
+    if backend is None:
+        return
+    key = f"readiness:{os.getpid()}"
+    value = str(time.time()).encode()
+    backend.set(key, value, 60)
+    if backend.get(key) != value:
+        raise RuntimeError("value written to the cache could not be read back")
+
+
+DEFAULT_PROBES: Dict[str, Callable[[], Any]] = {
+    "groq": probe_groq,
+    "gemini": probe_gemini,
+    "openfoodfacts": probe_openfoodfacts,
+    "wikipedia": probe_wikipedia,
+    "cache": probe_cache,
+}
+
+
+class ReadinessProber:
+    """
+    Runs every probe each READINESS_PROBE_INTERVAL_SECONDS on a background
+    task and keeps the latest result per check, so readiness checks and
+    load shedding read a dict instead of calling anything.
+
+    A check counts as down after READINESS_FAILURE_THRESHOLD consecutive
+    failed probes; results older than three intervals are reported as stale
+    and ignored.
+    """
+
+    def __init__(self, probes: Dict[str, Callable[[], Any]], interval_seconds: float, failure_threshold: int):
+        self.probes = probes
+        self.interval_seconds = interval_seconds
+        self.failure_threshold = failure_threshold
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._rounds = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval_seconds > 0
+
+    async def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                logger.error(f"Readiness probe round failed: {e}", exc_info=True)
+            await asyncio.sleep(self.interval_seconds)
+
+    async def probe_all(self):
+        """Run every probe concurrently (each in a thread) and store the results"""
+        with span("readiness.probe"):
+            results = await asyncio.gather(*(asyncio.to_thread(self._probe, name, fn) for name, fn in self.probes.items()))
+        self._results = {name: result for name, result in zip(self.probes, results)}
+        self._rounds += 1
+
+    def _probe(self, name: str, fn: Callable[[], Any]) -> Dict[str, Any]:
+        start = time.monotonic()
+        error = None
+        previous = self._results.get(name)
+        try:
+            fn()
+        except GovernorTimeout:
+            # Every slot is taken by real traffic: busy, not down; keep the last verdict
+            metrics.increment("readiness_probes_skipped_total", labels={"check": name})
+            if previous is not None:
+                return {**previous, "checked_at": time.time()}
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"[:200]
+        latency = time.monotonic() - start
+        failures = 0 if error is None else (previous["consecutive_failures"] if previous else 0) + 1
+        metrics.observe("readiness_probe_seconds", latency, labels={"check": name})
+        if error is not None:
+            metrics.increment("readiness_probe_failures_total", labels={"check": name})
+            if failures == self.failure_threshold:
+                logger.warning(f"Readiness check {name} is down: {error}")
+        elif previous is not None and previous["consecutive_failures"] >= self.failure_threshold:
+            logger.info(f"Readiness check {name} recovered")
+        return {
+            "ok": error is None,
+            "latency_ms": round(latency * 1000, 1),
+            "checked_at": time.time(),
+            "consecutive_failures": failures,
+            "error": error,
+        }
+
+    def _is_down(self, result: Dict[str, Any], now: float) -> bool:
+        fresh = now - result["checked_at"] <= 3 * self.interval_seconds
+        return fresh and result["consecutive_failures"] >= self.failure_threshold
+
+    def down(self) -> List[str]:
+        """Checks currently counted as down"""
+        now = time.time()
+        return [name for name, result in self._results.items() if self._is_down(result, now)]
+
+    def shed_reason(self) -> Optional[str]:
+        """Why analyses should be refused right now (a critical upstream is down), or None"""
+        if not settings.readiness_shed_load:
+            return None
+        critical = [name for name in self.down() if name in CRITICAL_CHECKS]
+        return f"{', '.join(critical)} unavailable" if critical else None
+
+    def report(self) -> Dict[str, Any]:
+        """Latest result per check plus an overall status: starting, unready, degraded or ready"""
+        now = time.time()
+        circuits = circuit_breakers.states()
+        checks = {}
+        for name, result in self._results.items():
+            age = now - result["checked_at"]
+            checks[name] = {
+                **result,
+                "critical": name in CRITICAL_CHECKS,
+                "age_seconds": round(age, 1),
+                "stale": age > 3 * self.interval_seconds,
+            }
+            if name in CIRCUIT_HOSTS:
+                checks[name]["circuit"] = circuits.get(CIRCUIT_HOSTS[name], "closed")
+        down = self.down()
+        reasons = [f"{name} down" for name in down]
+        if self.enabled and self._rounds == 0:
+            status = "starting"
+        elif any(name in CRITICAL_CHECKS for name in down):
+            status = "unready"
+        elif down or any(check["stale"] for check in checks.values()):
+            status = "degraded"
+            reasons += [f"{name} stale" for name, check in checks.items() if check["stale"]]
+        else:
+            status = "ready"
+        return {"status": status, "reasons": reasons, "probing": self.enabled, "checks": checks}
+
+
+# Global prober shared by the readiness route and load shedding
+readiness = ReadinessProber(
+    DEFAULT_PROBES,
+    interval_seconds=settings.readiness_probe_interval_seconds,
+    failure_threshold=settings.readiness_failure_threshold,
+)
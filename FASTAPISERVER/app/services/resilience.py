@@ -0,0 +1,293 @@
+"""Circuit breakers, retry backoff and negative caching for flaky upstreams"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+from app.config.settings import settings
+from app.services.governor import GovernorTimeout
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+from app.utils.tracing import span
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a host whose circuit is open"""
+
+
+class UpstreamError(Exception):
+    """Transient upstream failure (5xx or 429) worth retrying"""
+
+
+class BreakerState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter: uniform(0, min(cap, base * 2^attempt))"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def is_transient_status(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+# Failures that say the host is unhealthy: they count against its breaker and are retried.
+# Anything else (a 4xx, an unreadable body, a cancelled caller) leaves the breaker alone.
+TRANSIENT_ERRORS = (UpstreamError, ConnectionError, asyncio.TimeoutError)
+
+
+class CircuitBreaker:
+    """
+    Per-host breaker.
+
+    CLOSED counts consecutive failures and trips to OPEN at the threshold.
+    OPEN rejects calls until its (exponentially growing, jittered) cool-down
+    ends, then lets a single HALF_OPEN probe through: success closes the
+    circuit, failure re-opens it for longer.
+    """
+
+    def __init__(self, host: str, failure_threshold: int, open_seconds: float, max_open_seconds: float):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.state = BreakerState.CLOSED
+        self._failures = 0
+        self._trips = 0
+        self._open_until = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (microseconds when the circuit is open)"""
+        with self._lock:
+            if self.state == BreakerState.CLOSED:
+                return True
+            if self.state == BreakerState.OPEN:
+                if time.monotonic() < self._open_until:
+                    metrics.increment("circuit_short_circuits_total", labels={"host": self.host})
+                    return False
+                self._set_state(BreakerState.HALF_OPEN)
+            # HALF_OPEN: one probe at a time
+            if self._probe_in_flight:
+                metrics.increment("circuit_short_circuits_total", labels={"host": self.host})
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trips = 0
+            self._probe_in_flight = False
+            if self.state != BreakerState.CLOSED:
+                self._set_state(BreakerState.CLOSED)
+
+    def record_skipped(self):
+        """The allowed call never reached the host; free the half-open probe slot"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._probe_in_flight = False
+            self._failures += 1
+            if self.state == BreakerState.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._trip()
+
+    def _trip(self):
+        cool_down = min(self.max_open_seconds, self.open_seconds * (2 ** self._trips))
+        # Jitter so breakers across workers don't all probe at the same instant
+        cool_down *= random.uniform(0.8, 1.2)
+        self._trips += 1
+        self._failures = 0
+        self._open_until = time.monotonic() + cool_down
+        self._set_state(BreakerState.OPEN)
+        logger.warning(f"Circuit for {self.host} opened for {cool_down:.1f}s (trip {self._trips})")
+
+    def _set_state(self, state: BreakerState):
+        self.state = state
+        metrics.increment("circuit_state_changes_total", labels={"host": self.host, "state": state.value})
+
+
+class CircuitBreakerRegistry:
+    """Lazily creates one breaker per host"""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(
+                    host,
+                    failure_threshold=settings.breaker_failure_threshold,
+                    open_seconds=settings.breaker_open_seconds,
+                    max_open_seconds=settings.breaker_max_open_seconds,
+                )
+            return breaker
+
+    def states(self) -> Dict[str, str]:
+        with self._lock:
+            return {host: breaker.state.value for host, breaker in self._breakers.items()}
+
+
+class TTLSet:
+    """Bounded set whose members expire after ttl_seconds (used as a negative cache)"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = time.monotonic() + self.ttl_seconds
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            expires = self._entries.get(key)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._entries[key]
+                return False
+            return True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class TTLCache:
+    """Bounded LRU map whose values expire after ttl_seconds (used for upstream lookups)"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _retry_delay(attempt: int, deadline: Any) -> Optional[float]:
+    """Delay before the next attempt, or None if no retry should be made"""
+    if attempt >= settings.upstream_max_retries:
+        return None
+    delay = backoff_delay(attempt, settings.upstream_retry_base_delay, settings.upstream_retry_max_delay)
+    if deadline is not None and delay >= deadline.remaining():
+        return None
+    return delay
+
+
+def resilient_call(host: str, fn: Callable[..., Any], *args, deadline: Any = None,
+                   transient: Tuple[Type[BaseException], ...] = TRANSIENT_ERRORS, **kwargs) -> Any:
+    """
+    Call `fn` (typically an HTTP GET) through the host's circuit breaker,
+    retrying transient failures with jittered exponential backoff.
+
+    `deadline` is anything with `remaining()`; retries that would overrun it are skipped.
+    `transient` lists the exceptions (e.g. the HTTP client's connection errors)
+    that count as host failures.
+    """
+    breaker = circuit_breakers.get(host)
+    attempt = 0
+    with span(f"http {host}", host=host) as call_span:
+        while True:
+            call_span.set(attempts=attempt + 1)
+            if not breaker.allow():
+                call_span.set(circuit_open=True)
+                raise CircuitOpenError(f"Circuit open for {host}")
+            try:
+                result = fn(*args, **kwargs)
+                status_code = getattr(result, "status_code", 200)
+                if is_transient_status(status_code):
+                    raise UpstreamError(f"{host} returned {status_code}")
+            except GovernorTimeout:
+                # Our own rate limiting gave up before the host was called
+                breaker.record_skipped()
+                raise
+            except transient as e:
+                breaker.record_failure()
+                delay = _retry_delay(attempt, deadline)
+                if delay is None:
+                    raise
+                logger.debug(f"Retrying {host} in {delay:.2f}s after: {e}")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                # Not the host's fault (or the caller gave up); never leave the probe slot taken
+                breaker.record_skipped()
+                raise
+            breaker.record_success()
+            return result
+
+
+async def resilient_call_async(host: str, fn: Callable[..., Awaitable[Any]], *args, deadline: Any = None,
+                               transient: Tuple[Type[BaseException], ...] = TRANSIENT_ERRORS, **kwargs) -> Any:
+    """Async counterpart of resilient_call; `fn` raises UpstreamError for transient statuses"""
+    breaker = circuit_breakers.get(host)
+    attempt = 0
+    with span(f"http {host}", host=host) as call_span:
+        while True:
+            call_span.set(attempts=attempt + 1)
+            if not breaker.allow():
+                call_span.set(circuit_open=True)
+                raise CircuitOpenError(f"Circuit open for {host}")
+            try:
+                result = await fn(*args, **kwargs)
+            except GovernorTimeout:
+                breaker.record_skipped()
+                raise
+            except transient as e:
+                breaker.record_failure()
+                delay = _retry_delay(attempt, deadline)
+                if delay is None:
+                    raise
+                logger.debug(f"Retrying {host} in {delay:.2f}s after: {e}")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                # Not the host's fault (or the caller gave up); never leave the probe slot taken
+                breaker.record_skipped()
+                raise
+            breaker.record_success()
+            return result
+
+
+# Global breaker registry shared by all requests
+circuit_breakers = CircuitBreakerRegistry()
@@ -0,0 +1,133 @@
+"""Extraction, ingredient and result caches shared by every worker process"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Iterable, Optional
+from app.config.settings import settings
+from app.services.cache import CacheBackend, MemoryBackend, create_backend
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+
+# Bumped when the shape of cached values changes, so old entries are ignored
+CACHE_FORMAT_VERSION = 1
+
+_backend: Optional[CacheBackend] = None
+_backend_lock = threading.Lock()
+
+
+def cache_backend() -> Optional[CacheBackend]:
+    """The CACHE_URL backend, opened on first use in each worker (None when caching is disabled)"""
+    global _backend
+    if _backend is None and settings.cache_url:
+        with _backend_lock:
+            if _backend is None:
+                try:
+                    _backend = create_backend(
+                        settings.cache_url,
+                        settings.cache_max_entries,
+                        settings.cache_timeout_seconds,
+                        replicas=settings.cache_replicas,
+                        virtual_nodes=settings.cache_virtual_nodes
+                    )
+                except Exception as e:
+                    logger.error(f"Could not open cache {settings.cache_url!r} ({e}); using a per-process cache")
+                    _backend = MemoryBackend(settings.cache_max_entries)
+    return _backend
+
+
+def close_cache_backend():
+    """Close the backend's connections (reopened on next use)"""
+    global _backend
+    with _backend_lock:
+        backend, _backend = _backend, None
+    if backend is not None:
+        backend.close()
+
+
+def cache_key(*parts: Any) -> str:
+    """SHA-256 over the parts (strings as-is, anything else as sorted JSON)"""
+    digest = hashlib.sha256()
+    for part in parts:
+        text = part if isinstance(part, str) else json.dumps(part, sort_keys=True, default=str)
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def file_digest(paths: Iterable[str]) -> str:
+    """SHA-256 over the contents of the files, in order (identical uploads share cache entries)"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SharedCache:
+    """
+    JSON values in one namespace of the shared backend. Backend errors (a
+    locked or unreachable store) are logged and count as misses, so the cache
+    can never fail a request.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+
+    def _key(self, key: str) -> str:
+        return f"{self.name}:v{CACHE_FORMAT_VERSION}:{key}"
+
+    def get(self, key: str) -> Optional[Any]:
+        backend = cache_backend()
+        if backend is None:
+            return None
+        try:
+            raw = backend.get(self._key(key))
+            value = json.loads(raw) if raw is not None else None
+        except Exception as e:
+            logger.warning(f"Cache {self.name} read failed: {e}")
+            metrics.increment("cache_errors_total", labels={"cache": self.name, "op": "get"})
+            return None
+        metrics.increment("cache_hits_total" if value is not None else "cache_misses_total", labels={"cache": self.name})
+        return value
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Cached values of the `keys` that are present, in one backend round trip"""
+        keys = list(dict.fromkeys(keys))
+        backend = cache_backend()
+        if backend is None or not keys:
+            return {}
+        try:
+            raw = backend.get_many([self._key(key) for key in keys])
+            values = {key: json.loads(raw[self._key(key)]) for key in keys if self._key(key) in raw}
+        except Exception as e:
+            logger.warning(f"Cache {self.name} read failed: {e}")
+            metrics.increment("cache_errors_total", labels={"cache": self.name, "op": "get_many"})
+            return {}
+        if values:
+            metrics.increment("cache_hits_total", len(values), labels={"cache": self.name})
+        if len(values) < len(keys):
+            metrics.increment("cache_misses_total", len(keys) - len(values), labels={"cache": self.name})
+        return values
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        backend = cache_backend()
+        if backend is None:
+            return
+        try:
+            backend.set(self._key(key), json.dumps(value).encode("utf-8"), ttl_seconds or self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Cache {self.name} write failed: {e}")
+            metrics.increment("cache_errors_total", labels={"cache": self.name, "op": "set"})
+
+
+# Vision extraction per label image set and model pair
+extraction_cache = SharedCache("extraction", settings.extraction_cache_ttl_seconds)
+# Wikipedia summaries ("" for pages known not to exist) and OpenFoodFacts products per ingredient
+wikipedia_cache = SharedCache("wikipedia", settings.ingredient_cache_ttl_seconds)
+off_ingredient_cache = SharedCache("off-ingredient", settings.ingredient_cache_ttl_seconds)
+# Finished, non-degraded analyses per label, health profile and field set
+result_cache = SharedCache("result", settings.result_cache_ttl_seconds)
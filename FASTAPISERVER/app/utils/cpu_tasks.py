@@ -0,0 +1,38 @@
+"""CPU-bound helpers run in the executor process pool (import-light so workers start fast)"""
+
+import base64
+import json
+from typing import Any
+
+# Preprocessed retries upscale images narrower than this (pixels)
+PREPROCESS_MIN_WIDTH = 1200
+
+
+def encode_image_file(image_path: str) -> str:
+    """Base64 of an image file, read inside the worker so only the encoded text crosses processes"""
+    with open(image_path, "rb") as image_file:
+        return base64.b64encode(image_file.read()).decode("utf-8")
+
+
+def preprocess_and_encode(image_path: str) -> str:
+    """Grayscale, upscale small photos and equalize contrast so faded or glossy print is easier to read; base64 PNG"""
+    import cv2
+
+    image = cv2.imread(image_path)
+    if image is None:
+        raise ValueError(f"Could not decode image: {image_path}")
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    height, width = gray.shape
+    if width < PREPROCESS_MIN_WIDTH:
+        scale = PREPROCESS_MIN_WIDTH / width
+        gray = cv2.resize(gray, (PREPROCESS_MIN_WIDTH, int(height * scale)), interpolation=cv2.INTER_CUBIC)
+    gray = cv2.bilateralFilter(gray, 5, 50, 50)  # Edge-preserving denoise, keeps glyph edges sharp
+    gray = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(gray)
+    ok, encoded = cv2.imencode(".png", gray)
+    if not ok:
+        raise ValueError(f"Could not encode preprocessed image: {image_path}")
+    return base64.b64encode(encoded.tobytes()).decode("utf-8")
+
+
+def parse_json(data: bytes) -> Any:
+    return json.loads(data)
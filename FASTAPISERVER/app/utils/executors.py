@@ -0,0 +1,101 @@
+"""Managed thread pools and the process pool for CPU-bound work"""
+
+import atexit
+import concurrent.futures
+import multiprocessing
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+from app.config.settings import settings
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+
+
+class Executors:
+    """
+    Named thread pools plus one process pool for CPU-heavy steps.
+
+    CPU work (base64 of multi-MB images, large JSON parsing) in a
+    request thread holds the GIL and stalls the event loop for every other
+    request; `run_cpu` moves it to worker processes instead. Payloads below
+    `min_offload_bytes` run inline, where pickling would cost more than the
+    work. With `cpu_workers=0` everything runs inline.
+    """
+
+    def __init__(self, cpu_workers: int, min_offload_bytes: int):
+        self.cpu_workers = cpu_workers
+        self.min_offload_bytes = min_offload_bytes
+        self._process_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._thread_pools: Dict[str, concurrent.futures.ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+
+    def thread_pool(self, name: str, workers: int) -> concurrent.futures.ThreadPoolExecutor:
+        """The named thread pool, created on first use"""
+        with self._lock:
+            pool = self._thread_pools.get(name)
+            if pool is None:
+                pool = self._thread_pools[name] = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix=name
+                )
+            return pool
+
+    def _cpu_pool(self) -> Optional[concurrent.futures.ProcessPoolExecutor]:
+        if self.cpu_workers <= 0:
+            return None
+        with self._lock:
+            if self._process_pool is None:
+                # forkserver: workers don't inherit this process's threads and locks
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._process_pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.cpu_workers, mp_context=multiprocessing.get_context(method)
+                )
+                atexit.register(self.shutdown)
+            return self._process_pool
+
+    def _offload(self, size: Optional[int]) -> Optional[concurrent.futures.ProcessPoolExecutor]:
+        if size is not None and size < self.min_offload_bytes:
+            return None
+        return self._cpu_pool()
+
+    def _reset_cpu_pool(self, pool: concurrent.futures.ProcessPoolExecutor):
+        with self._lock:
+            if self._process_pool is pool:
+                self._process_pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def run_cpu(self, fn: Callable[..., Any], *args, size: Optional[int] = None) -> Any:
+        """Run `fn(*args)` in the process pool (inline for payloads under the offload threshold)"""
+        start = time.monotonic()
+        pool = self._offload(size)
+        where = "process" if pool else "inline"
+        try:
+            if pool is None:
+                return fn(*args)
+            try:
+                return pool.submit(fn, *args).result()
+            except BrokenProcessPool:
+                logger.warning(f"CPU worker pool broke during {fn.__name__}, restarting it and running inline")
+                self._reset_cpu_pool(pool)
+                where = "inline"
+                return fn(*args)
+        finally:
+            metrics.observe("cpu_task_seconds", time.monotonic() - start, labels={"task": fn.__name__, "where": where})
+
+    def start(self):
+        """Spawn the CPU workers now so the first request doesn't pay for it"""
+        pool = self._cpu_pool()
+        if pool is not None:
+            list(pool.map(abs, range(self.cpu_workers)))
+            logger.info(f"Started {self.cpu_workers} CPU worker processes")
+
+    def shutdown(self):
+        """Stop the CPU workers (recreated on next use); thread pools end with the interpreter"""
+        with self._lock:
+            process_pool, self._process_pool = self._process_pool, None
+        if process_pool is not None:
+            process_pool.shutdown(wait=True, cancel_futures=True)
+
+
+# Global executors shared by every request
+executors = Executors(settings.cpu_workers, settings.cpu_offload_min_bytes)
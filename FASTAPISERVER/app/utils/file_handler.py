@@ -4,9 +4,8 @@ import os
 import uuid
 import shutil
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 from fastapi import UploadFile, HTTPException, status
-import requests
 from app.config.settings import settings
 from app.utils.logger import logger
 
@@ -60,8 +59,32 @@ class FileHandler:
                 detail=f"Failed to save file: {str(e)}"
             )
     
+    def save_upload_files(self, files: List[UploadFile]) -> List[str]:
+        """Save every uploaded label panel (at most MAX_LABEL_IMAGES); nothing is kept if one fails"""
+        
+        if not files:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="At least one label image is required"
+            )
+        if len(files) > settings.max_label_images:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Too many images ({len(files)}). Upload at most {settings.max_label_images} label panels"
+            )
+        
+        paths = []
+        try:
+            for file in files:
+                paths.append(self.save_upload_file(file))
+            return paths
+        except Exception:
+            self.cleanup_files(paths)
+            raise
+    
     def download_from_url(self, url: str) -> str:
         """Download image from URL and save to disk"""
+        import requests  # Only the URL route needs it; keeps it out of startup
         
         try:
             # Download file
@@ -116,6 +139,11 @@ class FileHandler:
                 logger.info(f"Cleaned up file: {file_path}")
         except Exception as e:
             logger.warning(f"Failed to cleanup file {file_path}: {e}")
+    
+    def cleanup_files(self, file_paths: List[str]):
+        """Delete several files from disk"""
+        for file_path in file_paths:
+            self.cleanup_file(file_path)
 
 
 # Global file handler instance
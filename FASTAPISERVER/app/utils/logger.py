@@ -1,54 +1,186 @@
 """Logging configuration"""
 
+import atexit
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Optional
 from app.config.settings import settings
+from app.utils.metrics import metrics
+from app.utils.request_context import get_request_id, get_span_id
+
+
+def cap(value: Any, limit: int) -> Any:
+    """Strings longer than `limit` cut down to it, with the dropped length noted"""
+    if isinstance(value, str) and len(value) > limit:
+        return f"{value[:limit]}... [{len(value) - limit} more chars]"
+    return value
+
+
+def _cap_field(value: Any) -> Any:
+    """A payload field, capped at LOG_PAYLOAD_MAX_CHARS (structures over it become capped JSON text)"""
+    if isinstance(value, (dict, list, tuple)):
+        text = json.dumps(value, default=str, ensure_ascii=False)
+        return value if len(text) <= settings.log_payload_max_chars else cap(text, settings.log_payload_max_chars)
+    return cap(value, settings.log_payload_max_chars)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; `payload` fields are capped at LOG_PAYLOAD_MAX_CHARS"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "trace_id": getattr(record, "trace_id", "-"),
+            "span_id": getattr(record, "span_id", "-"),
+            "func": f"{record.funcName}:{record.lineno}",
+            "msg": cap(record.getMessage(), settings.log_message_max_chars),
+        }
+        payload = getattr(record, "payload", None)
+        if payload:
+            entry["payload"] = {key: _cap_field(value) for key, value in payload.items()}
+        # Tracebacks are rendered to exc_text before records are queued
+        exc = self.formatException(record.exc_info) if record.exc_info else record.exc_text
+        if exc:
+            entry["exc"] = exc
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable console lines, with over-long messages capped"""
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        record.message = cap(record.message, settings.log_message_max_chars)
+        return super().formatMessage(record)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread without touching the disk or console.
+
+    The trace (request) id and span id are captured here, on the logging
+    thread, since the listener runs outside the request's context. When the queue is full the
+    record is dropped (and counted) rather than blocking the request.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.trace_id = get_request_id()
+        record.span_id = get_span_id()
+        # Merge args now (they may be mutated later) and drop the traceback object
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.increment("log_records_dropped_total")
+
+
+class DrainingQueueListener(QueueListener):
+    """QueueListener whose stop waits for room in a full queue instead of raising"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+_listener: Optional[QueueListener] = None
+
+
+def process_file(path: str) -> str:
+    """
+    `path` for this process: with WORKERS > 1 every worker writes (and rotates)
+    its own file, e.g. logs/app.1234.log, instead of racing on a shared one
+    """
+    if settings.workers <= 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{os.getpid()}{ext}"
 
 
 def setup_logger():
-    """Configure application logging"""
-    
+    """
+    Configure application logging.
+
+    Request code only enqueues records; a listener thread formats them and
+    writes the console (text) and the rotating log file (JSON lines).
+    """
+    global _listener
+
     # Create logger
     logger = logging.getLogger("health_agent")
     logger.setLevel(getattr(logging, settings.log_level.upper()))
-    
-    # Create formatters
-    detailed_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
-    simple_formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
+    logger.propagate = False
+
     # Console handler
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(simple_formatter)
-    logger.addHandler(console_handler)
-    
+    console_handler.setFormatter(
+        JsonFormatter() if settings.log_json_console else
+        TextFormatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    )
+    handlers = [console_handler]
+
     # File handler (if log directory exists or can be created)
+    file_error = None
     try:
-        log_dir = os.path.dirname(settings.log_file)
+        log_file = process_file(settings.log_file)
+        log_dir = os.path.dirname(log_file)
         if log_dir and not os.path.exists(log_dir):
             os.makedirs(log_dir, exist_ok=True)
-        
+
         file_handler = RotatingFileHandler(
-            settings.log_file,
-            maxBytes=10 * 1024 * 1024,  # 10MB
-            backupCount=5
+            log_file,
+            maxBytes=settings.log_max_bytes,
+            backupCount=settings.log_backup_count,
+            encoding="utf-8"
         )
         file_handler.setLevel(logging.DEBUG)
-        file_handler.setFormatter(detailed_formatter)
-        logger.addHandler(file_handler)
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
     except Exception as e:
-        logger.warning(f"Could not set up file logging: {e}")
-    
+        file_error = e
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=settings.log_queue_size)
+    logger.addHandler(NonBlockingQueueHandler(log_queue))
+    _listener = DrainingQueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    # Flush whatever is still queued when the process exits
+    atexit.register(stop_logging)
+
+    if file_error is not None:
+        logger.warning(f"Could not set up file logging: {file_error}")
     return logger
 
 
+def stop_logging():
+    """Drain the queue and stop the listener thread"""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def log_payload(message: str, level: int = logging.DEBUG, **payload: Any):
+    """
+    Log a verbose payload (raw model output, parsed JSON) as structured fields,
+    for a LOG_PAYLOAD_SAMPLE_RATE fraction of calls. Skipped calls cost a
+    level check and a random draw; fields are capped when written.
+    """
+    if not logger.isEnabledFor(level) or random.random() >= settings.log_payload_sample_rate:
+        return
+    logger.log(level, message, extra={"payload": payload}, stacklevel=2)
+
+
 # Global logger instance
 logger = setup_logger()
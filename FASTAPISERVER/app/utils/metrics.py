@@ -0,0 +1,102 @@
+"""In-process metrics registry (counters and latency summaries)"""
+
+import threading
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+
+class _Summary:
+    """Sliding-window summary: count/sum over all time, quantiles over recent samples"""
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.samples.append(value)
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.samples)
+
+        def _quantile(q: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 6)
+
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "p50": _quantile(0.50),
+            "p95": _quantile(0.95),
+            "p99": _quantile(0.99),
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe counters and summaries keyed by name and label set"""
+
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, tuple], float] = {}
+        self._summaries: Dict[Tuple[str, tuple], _Summary] = {}
+
+    @staticmethod
+    def _key(name: str, labels: Optional[dict]) -> Tuple[str, tuple]:
+        return name, tuple(sorted((labels or {}).items()))
+
+    def increment(self, name: str, value: float = 1, labels: Optional[dict] = None):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: Optional[dict] = None):
+        key = self._key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = _Summary(self.window)
+            summary.observe(value)
+
+    def snapshot(self) -> dict:
+        """JSON-friendly view of every metric"""
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self._counters.items()
+            ]
+            summaries = [
+                {"name": name, "labels": dict(labels), **summary.snapshot()}
+                for (name, labels), summary in self._summaries.items()
+            ]
+        return {"counters": counters, "summaries": summaries}
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition of every metric"""
+
+        def _labels(labels: dict, extra: Optional[dict] = None) -> str:
+            merged = {**labels, **(extra or {})}
+            if not merged:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in merged.items()) + "}"
+
+        snap = self.snapshot()
+        lines = []
+        for counter in snap["counters"]:
+            lines.append(f"{counter['name']}{_labels(counter['labels'])} {counter['value']}")
+        for summary in snap["summaries"]:
+            name, labels = summary["name"], summary["labels"]
+            for q in ("p50", "p95", "p99"):
+                if summary[q] is not None:
+                    quantile = {"quantile": f"0.{q[1:]}"}
+                    lines.append(f"{name}{_labels(labels, quantile)} {summary[q]}")
+            lines.append(f"{name}_count{_labels(labels)} {summary['count']}")
+            lines.append(f"{name}_sum{_labels(labels)} {summary['sum']}")
+        return "\n".join(lines) + "\n"
+
+
+# Global metrics registry
+metrics = MetricsRegistry()
@@ -0,0 +1,257 @@
+"""Opt-in profiling of single requests, saved as pstats or speedscope files named by trace id"""
+
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from app.config.settings import settings
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+from app.utils.request_context import get_request_id
+
+PROFILE_MODES = ("sampling", "deterministic")
+PROFILE_SUFFIXES = {"sampling": ".speedscope.json", "deterministic": ".pstats"}
+
+
+class ProfileSession:
+    """
+    Profiles every thread while it works on one trace.
+
+    Threads join through `thread_enter` / `thread_exit` (called by tracing
+    spans of the trace), so worker threads running graph nodes and upstream
+    calls are covered while other requests' threads are not. "deterministic"
+    runs a cProfile per thread and merges them; "sampling" walks the joined
+    threads' stacks every PROFILE_SAMPLE_INTERVAL_MS from a sampler thread.
+    """
+
+    def __init__(self, trace_id: str, mode: str):
+        self.trace_id = trace_id
+        self.mode = mode
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._depth: Dict[int, int] = {}
+        self._profilers: Dict[int, cProfile.Profile] = {}
+        self._finished_profilers: List[cProfile.Profile] = []
+        self._thread_names: Dict[int, str] = {}
+        # Sampling: interned frames and (thread, stack) samples
+        self._frames: Dict[Tuple[str, str, int], int] = {}
+        self._samples: Dict[int, List[List[int]]] = {}
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.mode == "sampling":
+            self._sampler = threading.Thread(target=self._sample_loop, name=f"profile-{self.trace_id[:8]}", daemon=True)
+            self._sampler.start()
+
+    def thread_enter(self):
+        ident = threading.get_ident()
+        with self._lock:
+            depth = self._depth.get(ident, 0)
+            self._depth[ident] = depth + 1
+            self._thread_names.setdefault(ident, threading.current_thread().name)
+        if depth == 0 and self.mode == "deterministic":
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError as e:
+                # Another profiler already owns this thread (e.g. a debugger)
+                logger.debug(f"Not profiling thread {ident}: {e}")
+                return
+            self._profilers[ident] = profiler
+
+    def thread_exit(self):
+        ident = threading.get_ident()
+        with self._lock:
+            depth = self._depth.get(ident, 1) - 1
+            if depth:
+                self._depth[ident] = depth
+                return
+            self._depth.pop(ident, None)
+            profiler = self._profilers.pop(ident, None)
+        if profiler is not None:
+            profiler.disable()
+            with self._lock:
+                self._finished_profilers.append(profiler)
+
+    def _sample_loop(self):
+        interval = settings.profile_sample_interval_ms / 1000
+        while not self._stop.wait(interval):
+            with self._lock:
+                idents = list(self._depth)
+            if not idents:
+                continue
+            frames = sys._current_frames()
+            for ident in idents:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self._samples.setdefault(ident, []).append(self._stack(frame))
+
+    def _stack(self, frame) -> List[int]:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            key = (code.co_name, code.co_filename, code.co_firstlineno)
+            index = self._frames.get(key)
+            if index is None:
+                index = self._frames[key] = len(self._frames)
+            stack.append(index)
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def stop(self) -> Optional[str]:
+        """Finish profiling and write the artifact; returns its path (None if nothing was captured)"""
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        duration = time.time() - self.started
+        path = os.path.join(settings.profile_dir, self.trace_id + PROFILE_SUFFIXES[self.mode])
+        os.makedirs(settings.profile_dir, exist_ok=True)
+        if self.mode == "deterministic":
+            if not self._finished_profilers:
+                return None
+            stats = pstats.Stats(self._finished_profilers[0])
+            for profiler in self._finished_profilers[1:]:
+                stats.add(profiler)
+            stats.dump_stats(path)
+        else:
+            if not self._samples:
+                return None
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self._speedscope(duration), f)
+        metrics.increment("profiles_saved_total", labels={"mode": self.mode})
+        logger.info(f"Saved {self.mode} profile of trace {self.trace_id} ({duration:.2f}s) to {path}")
+        return path
+
+    def _speedscope(self, duration: float) -> Dict[str, Any]:
+        """https://www.speedscope.app file format: one sampled profile per thread"""
+        interval_ms = settings.profile_sample_interval_ms
+        frames = [None] * len(self._frames)
+        for (name, filename, line), index in self._frames.items():
+            frames[index] = {"name": name, "file": filename, "line": line}
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"trace {self.trace_id}",
+            "exporter": settings.app_name,
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": self._thread_names.get(ident, str(ident)),
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": len(samples) * interval_ms,
+                    "samples": samples,
+                    "weights": [interval_ms] * len(samples),
+                }
+                for ident, samples in self._samples.items()
+            ],
+            "metadata": {"trace_id": self.trace_id, "duration_seconds": round(duration, 3)},
+        }
+
+
+def requested_mode(header: Optional[str], token: Optional[str]) -> Optional[str]:
+    """
+    Mode to profile a request in, or None: an `X-Profile` header (a mode
+    name, or any other value for PROFILE_MODE) counts only with the right
+    PROFILING_TOKEN; otherwise PROFILE_SAMPLE_RATE of requests are picked.
+    """
+    if header and token and settings.profiling_token and hmac.compare_digest(token, settings.profiling_token):
+        mode = header.strip().lower()
+        return mode if mode in PROFILE_MODES else settings.profile_mode
+    if settings.profile_sample_rate and random.random() < settings.profile_sample_rate:
+        return settings.profile_mode
+    return None
+
+
+class Profiler:
+    """Active sessions by trace id, capped at PROFILE_MAX_CONCURRENT so profiling cannot swamp a worker"""
+
+    def __init__(self):
+        self._sessions: Dict[str, ProfileSession] = {}
+        self._lock = threading.Lock()
+
+    def session_for(self, trace_id: str) -> Optional[ProfileSession]:
+        """The session profiling `trace_id`, if any (one dict lookup, nothing when idle)"""
+        return self._sessions.get(trace_id) if self._sessions else None
+
+    @contextmanager
+    def profile(self, mode: Optional[str]) -> Iterator[Optional[ProfileSession]]:
+        """Profile the current trace for the block; yields None when `mode` is None or the cap is reached"""
+        trace_id = get_request_id()
+        if mode not in PROFILE_MODES or trace_id == "-":
+            yield None
+            return
+        session = ProfileSession(trace_id, mode)
+        with self._lock:
+            if len(self._sessions) >= settings.profile_max_concurrent or trace_id in self._sessions:
+                session = None
+            else:
+                self._sessions[trace_id] = session
+        if session is None:
+            metrics.increment("profiles_skipped_total")
+            logger.info(f"Not profiling trace {trace_id}: {settings.profile_max_concurrent} profile(s) already running")
+            yield None
+            return
+        session.start()
+        session.thread_enter()
+        try:
+            yield session
+        finally:
+            session.thread_exit()
+            with self._lock:
+                self._sessions.pop(trace_id, None)
+            try:
+                session.stop()
+                prune_profiles()
+            except Exception as e:
+                logger.warning(f"Could not save profile of trace {trace_id}: {e}")
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Saved profiles, newest first"""
+    if not os.path.isdir(settings.profile_dir):
+        return []
+    profiles = []
+    for name in os.listdir(settings.profile_dir):
+        mode = next((m for m, suffix in PROFILE_SUFFIXES.items() if name.endswith(suffix)), None)
+        if mode is None:
+            continue
+        stat = os.stat(os.path.join(settings.profile_dir, name))
+        profiles.append({
+            "name": name,
+            "trace_id": name[:-len(PROFILE_SUFFIXES[mode])],
+            "mode": mode,
+            "size_bytes": stat.st_size,
+            "created_at": stat.st_mtime,
+        })
+    return sorted(profiles, key=lambda p: p["created_at"], reverse=True)
+
+
+def profile_path(name: str) -> Optional[str]:
+    """Path of a saved profile by file name (None for unknown or unsafe names)"""
+    if os.path.basename(name) != name or not any(name.endswith(s) for s in PROFILE_SUFFIXES.values()):
+        return None
+    path = os.path.join(settings.profile_dir, name)
+    return path if os.path.isfile(path) else None
+
+
+def prune_profiles():
+    """Keep only the newest PROFILE_KEEP profiles"""
+    for stale in list_profiles()[settings.profile_keep:]:
+        try:
+            os.remove(os.path.join(settings.profile_dir, stale["name"]))
+        except OSError:
+            pass
+
+
+# Global profiler shared by all requests
+profiler = Profiler()
@@ -0,0 +1,36 @@
+"""Per-request context shared across routes, graph nodes and tool calls"""
+
+import re
+import uuid
+from contextvars import ContextVar
+from typing import Any, Optional
+
+# Identifies the analysis request on whose behalf upstream calls are made (also its trace id)
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+# Innermost open tracing span (see app.utils.tracing)
+current_span_var: ContextVar[Optional[Any]] = ContextVar("current_span", default=None)
+
+_REQUEST_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def is_valid_request_id(value: Optional[str]) -> bool:
+    """32 lowercase hex chars, the same shape as an OTLP trace id"""
+    return bool(value) and bool(_REQUEST_ID_RE.match(value))
+
+
+def new_request_id(request_id: Optional[str] = None) -> str:
+    """Bind `request_id` (or a fresh one) to the current context"""
+    request_id = request_id if is_valid_request_id(request_id) else uuid.uuid4().hex
+    request_id_var.set(request_id)
+    return request_id
+
+
+def get_request_id() -> str:
+    """Request id bound to the current context ('-' outside a request)"""
+    return request_id_var.get()
+
+
+def get_span_id() -> str:
+    """Id of the innermost open span ('-' outside one)"""
+    span = current_span_var.get()
+    return span.span_id if span is not None else "-"
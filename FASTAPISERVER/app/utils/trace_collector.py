@@ -0,0 +1,147 @@
+"""
+Local stand-in for an OTLP/HTTP trace collector: stores received spans and prints one line per trace
+
+    python -m app.utils.trace_collector --port 4318 --output logs/collected-traces.jsonl
+    TRACE_EXPORTER=otlp OTLP_ENDPOINT=http://127.0.0.1:4318/v1/traces python run.py
+
+`GET /v1/traces/{trace_id}` returns the spans received for one trace.
+"""
+
+import argparse
+import json
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+TRACES_PATH = "/v1/traces"
+
+
+def _attribute_value(value: Dict[str, Any]) -> Any:
+    if "arrayValue" in value:
+        return [_attribute_value(v) for v in value["arrayValue"].get("values", [])]
+    if "intValue" in value:
+        return int(value["intValue"])
+    for kind in ("stringValue", "doubleValue", "boolValue"):
+        if kind in value:
+            return value[kind]
+    return None
+
+
+def flatten(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Spans of an OTLP/HTTP JSON export request as flat dicts"""
+    spans = []
+    for resource_spans in payload.get("resourceSpans", []):
+        service = next(
+            (_attribute_value(a["value"]) for a in resource_spans.get("resource", {}).get("attributes", [])
+             if a.get("key") == "service.name"),
+            None
+        )
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for s in scope_spans.get("spans", []):
+                start, end = int(s["startTimeUnixNano"]), int(s["endTimeUnixNano"])
+                spans.append({
+                    "service": service,
+                    "trace_id": s["traceId"],
+                    "span_id": s["spanId"],
+                    "parent_id": s.get("parentSpanId"),
+                    "name": s["name"],
+                    "start_ns": start,
+                    "duration_ms": round((end - start) / 1e6, 3),
+                    "attributes": {a["key"]: _attribute_value(a["value"]) for a in s.get("attributes", [])},
+                    "error": s.get("status", {}).get("message") if s.get("status", {}).get("code") == 2 else None,
+                })
+    return spans
+
+
+class SpanStore:
+    """Spans grouped by trace id, keeping the newest `max_traces` traces"""
+
+    def __init__(self, max_traces: int = 1000, output: Optional[str] = None):
+        self.max_traces = max_traces
+        self.output = output
+        self._traces: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, spans: List[Dict[str, Any]]):
+        with self._lock:
+            for s in spans:
+                self._traces.setdefault(s["trace_id"], []).append(s)
+                self._traces.move_to_end(s["trace_id"])
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+            if self.output:
+                with open(self.output, "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(s) + "\n" for s in spans)
+        for s in spans:
+            if s["parent_id"] is None:
+                print(f"{s['trace_id']} {s['name']} {s['duration_ms']:.1f} ms", flush=True)
+
+    def trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return sorted(self._traces.get(trace_id, []), key=lambda s: s["start_ns"])
+
+
+def make_handler(store: SpanStore):
+    class CollectorRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def _reply(self, status: int, body: Any = None):
+            data = json.dumps(body if body is not None else {}).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if self.path != TRACES_PATH:
+                return self._reply(404)
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                spans = flatten(payload)
+            except (ValueError, KeyError, TypeError) as e:
+                return self._reply(400, {"error": str(e)})
+            store.add(spans)
+            self._reply(200, {"partialSuccess": {}})
+
+        def do_GET(self):
+            if self.path == "/v1/health":
+                return self._reply(200, {"status": "ok"})
+            if self.path.startswith(TRACES_PATH + "/"):
+                return self._reply(200, store.trace(self.path[len(TRACES_PATH) + 1:]))
+            self._reply(404)
+
+        def log_message(self, format, *args):
+            pass
+
+    return CollectorRequestHandler
+
+
+def serve(host: str = "127.0.0.1", port: int = 4318, max_traces: int = 1000, output: Optional[str] = None) -> ThreadingHTTPServer:
+    """The stand-in, bound but not yet serving; call `serve_forever()` (or run it in a thread)"""
+    server = ThreadingHTTPServer((host, port), make_handler(SpanStore(max_traces, output)))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--max-traces", type=int, default=1000)
+    parser.add_argument("--output", help="Also append every span to this JSON-lines file")
+    args = parser.parse_args()
+    server = serve(args.host, args.port, args.max_traces, args.output)
+    print(f"Trace collector stand-in listening on http://{args.host}:{args.port}{TRACES_PATH}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
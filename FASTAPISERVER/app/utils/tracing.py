@@ -0,0 +1,282 @@
+"""Request tracing: spans across graph nodes and upstream calls, exported as JSON lines or OTLP"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from app.config.settings import settings
+from app.utils.logger import logger, process_file
+from app.utils.metrics import metrics
+from app.utils.profiling import profiler
+from app.utils.request_context import current_span_var, get_request_id, is_valid_request_id
+
+
+class Span:
+    """One timed operation in a trace; its trace id is the request id"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = {k: v for k, v in attributes.items() if v is not None}
+        self.error: Optional[str] = None
+
+    def set(self, **attributes: Any):
+        """Add attributes (None values are skipped)"""
+        self.attributes.update((k, v) for k, v in attributes.items() if v is not None)
+
+    def add(self, name: str, amount: float = 1):
+        """Increment a numeric attribute"""
+        self.attributes[name] = self.attributes.get(name, 0) + amount
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+def current_span() -> Optional[Span]:
+    return current_span_var.get()
+
+
+def annotate(**attributes: Any):
+    """Set attributes on the innermost open span (no-op outside one)"""
+    active = current_span_var.get()
+    if active is not None:
+        active.set(**attributes)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """
+    Time the block as a child of the current span. Outside a request it
+    starts a new trace; an exception marks the span as failed.
+    """
+    parent = current_span_var.get()
+    if parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        request_id = get_request_id()
+        trace_id = request_id if is_valid_request_id(request_id) else uuid.uuid4().hex
+        parent_id = None
+    active = Span(name, trace_id, parent_id, attributes)
+    token = current_span_var.set(active)
+    # Child spans run on worker threads doing this request's work: join its profile, if any
+    # (root spans run on the shared event loop thread and are left out)
+    profiling = profiler.session_for(trace_id) if parent_id is not None else None
+    if profiling is not None:
+        profiling.thread_enter()
+    try:
+        yield active
+    except BaseException as e:
+        active.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        if profiling is not None:
+            profiling.thread_exit()
+        current_span_var.reset(token)
+        active.end_ns = time.time_ns()
+        tracer.record(active)
+
+
+class SpanExporter(ABC):
+    """Destination for finished spans; called from the tracer's export thread"""
+
+    @abstractmethod
+    def export(self, spans: List[Span]):
+        """Write a batch of finished spans"""
+
+    def close(self):
+        """Flush and release resources"""
+
+
+class JsonLinesExporter(SpanExporter):
+    """One JSON object per span, appended to a file that is rotated at `max_bytes`"""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, spans: List[Span]):
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            self._file.close()
+            os.replace(self.path, self.path + ".1")
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write("".join(json.dumps(s.to_dict(), default=str) + "\n" for s in spans))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def otlp_payload(spans: List[Span], service_name: str) -> Dict[str, Any]:
+    """OTLP/HTTP JSON body (ExportTraceServiceRequest) for a batch of spans"""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{
+            "scope": {"name": "app.utils.tracing"},
+            "spans": [{
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                "name": s.name,
+                "kind": 1,
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+            } for s in spans],
+        }],
+    }]}
+
+
+class OTLPHttpExporter(SpanExporter):
+    """POSTs batches as OTLP/HTTP JSON to a collector (`python -m app.utils.trace_collector` runs a stand-in)"""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 2.0):
+        import requests
+
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def export(self, spans: List[Span]):
+        self._session.post(
+            self.endpoint, json=otlp_payload(spans, self.service_name), timeout=self.timeout
+        ).raise_for_status()
+
+    def close(self):
+        self._session.close()
+
+
+def create_exporter() -> Optional[SpanExporter]:
+    """The TRACE_EXPORTER destination: jsonl, otlp or none"""
+    kind = settings.trace_exporter.lower()
+    if kind in ("", "none"):
+        return None
+    if kind == "jsonl":
+        return JsonLinesExporter(process_file(settings.trace_file), settings.trace_file_max_bytes)
+    if kind == "otlp":
+        return OTLPHttpExporter(settings.otlp_endpoint, settings.app_name)
+    raise ValueError(f"Unknown TRACE_EXPORTER {settings.trace_exporter!r} (use jsonl, otlp or none)")
+
+
+class Tracer:
+    """
+    Collects finished spans and hands them to the exporter on a background
+    thread, in batches, so exporting never blocks a request. Spans beyond
+    TRACE_QUEUE_SIZE waiting to be exported are dropped.
+    """
+
+    BATCH_SIZE = 256
+    FLUSH_SECONDS = 1.0
+
+    def __init__(self):
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=settings.trace_queue_size)
+        self._exporter: Optional[SpanExporter] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._disabled = False
+
+    def _ensure_started(self) -> bool:
+        if self._thread is not None:
+            return True
+        with self._lock:
+            if self._thread is None and not self._disabled:
+                try:
+                    self._exporter = create_exporter()
+                except Exception as e:
+                    logger.error(f"Tracing disabled: {e}")
+                    self._exporter = None
+                if self._exporter is None:
+                    self._disabled = True
+                    return False
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+                atexit.register(self.shutdown)
+        return self._thread is not None
+
+    def record(self, finished: Span):
+        if self._disabled or not self._ensure_started():
+            return
+        try:
+            self._queue.put_nowait(finished)
+        except queue.Full:
+            metrics.increment("trace_spans_dropped_total")
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch: List[Span] = []
+            flush_at = time.monotonic() + self.FLUSH_SECONDS
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    item = self._queue.get(timeout=max(0.0, flush_at - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            if batch:
+                try:
+                    self._exporter.export(batch)
+                    metrics.increment("trace_spans_exported_total", len(batch))
+                except Exception as e:
+                    metrics.increment("trace_export_errors_total")
+                    logger.warning(f"Exporting {len(batch)} spans failed: {e}")
+        self._exporter.close()
+
+    def shutdown(self):
+        """Export queued spans and stop the thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._disabled = True
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout=5)
+
+
+# Global tracer shared by all requests
+tracer = Tracer()
@@ -0,0 +1,507 @@
+"""
+Local stand-ins for the upstream APIs, for load tests that must not spend Groq or Gemini quota
+
+One server per upstream, each on its own port (so every stand-in keeps its
+own circuit breaker in the app):
+
+    groq            POST /openai/v1/chat/completions (streamed SSE or not), GET /openai/v1/models
+    gemini          POST /v1beta/models/{model}:generateContent and :streamGenerateContent, GET /v1beta/models/{model}
+    wikipedia       GET /api/rest_v1/page/summary/{title}
+    openfoodfacts   GET /cgi/search.pl, /category/{category}.json, /api/v2/product/{code}.json
+
+Answers are synthetic but shaped like the real APIs, and stable for the same
+request. Each upstream has a latency distribution (`fixed:MS`,
+`uniform:LO_MS:HI_MS` or `lognormal:MEDIAN_MS:SIGMA`) and an error rate;
+streamed answers send their first chunk after TTFT_FRACTION of the sampled
+latency. Failures answer `--error-status` after a tenth of it.
+
+    python -m app.utils.upstream_standins --port 8801 --latency gemini=lognormal:2000:0.6 --error-rate wikipedia=0.05
+    GROQ_BASE_URL=http://127.0.0.1:8801 GEMINI_BASE_URL=http://127.0.0.1:8802 \\
+    WIKIPEDIA_BASE_URL=http://127.0.0.1:8803 OPENFOODFACTS_BASE_URL=http://127.0.0.1:8804 \\
+    OPENFOODFACTS_CATEGORY_BASE_URL=http://127.0.0.1:8804 python run.py
+
+`GET /_standin/stats` on any port returns that stand-in's request counts by route and status.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import signal
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+UPSTREAMS = ("groq", "gemini", "wikipedia", "openfoodfacts")
+
+# Typical latencies of the real APIs (whole response)
+DEFAULT_LATENCY = {
+    "groq": "lognormal:700:0.35",
+    "gemini": "lognormal:1500:0.5",
+    "wikipedia": "lognormal:120:0.4",
+    "openfoodfacts": "lognormal:450:0.5",
+}
+TTFT_FRACTION = 0.25
+
+# Settings that point the app at each stand-in
+ENV_VARS = {
+    "groq": ("GROQ_BASE_URL",),
+    "gemini": ("GEMINI_BASE_URL",),
+    "wikipedia": ("WIKIPEDIA_BASE_URL",),
+    "openfoodfacts": ("OPENFOODFACTS_BASE_URL", "OPENFOODFACTS_CATEGORY_BASE_URL"),
+}
+
+# What the vision stand-in "reads" off a label; picked by image content
+LABELS = [
+    {
+        "brand": "Crispy Classic Salted",
+        "ingredients": ["Potato", "Palm Oil", "Salt", "Maltodextrin", "Flavour Enhancer (E621)", "Antioxidant (E319)"],
+        "nutrition": {"serving_size": "30g", "calories": 160, "total_fat_g": 10, "saturated_fat_g": 4.5, "sodium_mg": 170,
+                      "carbohydrates_g": 15, "fiber_g": 1, "sugars_g": 0.5, "protein_g": 2},
+    },
+    {
+        "brand": "Golden Oat Crunch",
+        "ingredients": ["Whole Grain Oats (52%)", "Sugar", "Wheat Flour", "Glucose Syrup", "Sunflower Oil", "Honey (2%)",
+                        "Salt", "Barley Malt Extract", "Emulsifier (Soy Lecithin)"],
+        "nutrition": {"serving_size": "40g", "calories": 160, "total_fat_g": 3, "saturated_fat_g": 0.5, "sodium_mg": 95,
+                      "carbohydrates_g": 29, "fiber_g": 3, "sugars_g": 10, "protein_g": 4},
+    },
+    {
+        "brand": "Choco Cream Biscuits",
+        "ingredients": ["Refined Wheat Flour (Maida)", "Sugar", "Edible Vegetable Oil (Palm)", "Cocoa Solids (4%)",
+                        "Invert Sugar Syrup", "Raising Agents (503(ii), 500(ii))", "Salt", "Emulsifier (322)"],
+        "nutrition": {"serving_size": "100g", "calories": 486, "total_fat_g": 20, "saturated_fat_g": 9.8, "sodium_mg": 290,
+                      "carbohydrates_g": 70, "sugars_g": 34, "protein_g": 6},
+    },
+]
+
+ALTERNATIVES = [
+    ("Tata Sampann", "Roasted Chana", "a", 1, ["en:vegetarian", "en:vegan"]),
+    ("Farmley", "Plain Makhana", "a", 1, ["en:vegetarian", "en:vegan", "en:no-additives"]),
+    ("Happilo", "Unsalted Mixed Nuts", "b", 1, ["en:vegetarian", "en:vegan"]),
+    ("Yoga Bar", "Wholegrain Muesli", "b", 3, ["en:vegetarian", "en:organic"]),
+    ("Kellogg's", "Muesli No Added Sugar", "b", 3, ["en:vegetarian", "en:low-sugar"]),
+    ("Too Yumm", "Multigrain Chips", "c", 4, ["en:vegetarian"]),
+    ("Britannia", "NutriChoice Digestive", "c", 4, ["en:vegetarian"]),
+    ("Sunfeast", "Dark Fantasy", "e", 4, ["en:vegetarian"]),
+]
+
+
+class StandinError(Exception):
+    """An injected failure; answered with the stand-in's error status"""
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Sampler (seconds) for `fixed:MS`, `uniform:LO_MS:HI_MS` or `lognormal:MEDIAN_MS:SIGMA`"""
+    kind, *values = spec.split(":")
+    try:
+        numbers = [float(v) for v in values]
+        if kind == "fixed" and len(numbers) == 1:
+            return lambda rng: numbers[0] / 1000
+        if kind == "uniform" and len(numbers) == 2:
+            return lambda rng: rng.uniform(numbers[0], numbers[1]) / 1000
+        if kind == "lognormal" and len(numbers) == 2:
+            median, sigma = numbers
+            return lambda rng: median * rng.lognormvariate(0, sigma) / 1000
+    except ValueError:
+        pass
+    raise ValueError(f"Bad latency {spec!r} (use fixed:MS, uniform:LO_MS:HI_MS or lognormal:MEDIAN_MS:SIGMA)")
+
+
+def _digest(*parts: Any) -> int:
+    return int(hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:12], 16)
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _pieces(text: str, size: int) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+def _texts(value: Any) -> Iterable[str]:
+    """Every "text" string in a JSON request body"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key == "text" and isinstance(item, str):
+                yield item
+            else:
+                yield from _texts(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _texts(item)
+
+
+# --- Synthetic answers ----------------------------------------------------
+
+def vision_answer(request: Dict[str, Any]) -> str:
+    """Label JSON in a code block, as the vision model writes it"""
+    images = [part.get("image_url", {}).get("url", "") for message in request.get("messages", [])
+              for part in (message.get("content") if isinstance(message.get("content"), list) else [])]
+    label = LABELS[_digest(images) % len(LABELS)]
+    return "```json\n" + json.dumps(label, indent=2) + "\n```"
+
+
+def ingredient_profile(name: str) -> Dict[str, Any]:
+    low = name.lower()
+    if any(word in low for word in ("potato", "oats", "honey", "cocoa")):
+        nova = 1
+    elif re.search(r"e\d{3}|\d{3}|flavour|enhancer|emulsifier|syrup|maltodextrin|agents", low):
+        nova = 4
+    else:
+        nova = 2
+    return {
+        "name": re.sub(r"\s*\(.*", "", name).strip() or name,
+        "manufacturing": {1: "Natural, minimally processed", 2: "Refined from natural sources", 4: "Synthetic or industrially modified"}[nova],
+        "regulatory_gap": "Permitted in the EU, US and India within labelled limits",
+        "health_risks": {1: "No known risks at normal intake", 2: "Excess intake adds calories; moderate use advised",
+                         4: "Frequent ultra-processed intake is linked to poorer diet quality"}[nova],
+        "nova_score": nova,
+    }
+
+
+def gemini_answer(prompt: str) -> str:
+    """What each graph node asks Gemini for, recognised by its prompt"""
+    if "JSON array of ingredient profiles" in prompt:
+        names = [line[2:] for line in prompt.split("\n") if line.startswith("- ")]
+        return "```json\n" + json.dumps([ingredient_profile(name) for name in names], indent=1) + "\n```"
+    if "ENGINE VERDICT" in prompt:
+        product = re.search(r"Product:?\s*(.+)", prompt)
+        verdict = re.search(r"ENGINE VERDICT:?\s*(.+?)\s*\(flags", prompt)
+        return (
+            f"🤔 Scanning your {product.group(1).strip() if product else 'product'}...\n\n"
+            f"**Quick Decision:** {verdict.group(1) if verdict else 'OK in moderation.'} It is high in refined ingredients for your profile.\n\n"
+            "**COLOR_CODE:** #F97316\n\n"
+            "**Why This Matters To You:**\n- **Sodium and fat**: a serving covers a noticeable share of your daily limit.\n"
+            "- **Processing**: several additives mark it as ultra-processed.\n\n"
+            "**Tradeoffs:** convenient and tasty, but easy to overeat.\n\n"
+            "**What I'm Unsure About:**\n- **Oil source**: the label does not say whether the oil is refined.\n\n"
+            "**Better Options:** 🛒\n- Roasted chana\n- Plain makhana\n- Unsalted mixed nuts"
+        )
+    if "PRODUCT DATA" in prompt:
+        return ("**Key risks for this user**\n1. Sodium: moderate per serving, adds up quickly.\n"
+                "2. Saturated fat from palm oil: relevant for cholesterol.\n"
+                "3. Refined carbohydrates and sugars: raise blood glucose.")
+    return "Limit sodium < 1500mg/day; limit added sugar; avoid listed allergens; prefer minimally processed foods."
+
+
+def wikipedia_summary(title: str) -> Tuple[int, Dict[str, Any]]:
+    if title == "Salt":
+        return 200, {"type": "disambiguation", "title": title, "extract": "Salt may refer to:"}
+    if re.search(r"\d|agents|solids|enhancer", title.lower()):
+        return 404, {"type": "https://mediawiki.org/wiki/HyperSwitch/errors/not_found", "title": "Not found."}
+    return 200, {
+        "type": "standard",
+        "title": title,
+        "extract": (f"{title} is a common food ingredient, produced industrially and used in packaged foods for its "
+                    f"flavour, texture or shelf-life. Food safety agencies have evaluated {title.lower()} and set "
+                    "conditions of use; intake guidance depends on the amount eaten."),
+    }
+
+
+def off_search(terms: str) -> Dict[str, Any]:
+    low = terms.lower()
+    if "oat" in low or "cereal" in low:
+        categories = ["en:plant-based-foods", "en:breakfast-cereals"]
+    elif "biscuit" in low:
+        categories = ["en:snacks", "en:biscuits"]
+    else:
+        categories = ["en:snacks", "en:salty-snacks"]
+    return {"count": 1, "page": 1, "products": [{
+        "product_name": terms.title(), "brands": "Generic", "nutriscore_grade": "cdeab"[_digest(low) % 5],
+        "nova_group": 3, "categories_tags": categories, "ingredients_text": terms, "labels_tags": [], "allergens_tags": [],
+    }]}
+
+
+def off_category(category: str, page_size: int) -> Dict[str, Any]:
+    products = [
+        {"product_name": name, "brands": brand, "nutriscore_grade": grade, "nova_group": nova, "labels_tags": labels,
+         "allergens_tags": [], "ingredients_text": f"{name} ({category})"}
+        for brand, name, grade, nova, labels in ALTERNATIVES
+    ]
+    return {"count": len(products), "page": 1, "products": products[:page_size]}
+
+
+# --- Servers --------------------------------------------------------------
+
+class Standin:
+    """One stand-in upstream: its latency sampler, error rate and request counts"""
+
+    def __init__(self, name: str, latency: str, error_rate: float, error_status: int):
+        self.name = name
+        self.latency_spec = latency
+        self.sample = parse_latency(latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.counts: Counter = Counter()
+        self._rng = random.Random()
+        self._lock = threading.Lock()
+
+    def begin(self) -> float:
+        """Latency for one request (seconds); raises StandinError for an injected failure"""
+        with self._lock:
+            latency = self.sample(self._rng)
+            failed = self._rng.random() < self.error_rate
+        if failed:
+            time.sleep(latency / 10)
+            raise StandinError(f"injected {self.name} failure")
+        return latency
+
+    def count(self, route: str, status: int):
+        with self._lock:
+            self.counts[f"{route} {status}"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "upstream": self.name,
+                "latency": self.latency_spec,
+                "error_rate": self.error_rate,
+                "requests": sum(self.counts.values()),
+                "by_route": dict(sorted(self.counts.items())),
+            }
+
+
+def make_handler(standin: Standin):
+    class StandinRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def _reply(self, status: int, body: Any, route: str):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            standin.count(route, status)
+
+        def _stream(self, content_type: str, chunks: List[bytes], latency: float, route: str):
+            """Chunked response: the first chunk after TTFT_FRACTION of `latency`, the rest spread over it"""
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            time.sleep(latency * TTFT_FRACTION)
+            gap = latency * (1 - TTFT_FRACTION) / max(1, len(chunks) - 1)
+            for i, chunk in enumerate(chunks):
+                if i:
+                    time.sleep(gap)
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+            standin.count(route, 200)
+
+        route = "unknown"
+
+        def _error(self, route: str):
+            status = standin.error_status
+            if standin.name == "gemini":
+                body = {"error": {"code": status, "message": "Stand-in failure", "status": "UNAVAILABLE"}}
+            else:
+                body = {"error": {"message": "Stand-in failure", "type": "service_unavailable"}}
+            self._reply(status, body, route)
+
+        def _body(self) -> Dict[str, Any]:
+            length = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(length)) if length else {}
+
+        def _handle(self, method: str):
+            url = urlparse(self.path)
+            if url.path == "/_standin/stats":
+                return self._reply(200, standin.stats(), "stats")
+            body = self._body() if method == "POST" else {}
+            route = ROUTES.get(standin.name)
+            try:
+                handled = route(self, method, url, body) if route else False
+            except StandinError:
+                return self._error(self.route)
+            if handled is False:
+                self._reply(404, {"error": {"message": f"No stand-in route for {method} {url.path}"}}, "unknown")
+
+        def do_GET(self):
+            self._handle("GET")
+
+        def do_POST(self):
+            self._handle("POST")
+
+        def log_message(self, format, *args):
+            pass
+
+    return StandinRequestHandler
+
+
+def groq_routes(handler, method: str, url, body: Dict[str, Any]):
+    if method == "GET" and url.path == "/openai/v1/models":
+        time.sleep(handler_latency(handler, "models"))
+        return handler._reply(200, {"object": "list", "data": [{"id": "stand-in", "object": "model"}]}, "models")
+    if method != "POST" or url.path != "/openai/v1/chat/completions":
+        return False
+    stream = bool(body.get("stream"))
+    latency = handler_latency(handler, "chat.completions stream" if stream else "chat.completions")
+    text = vision_answer(body)
+    created, model = int(time.time()), body.get("model", "stand-in")
+    usage = {"prompt_tokens": 1450, "completion_tokens": _tokens(text), "total_tokens": 1450 + _tokens(text)}
+    completion_id = f"chatcmpl-{_digest(text, time.time_ns()):x}"
+    if not stream:
+        time.sleep(latency)
+        return handler._reply(200, {
+            "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage,
+        }, "chat.completions")
+
+    def event(delta: Dict[str, Any], finish: Optional[str] = None, **extra: Any) -> bytes:
+        chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                 "choices": [{"index": 0, "delta": delta, "finish_reason": finish}], **extra}
+        return b"data: " + json.dumps(chunk).encode() + b"\n\n"
+
+    chunks = [event({"role": "assistant", "content": piece}) for piece in _pieces(text, 16)]
+    # Groq reports usage on the final chunk, under x_groq
+    chunks.append(event({}, "stop", x_groq={"id": completion_id, "usage": usage}) + b"data: [DONE]\n\n")
+    handler._stream("text/event-stream", chunks, latency, "chat.completions stream")
+
+
+def gemini_routes(handler, method: str, url, body: Dict[str, Any]):
+    match = re.fullmatch(r"/v1beta/models/([^/:]+)(?::(generateContent|streamGenerateContent))?", url.path)
+    if match is None:
+        return False
+    model, action = match.groups()
+    if method == "GET" and action is None:
+        time.sleep(handler_latency(handler, "models.get"))
+        return handler._reply(200, {"name": f"models/{model}", "displayName": f"{model} (stand-in)"}, "models.get")
+    if method != "POST" or action is None:
+        return False
+    latency = handler_latency(handler, action)
+    prompt = "\n".join(_texts(body))
+    text = gemini_answer(prompt)
+    usage = {"promptTokenCount": _tokens(prompt), "candidatesTokenCount": _tokens(text),
+             "totalTokenCount": _tokens(prompt) + _tokens(text)}
+
+    def response(piece: str, last: bool) -> Dict[str, Any]:
+        candidate = {"content": {"parts": [{"text": piece}], "role": "model"}, "index": 0}
+        if last:
+            candidate["finishReason"] = "STOP"
+        return {"candidates": [candidate], **({"usageMetadata": usage} if last else {}), "modelVersion": model}
+
+    if action == "generateContent":
+        time.sleep(latency)
+        return handler._reply(200, response(text, True), "generateContent")
+    # A JSON array written element by element, as the REST transport reads it
+    pieces = _pieces(text, 48)
+    chunks = [
+        (b"[" if i == 0 else b",\r\n") + json.dumps(response(piece, i == len(pieces) - 1)).encode()
+        for i, piece in enumerate(pieces)
+    ]
+    chunks[-1] += b"]"
+    handler._stream("application/json", chunks, latency, "streamGenerateContent")
+
+
+def wikipedia_routes(handler, method: str, url, body: Dict[str, Any]):
+    prefix = "/api/rest_v1/page/summary/"
+    if method != "GET" or not url.path.startswith(prefix):
+        return False
+    latency = handler_latency(handler, "summary")
+    status, summary = wikipedia_summary(unquote(url.path[len(prefix):]).replace("_", " "))
+    time.sleep(latency)
+    handler._reply(status, summary, "summary")
+
+
+def openfoodfacts_routes(handler, method: str, url, body: Dict[str, Any]):
+    if method != "GET":
+        return False
+    query = {key: values[0] for key, values in parse_qs(url.query).items()}
+    category = re.fullmatch(r"/category/(.+)\.json", url.path)
+    if url.path == "/cgi/search.pl":
+        answer, route = off_search(query.get("search_terms", "")), "search"
+    elif category is not None:
+        answer, route = off_category(unquote(category.group(1)), int(query.get("page_size", 24))), "category"
+    elif url.path.startswith("/api/v2/product/"):
+        answer, route = {"status": 1, "code": url.path.rsplit("/", 1)[1].split(".")[0]}, "product"
+    else:
+        return False
+    time.sleep(handler_latency(handler, route))
+    handler._reply(200, answer, route)
+
+
+def handler_latency(handler, route: str) -> float:
+    """Sampled latency for this request, counted under `route` if it is an injected failure"""
+    handler.route = route
+    return handler.server.standin.begin()
+
+
+ROUTES = {
+    "groq": groq_routes,
+    "gemini": gemini_routes,
+    "wikipedia": wikipedia_routes,
+    "openfoodfacts": openfoodfacts_routes,
+}
+
+
+def serve(standin: Standin, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """The stand-in, bound but not yet serving; call `serve_forever()` (or run it in a thread)"""
+    server = ThreadingHTTPServer((host, port), make_handler(standin))
+    server.daemon_threads = True
+    server.standin = standin
+    return server
+
+
+def _per_upstream(values: List[str], option: str, cast: Callable[[str], Any]) -> Dict[str, Any]:
+    parsed = {}
+    for value in values:
+        name, _, setting = value.partition("=")
+        if name not in UPSTREAMS or not setting:
+            raise SystemExit(f"{option} takes UPSTREAM=VALUE with UPSTREAM one of {', '.join(UPSTREAMS)}: {value!r}")
+        parsed[name] = cast(setting)
+    return parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8801, help="groq on PORT, gemini PORT+1, wikipedia PORT+2, openfoodfacts PORT+3")
+    parser.add_argument("--latency", action="append", default=[], metavar="UPSTREAM=SPEC",
+                        help=f"latency distribution per upstream (defaults: {', '.join(f'{k}={v}' for k, v in DEFAULT_LATENCY.items())})")
+    parser.add_argument("--error-rate", action="append", default=[], metavar="UPSTREAM=RATE",
+                        help="fraction of requests answered with --error-status (default 0)")
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+
+    latencies = {**DEFAULT_LATENCY, **_per_upstream(args.latency, "--latency", str)}
+    error_rates = _per_upstream(args.error_rate, "--error-rate", float)
+    try:
+        standins = [Standin(name, latencies[name], error_rates.get(name, 0.0), args.error_status) for name in UPSTREAMS]
+    except ValueError as e:
+        raise SystemExit(str(e))
+    servers = []
+    for offset, standin in enumerate(standins):
+        name = standin.name
+        server = serve(standin, args.host, args.port + offset)
+        threading.Thread(target=server.serve_forever, name=f"standin-{name}", daemon=True).start()
+        servers.append(server)
+        base_url = f"http://{args.host}:{server.server_address[1]}"
+        print(f"{name:14} {base_url}  latency {standin.latency_spec}, errors {standin.error_rate:.0%}", flush=True)
+    print("\nPoint the app at them with:")
+    for server in servers:
+        for env_var in ENV_VARS[server.standin.name]:
+            print(f"  {env_var}=http://{args.host}:{server.server_address[1]}")
+    # Print the request counts on `kill` as well as on Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+            print(json.dumps(server.standin.stats()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Event-loop lag under concurrent CPU-heavy request work, inline vs. the CPU process pool
+
+Each simulated request does what an analysis does between network waits:
+base64 of a multi-MB label photo and parsing a 50-product OpenFoodFacts
+page. Requests run in worker threads (as the graph
+does) while a probe measures how late the event loop wakes up.
+
+    python -m benchmarks.event_loop_lag --requests 40 --concurrency 8 --cpu-workers 2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from app.utils import cpu_tasks  # noqa: E402
+from app.utils.executors import Executors  # noqa: E402
+
+PROBE_INTERVAL = 0.005
+
+
+def make_image(directory: str, megabytes: float) -> str:
+    path = os.path.join(directory, "label.jpg")
+    with open(path, "wb") as f:
+        f.write(os.urandom(int(megabytes * 1024 * 1024)))
+    return path
+
+
+def make_off_page(products: int = 50) -> bytes:
+    return json.dumps({"products": [
+        {
+            "product_name": f"Product {i}",
+            "brands": "Brand",
+            "nutriscore_grade": "b",
+            "nova_group": 3,
+            "ingredients_text": ", ".join(f"ingredient {j}" for j in range(120)),
+            "allergens_tags": ["en:milk", "en:gluten"],
+            "labels_tags": ["en:vegetarian"],
+        }
+        for i in range(products)
+    ]}).encode()
+
+
+def request_work(executors: Executors, image_path: str, off_page: bytes):
+    executors.run_cpu(cpu_tasks.encode_image_file, image_path, size=os.path.getsize(image_path))
+    executors.run_cpu(cpu_tasks.parse_json, off_page, size=len(off_page))
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run(executors: Executors, args, image_path: str, off_page: bytes) -> dict:
+    lags, latencies = [], []
+    stop = asyncio.Event()
+
+    async def probe():
+        while not stop.is_set():
+            expected = time.perf_counter() + PROBE_INTERVAL
+            await asyncio.sleep(PROBE_INTERVAL)
+            lags.append(max(0.0, time.perf_counter() - expected))
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one_request():
+        async with semaphore:
+            start = time.perf_counter()
+            await asyncio.to_thread(request_work, executors, image_path, off_page)
+            latencies.append(time.perf_counter() - start)
+
+    probe_task = asyncio.create_task(probe())
+    started = time.perf_counter()
+    await asyncio.gather(*(one_request() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    return {
+        "loop_lag_p50_ms": statistics.median(lags) * 1000,
+        "loop_lag_p99_ms": percentile(lags, 99) * 1000,
+        "loop_lag_max_ms": max(lags) * 1000,
+        "request_p50_s": statistics.median(latencies),
+        "request_p99_s": percentile(latencies, 99),
+        "throughput_rps": args.requests / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--cpu-workers", type=int, default=2)
+    parser.add_argument("--image-mb", type=float, default=3.0)
+    args = parser.parse_args()
+
+    off_page = make_off_page()
+    with tempfile.TemporaryDirectory() as directory:
+        image_path = make_image(directory, args.image_mb)
+        print(f"{args.requests} requests, concurrency {args.concurrency}, {args.image_mb} MB image, "
+              f"{len(off_page) // 1024} KB OFF page, "
+              f"{os.cpu_count()} CPUs")
+        for label, workers in (("inline (request threads)", 0), (f"process pool ({args.cpu_workers} workers)", args.cpu_workers)):
+            executors = Executors(workers, min_offload_bytes=65536)
+            executors.start()
+            try:
+                result = asyncio.run(run(executors, args, image_path, off_page))
+            finally:
+                executors.shutdown()
+            print(f"\n{label}")
+            for key, value in result.items():
+                print(f"  {key:<18} {value:8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,683 @@
+"""
+Deterministic replay of the health copilot graph over a corpus of labels
+
+Runs `build_health_copilot` over the labels in `fixtures/corpus.json` with
+every upstream answered from `fixtures/recordings.json`: Groq vision
+completions, Gemini calls (plain, streamed and structured), Wikipedia
+summaries and OpenFoodFacts searches. No network and no API keys are needed,
+and a request the recordings do not cover fails the run instead of going out.
+
+The shared cache is off so every iteration does the full work, and the
+provider quotas are lifted (in-flight caps still apply) so repeated replays
+measure the graph rather than the rate limiter. `--latency-scale 1` sleeps the
+recorded upstream latencies (time to first token, then the rest spread over
+the streamed chunks); the default 0 measures our own overhead only.
+
+The report has per-node and per-call p50/p95/p99, wall time per analysis and
+in total, tokens per provider and label, optional allocation figures
+(tracemalloc, a separate pass) and a determinism check, and is written as JSON
+so two commits can be diffed with `--compare`.
+
+    python -m benchmarks.graph_replay --iterations 20 --output before.json
+    python -m benchmarks.graph_replay --iterations 20 --compare before.json
+    python -m benchmarks.graph_replay --latency-scale 1 --allocations
+    python -m benchmarks.graph_replay --record   # real GROQ_API_KEY / GOOGLE_API_KEY and network
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+from unittest import mock
+
+os.environ.setdefault("GOOGLE_API_KEY", "replay")
+os.environ.setdefault("GROQ_API_KEY", "replay")
+os.environ["CACHE_URL"] = ""
+os.environ.setdefault("TRACE_EXPORTER", "none")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+for _quota in (
+    "GROQ_REQUESTS_PER_MINUTE", "GROQ_TOKENS_PER_MINUTE",
+    "GEMINI_REQUESTS_PER_MINUTE", "GEMINI_TOKENS_PER_MINUTE",
+    "OPENFOODFACTS_REQUESTS_PER_MINUTE", "WIKIPEDIA_REQUESTS_PER_MINUTE",
+):
+    os.environ.setdefault(_quota, "1000000")
+
+import requests  # noqa: E402
+from langchain_core.messages import AIMessage, AIMessageChunk  # noqa: E402
+from app.config.settings import settings  # noqa: E402
+from app.services.governor import _prompt_text  # noqa: E402
+from app.services.health_agent import build_health_copilot, resolve_fields  # noqa: E402
+from app.services.health_agent import routing, tools  # noqa: E402
+from app.services.health_agent.deadline import new_deadline  # noqa: E402
+from app.services.health_agent.streaming import chunk_text  # noqa: E402
+from app.services.resilience import TTLCache, TTLSet, circuit_breakers  # noqa: E402
+from app.utils import tracing  # noqa: E402
+from app.utils.executors import executors  # noqa: E402
+from app.utils.request_context import new_request_id  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+RECORDINGS_FORMAT = 1
+REPORT_FORMAT = 1
+
+# The real clients, captured before any patching (used by --record)
+REAL_GROQ = tools.Groq
+REAL_CHAT_MODEL = routing.ChatGoogleGenerativeAI
+REAL_CLIENT_SESSION = tools.aiohttp.ClientSession
+REAL_GET = tools.requests.get
+
+
+class MissingRecording(LookupError):
+    """An upstream request the recordings have no answer for"""
+
+
+def recording_key(provider: str, request: Any) -> str:
+    """Stable key of an upstream request: provider plus a digest of its canonical JSON"""
+    canonical = json.dumps(request, sort_keys=True, default=str, ensure_ascii=False)
+    return f"{provider}:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:32]}"
+
+
+class Cassette:
+    """
+    Recorded upstream answers by request key.
+
+    Replaying looks answers up (a miss raises MissingRecording and is kept in
+    `missing`); recording stores what the real upstream answered. Either way
+    `pause` sleeps recorded latency times `latency_scale`.
+    """
+
+    def __init__(self, entries: Dict[str, Dict[str, Any]], recording: bool = False, latency_scale: float = 0.0):
+        self.entries = entries
+        self.recording = recording
+        self.latency_scale = latency_scale
+        self.missing: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str, latency_scale: float = 0.0) -> "Cassette":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != RECORDINGS_FORMAT:
+            raise SystemExit(f"{path}: unsupported recordings format {data.get('format')!r}")
+        return cls(data["entries"], latency_scale=latency_scale)
+
+    def save(self, path: str, source: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "format": RECORDINGS_FORMAT,
+                "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "source": source,
+                "entries": dict(sorted(self.entries.items())),
+            }, f, indent=1, ensure_ascii=False)
+            f.write("\n")
+
+    def lookup(self, key: str, describe: str) -> Dict[str, Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            with self._lock:
+                self.missing[key] = describe
+            raise MissingRecording(f"No recording for {describe} ({key})")
+        return entry
+
+    def store(self, key: str, provider: str, describe: str, started: float, response: Dict[str, Any],
+              first_token: Optional[float] = None):
+        entry = {
+            "provider": provider,
+            "describe": describe,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "response": response,
+        }
+        if first_token is not None:
+            entry["ttft_ms"] = round((first_token - started) * 1000, 1)
+        with self._lock:
+            self.entries[key] = entry
+
+    def pause(self, milliseconds: float):
+        if self.latency_scale and milliseconds > 0:
+            time.sleep(milliseconds * self.latency_scale / 1000)
+
+    async def pause_async(self, milliseconds: float):
+        if self.latency_scale and milliseconds > 0:
+            await asyncio.sleep(milliseconds * self.latency_scale / 1000)
+
+    def streamed(self, entry: Dict[str, Any], chunks: List[Any]) -> Iterator[Any]:
+        """Yield chunks paced like the recording: first token, then the rest evenly"""
+        self.pause(entry.get("ttft_ms", 0))
+        gap = max(0.0, entry["latency_ms"] - entry.get("ttft_ms", 0)) / max(1, len(chunks))
+        for i, chunk in enumerate(chunks):
+            if i:
+                self.pause(gap)
+            yield chunk
+
+
+# --- Groq -----------------------------------------------------------------
+
+class ReplayGroq:
+    """Stand-in for groq.Groq: streamed chat completions from the cassette"""
+
+    def __init__(self, cassette: Cassette, **client_kwargs):
+        self.cassette = cassette
+        self.inner = REAL_GROQ(**client_kwargs) if cassette.recording else None
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs) -> Iterator[Any]:
+        request = {k: v for k, v in kwargs.items() if k != "timeout"}
+        key = recording_key("groq", request)
+        describe = f"groq {kwargs.get('model')} chat completion"
+        if self.cassette.recording:
+            self._record(key, describe, kwargs)
+        entry = self.cassette.lookup(key, describe)
+        return self._chunks(entry)
+
+    def _record(self, key: str, describe: str, kwargs: Dict[str, Any]):
+        started, first_token = time.perf_counter(), None
+        pieces, tokens = [], None
+        for chunk in self.inner.chat.completions.create(**kwargs):
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or getattr(chunk, "usage", None)
+            tokens = getattr(usage, "total_tokens", None) or tokens
+            if chunk.choices and chunk.choices[0].delta.content:
+                first_token = first_token or time.perf_counter()
+                pieces.append(chunk.choices[0].delta.content)
+        self.cassette.store(key, "groq", describe, started, {"chunks": pieces, "total_tokens": tokens}, first_token)
+
+    def _chunks(self, entry: Dict[str, Any]) -> Iterator[Any]:
+        response = entry["response"]
+        chunks = [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))], usage=None, x_groq=None)
+            for piece in response["chunks"]
+        ]
+        # Groq reports usage on a final, empty chunk
+        chunks.append(SimpleNamespace(
+            choices=[], usage=None, x_groq=SimpleNamespace(usage=SimpleNamespace(total_tokens=response["total_tokens"]))
+        ))
+        return self.cassette.streamed(entry, chunks)
+
+
+# --- Gemini ---------------------------------------------------------------
+
+class ReplayChatModel:
+    """Stand-in for ChatGoogleGenerativeAI: invoke, stream and structured output from the cassette"""
+
+    def __init__(self, cassette: Cassette, model: str, **model_kwargs):
+        self.cassette = cassette
+        self.model = model
+        self.inner = REAL_CHAT_MODEL(model=model, **model_kwargs) if cassette.recording else None
+
+    def _key(self, kind: str, prompt: Any):
+        text = _prompt_text(prompt)
+        describe = f"gemini {self.model} {kind}: {' '.join(text.split())[:80]}"
+        return recording_key("gemini", {"model": self.model, "kind": kind, "prompt": text}), describe
+
+    def invoke(self, prompt: Any, *args, **kwargs) -> AIMessage:
+        key, describe = self._key("invoke", prompt)
+        if self.cassette.recording:
+            started = time.perf_counter()
+            message = self.inner.invoke(prompt, *args, **kwargs)
+            response = {"content": chunk_text(message), "usage": dict(message.usage_metadata or {}) or None}
+            self.cassette.store(key, "gemini", describe, started, response)
+        entry = self.cassette.lookup(key, describe)
+        self.cassette.pause(entry["latency_ms"])
+        return AIMessage(content=entry["response"]["content"], usage_metadata=entry["response"]["usage"])
+
+    def stream(self, prompt: Any, *args, **kwargs) -> Iterator[AIMessageChunk]:
+        key, describe = self._key("stream", prompt)
+        if self.cassette.recording:
+            started, first_token = time.perf_counter(), None
+            pieces, usage = [], None
+            for chunk in self.inner.stream(prompt, *args, **kwargs):
+                usage = dict(chunk.usage_metadata) if getattr(chunk, "usage_metadata", None) else usage
+                text = chunk_text(chunk)
+                if text:
+                    first_token = first_token or time.perf_counter()
+                    pieces.append(text)
+            self.cassette.store(key, "gemini", describe, started, {"chunks": pieces, "usage": usage}, first_token)
+        entry = self.cassette.lookup(key, describe)
+        pieces = entry["response"]["chunks"] or [""]
+        # Gemini reports usage on the final chunk
+        chunks = [
+            AIMessageChunk(content=piece, usage_metadata=entry["response"]["usage"] if i == len(pieces) - 1 else None)
+            for i, piece in enumerate(pieces)
+        ]
+        return self.cassette.streamed(entry, chunks)
+
+    def with_structured_output(self, schema: Any, **kwargs) -> "ReplayStructuredModel":
+        inner = self.inner.with_structured_output(schema, **kwargs) if self.inner is not None else None
+        return ReplayStructuredModel(self, schema, inner)
+
+
+class ReplayStructuredModel:
+    """`with_structured_output(schema)` of a ReplayChatModel"""
+
+    def __init__(self, model: ReplayChatModel, schema: Any, inner: Any):
+        self.model = model
+        self.schema = schema
+        self.inner = inner
+
+    def invoke(self, prompt: Any, *args, **kwargs) -> Any:
+        cassette = self.model.cassette
+        key, describe = self.model._key(f"structured {self.schema.__name__}", prompt)
+        if cassette.recording:
+            started = time.perf_counter()
+            result = self.inner.invoke(prompt, *args, **kwargs)
+            cassette.store(key, "gemini", describe, started, {"structured": result.model_dump()})
+        entry = cassette.lookup(key, describe)
+        cassette.pause(entry["latency_ms"])
+        return self.schema(**entry["response"]["structured"])
+
+
+# --- Wikipedia and OpenFoodFacts (HTTP) -----------------------------------
+
+class ReplayHttpResponse:
+    """Enough of an aiohttp and a requests response for the tools that read them"""
+
+    def __init__(self, status: int, body: str):
+        self.status = self.status_code = status
+        self.text = body
+        self.content = body.encode("utf-8")
+        self.ok = status < 400
+
+    async def read(self) -> bytes:
+        return self.content
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"HTTP {self.status}")
+
+
+class ReplayClientSession:
+    """Stand-in for aiohttp.ClientSession (Wikipedia summaries)"""
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+        self.inner = None
+
+    async def __aenter__(self) -> "ReplayClientSession":
+        if self.cassette.recording:
+            self.inner = REAL_CLIENT_SESSION()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self.inner is not None:
+            await self.inner.close()
+
+    @contextlib.asynccontextmanager
+    async def get(self, url: str, headers: Any = None, timeout: Any = None):
+        key, describe = recording_key("wikipedia", {"url": url}), f"wikipedia GET {url}"
+        if self.cassette.recording:
+            started = time.perf_counter()
+            async with self.inner.get(url, headers=headers, timeout=timeout) as response:
+                body = (await response.read()).decode("utf-8")
+                self.cassette.store(key, "wikipedia", describe, started, {"status": response.status, "body": body})
+        entry = self.cassette.lookup(key, describe)
+        await self.cassette.pause_async(entry["latency_ms"])
+        yield ReplayHttpResponse(entry["response"]["status"], entry["response"]["body"])
+
+
+def replay_get(cassette: Cassette):
+    """Stand-in for requests.get (OpenFoodFacts)"""
+
+    def get(url: str, params: Any = None, **kwargs) -> ReplayHttpResponse:
+        key = recording_key("openfoodfacts", {"url": url, "params": params})
+        describe = f"openfoodfacts GET {url}" + (f" {params}" if params else "")
+        if cassette.recording:
+            started = time.perf_counter()
+            response = REAL_GET(url, params=params, **kwargs)
+            cassette.store(key, "openfoodfacts", describe, started, {"status": response.status_code, "body": response.text})
+        entry = cassette.lookup(key, describe)
+        cassette.pause(entry["latency_ms"])
+        return ReplayHttpResponse(entry["response"]["status"], entry["response"]["body"])
+
+    return get
+
+
+@contextlib.contextmanager
+def replaying(cassette: Cassette) -> Iterator[None]:
+    """Route every upstream client the graph builds through `cassette`"""
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(mock.patch.object(tools, "Groq", lambda **kwargs: ReplayGroq(cassette, **kwargs)))
+        stack.enter_context(mock.patch.object(
+            routing, "ChatGoogleGenerativeAI", lambda model, **kwargs: ReplayChatModel(cassette, model, **kwargs)
+        ))
+        stack.enter_context(mock.patch.object(tools.aiohttp, "ClientSession", lambda: ReplayClientSession(cassette)))
+        stack.enter_context(mock.patch.object(tools.requests, "get", replay_get(cassette)))
+        yield
+
+
+# --- Runner ---------------------------------------------------------------
+
+class SpanCollector:
+    """Finished spans by trace id, collected in place of the tracer's exporter"""
+
+    def __init__(self):
+        self.traces: Dict[str, List[tracing.Span]] = {}
+
+    def record(self, finished: tracing.Span):
+        self.traces.setdefault(finished.trace_id, []).append(finished)
+
+    def pop(self, trace_id: str) -> List[tracing.Span]:
+        return self.traces.pop(trace_id, [])
+
+
+class GraphReplay:
+    """Compiled graphs per corpus mode, run one label at a time under the cassette"""
+
+    def __init__(self, cassette: Cassette, collector: SpanCollector):
+        self.cassette = cassette
+        self.collector = collector
+        self.llm = routing.chat_model(settings.gemini_model)
+        self._graphs: Dict[str, Any] = {}
+
+    def graph(self, mode: str):
+        if mode not in self._graphs:
+            self._graphs[mode] = build_health_copilot(self.llm, resolve_fields(mode))
+        return self._graphs[mode]
+
+    def run(self, label: Dict[str, Any]) -> Dict[str, Any]:
+        """One analysis of a corpus label: its final state, wall time and spans"""
+        paths = [os.path.join(FIXTURES, image) for image in label["images"]]
+        graph = self.graph(label.get("mode", "full"))
+        trace_id = new_request_id()
+        # Nothing may carry over between runs: fresh circuit breakers and in-process caches
+        fresh = {
+            "off_category_misses": TTLSet(settings.negative_cache_ttl_seconds, settings.negative_cache_max_entries),
+            "wikipedia_misses": TTLSet(settings.negative_cache_ttl_seconds, settings.negative_cache_max_entries),
+            "wikipedia_summaries": TTLCache(settings.ingredient_cache_ttl_seconds, settings.wikipedia_cache_max_entries),
+        }
+        with mock.patch.object(circuit_breakers, "_breakers", {}), mock.patch.multiple(tools, **fresh):
+            start = time.perf_counter()
+            with tracing.span("replay.analysis", label=label["name"]):
+                result = graph.invoke({
+                    "image_path": paths[0],
+                    "image_paths": paths,
+                    "user_raw_health": label.get("profile", ""),
+                    "deadline": new_deadline(),
+                    "degraded_stages": [],
+                })
+            wall = time.perf_counter() - start
+        return {"result": result, "wall_ms": wall * 1000, "spans": self.collector.pop(trace_id)}
+
+
+def fingerprint(result: Dict[str, Any]) -> Dict[str, Any]:
+    """What must not change between iterations of one label"""
+    insight = result.get("final_conversational_insight") or ""
+    return {
+        "brand": result.get("brand_name"),
+        "ingredients": len(result.get("ingredients_list") or []),
+        "extraction_status": result.get("extraction_status") or "ok",
+        "decision": (result.get("decision") or {}).get("level"),
+        "degraded_stages": sorted(result.get("degraded_stages") or []),
+        "insight_sha256": hashlib.sha256(insight.encode("utf-8")).hexdigest()[:16],
+    }
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Nearest-rank p50/p95/p99 plus mean and max, in the samples' unit"""
+    ordered = sorted(samples)
+
+    def rank(p: float) -> float:
+        return ordered[max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))]
+
+    return {
+        "count": len(ordered),
+        "p50": round(rank(50), 3),
+        "p95": round(rank(95), 3),
+        "p99": round(rank(99), 3),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def span_tokens(spans: List[tracing.Span]) -> Dict[str, int]:
+    """Tokens reported per provider by the governor's upstream spans"""
+    tokens: Dict[str, int] = {}
+    for s in spans:
+        if s.name.startswith("upstream.") and isinstance(s.attributes.get("total_tokens"), int):
+            provider = s.attributes.get("provider", s.name[len("upstream."):])
+            tokens[provider] = tokens.get(provider, 0) + s.attributes["total_tokens"]
+    return tokens
+
+
+def measure_allocations(replay: GraphReplay, corpus: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Peak and retained traced memory per label, plus the sites that retained the most"""
+    labels = {}
+    tracemalloc.start()
+    try:
+        gc.collect()
+        baseline = tracemalloc.take_snapshot()
+        for label in corpus:
+            gc.collect()
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            outcome = replay.run(label)
+            peak = tracemalloc.get_traced_memory()[1]
+            del outcome
+            gc.collect()
+            after = tracemalloc.get_traced_memory()[0]
+            labels[label["name"]] = {
+                "peak_kb": round((peak - before) / 1024, 1),
+                "retained_kb": round((after - before) / 1024, 1),
+            }
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        growth = tracemalloc.take_snapshot().filter_traces(filters).compare_to(baseline.filter_traces(filters), "lineno")
+    finally:
+        tracemalloc.stop()
+    root = os.path.dirname(FIXTURES)
+    top = [
+        {
+            "site": f"{os.path.relpath(stat.traceback[0].filename, os.path.dirname(root))}:{stat.traceback[0].lineno}",
+            "kb": round(stat.size_diff / 1024, 1),
+            "blocks": stat.count_diff,
+        }
+        for stat in growth[:10] if stat.size_diff > 0
+    ]
+    return {"labels": labels, "top_retained": top}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--", "app"], capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def replay_corpus(replay: GraphReplay, corpus: List[Dict[str, Any]], args: argparse.Namespace) -> Dict[str, Any]:
+    for _ in range(args.warmup):
+        for label in corpus:
+            replay.run(label)
+
+    analyses: List[float] = []
+    by_span: Dict[str, List[float]] = {}
+    labels: Dict[str, Dict[str, Any]] = {}
+    tokens: Dict[str, int] = {}
+    mismatches = []
+    started = time.perf_counter()
+    for iteration in range(args.iterations):
+        for label in corpus:
+            outcome = replay.run(label)
+            analyses.append(outcome["wall_ms"])
+            for s in outcome["spans"]:
+                if s.name != "replay.analysis":
+                    by_span.setdefault(s.name, []).append(s.duration_ms)
+            entry = labels.setdefault(label["name"], {"wall_ms": [], "tokens": span_tokens(outcome["spans"])})
+            entry["wall_ms"].append(outcome["wall_ms"])
+            for provider, count in entry["tokens"].items():
+                tokens[provider] = tokens.get(provider, 0) + count
+            current = fingerprint(outcome["result"])
+            if "fingerprint" not in entry:
+                entry["fingerprint"] = current
+            elif current != entry["fingerprint"]:
+                mismatches.append({"label": label["name"], "iteration": iteration, "expected": entry["fingerprint"], "got": current})
+    wall = time.perf_counter() - started
+
+    return {
+        "wall_seconds": round(wall, 3),
+        "analyses_per_second": round(len(analyses) / wall, 2),
+        "analysis_ms": percentiles(analyses),
+        "nodes": {name: percentiles(v) for name, v in sorted(by_span.items()) if name.startswith("node.")},
+        "calls": {name: percentiles(v) for name, v in sorted(by_span.items()) if not name.startswith("node.")},
+        "tokens_per_analysis": {provider: round(total / len(analyses), 1) for provider, total in sorted(tokens.items())},
+        "labels": {
+            name: {"analysis_ms": percentiles(entry["wall_ms"]), "tokens": entry["tokens"], "fingerprint": entry["fingerprint"]}
+            for name, entry in labels.items()
+        },
+        "deterministic": not mismatches,
+        "mismatches": mismatches[:20],
+    }
+
+
+# --- Output ---------------------------------------------------------------
+
+def flatten(report: Dict[str, Any]) -> Dict[str, float]:
+    """Comparable figures of a report, by dotted name"""
+    flat = {"wall_seconds": report["wall_seconds"]}
+    for stat in ("p50", "p95", "p99"):
+        flat[f"analysis_ms.{stat}"] = report["analysis_ms"][stat]
+    for group in ("nodes", "calls"):
+        for name, stats in report[group].items():
+            for stat in ("p50", "p95"):
+                flat[f"{group}.{name}.{stat}"] = stats[stat]
+    for name, label in report["labels"].items():
+        flat[f"labels.{name}.p50"] = label["analysis_ms"]["p50"]
+    for provider, count in report["tokens_per_analysis"].items():
+        flat[f"tokens.{provider}"] = count
+    for name, allocation in (report.get("allocations") or {}).get("labels", {}).items():
+        flat[f"allocations.{name}.peak_kb"] = allocation["peak_kb"]
+        flat[f"allocations.{name}.retained_kb"] = allocation["retained_kb"]
+    return flat
+
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any], threshold: float):
+    """Print the change of every figure both reports have; increases over `threshold` percent are flagged"""
+    print(f"\ncompared with {previous.get('commit') or 'unknown commit'} ({previous.get('created_at')})")
+    if previous.get("config", {}).get("latency_scale") != current["config"]["latency_scale"]:
+        print("  (warning: the reports used different --latency-scale values)")
+    old, new = flatten(previous), flatten(current)
+    print(f"{'':52} {'before':>10} {'after':>10} {'change':>8}")
+    flagged = 0
+    for name in new:
+        if name not in old:
+            continue
+        change = (new[name] - old[name]) / old[name] * 100 if old[name] else 0.0
+        flag = "  << regressed" if change > threshold else ""
+        flagged += bool(flag)
+        print(f"{name:52} {old[name]:10.2f} {new[name]:10.2f} {change:+7.1f}%{flag}")
+    print(f"\n{flagged} figure(s) grew by more than {threshold:.0f}%")
+
+
+def print_summary(report: Dict[str, Any]):
+    config = report["config"]
+    print(f"{config['labels']} labels x {config['iterations']} iterations, latency scale {config['latency_scale']}, "
+          f"{report['wall_seconds']:.2f}s ({report['analyses_per_second']} analyses/s)")
+    print(f"\n{'':32} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9} {'count':>6}")
+    rows = [("analysis", report["analysis_ms"])] + list(report["nodes"].items()) + list(report["calls"].items())
+    for name, stats in rows:
+        print(f"{name:32} {stats['p50']:9.2f} {stats['p95']:9.2f} {stats['p99']:9.2f} {stats['count']:6}")
+    print(f"\ntokens per analysis: {', '.join(f'{p} {n:g}' for p, n in report['tokens_per_analysis'].items()) or 'none'}")
+    allocations = report.get("allocations")
+    if allocations:
+        print("\nallocations (KB):")
+        for name, figures in allocations["labels"].items():
+            print(f"  {name:30} peak {figures['peak_kb']:9.1f}  retained {figures['retained_kb']:9.1f}")
+    print(f"\ndeterministic: {report['deterministic']}")
+    if report["missing_recordings"]:
+        print(f"missing recordings ({len(report['missing_recordings'])}), re-run with --record:")
+        for describe in report["missing_recordings"]:
+            print(f"  {describe}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=os.path.join(FIXTURES, "corpus.json"))
+    parser.add_argument("--recordings", default=os.path.join(FIXTURES, "recordings.json"))
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1, help="untimed passes over the corpus first")
+    parser.add_argument("--latency-scale", type=float, default=0.0,
+                        help="sleep this multiple of the recorded upstream latency (0 = none)")
+    parser.add_argument("--allocations", action="store_true", help="add a tracemalloc pass over the corpus")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="a previous JSON report to diff against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent growth flagged by --compare")
+    parser.add_argument("--record", action="store_true",
+                        help="call the real upstreams once per corpus label and rewrite --recordings")
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = json.load(f)["labels"]
+    collector = SpanCollector()
+    executors.start()
+    try:
+        with mock.patch.object(tracing.tracer, "record", collector.record):
+            if args.record:
+                cassette = Cassette({}, recording=True)
+                with replaying(cassette):
+                    replay = GraphReplay(cassette, collector)
+                    for label in corpus:
+                        replay.run(label)
+                cassette.save(args.recordings, source="recorded from the live APIs")
+                print(f"Recorded {len(cassette.entries)} upstream answers to {args.recordings}")
+                return
+
+            cassette = Cassette.load(args.recordings, latency_scale=args.latency_scale)
+            with replaying(cassette):
+                replay = GraphReplay(cassette, collector)
+                report = {
+                    "format": REPORT_FORMAT,
+                    "commit": git_commit(),
+                    "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "cpus": os.cpu_count(),
+                    "config": {
+                        "labels": len(corpus),
+                        "iterations": args.iterations,
+                        "warmup": args.warmup,
+                        "latency_scale": args.latency_scale,
+                        "cpu_workers": settings.cpu_workers,
+                        "corpus": os.path.relpath(args.corpus),
+                        "recordings": os.path.relpath(args.recordings),
+                    },
+                    **replay_corpus(replay, corpus, args),
+                }
+                if args.allocations:
+                    report["allocations"] = measure_allocations(replay, corpus)
+    except MissingRecording:
+        # A node that cannot degrade hit it: there is no complete run to report
+        print(f"Missing recordings ({len(cassette.missing)}), re-run with --record:")
+        for describe in sorted(cassette.missing.values()):
+            print(f"  {describe}")
+        sys.exit(1)
+    finally:
+        executors.shutdown()
+
+    report["missing_recordings"] = sorted(cassette.missing.values())
+    print_summary(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+            f.write("\n")
+        print(f"\nreport written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report, args.threshold)
+    if report["missing_recordings"] or not report["deterministic"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+HTTP load test of a running server: throughput, latency percentiles and errors as concurrency ramps
+
+Closed-loop clients post the label corpus in benchmarks/fixtures to
+/api/v1/analyze (multipart) and /api/v1/analyze-url (the images are served
+from a local thread), for --duration seconds at each concurrency in --stages.
+Each request carries a unique profile suffix and trailing image bytes, so
+the result and extraction caches miss; pass --cache-hits to measure them warm.
+
+Run the app against the upstream stand-ins so a load test spends no quota:
+
+    python -m app.utils.upstream_standins            # prints the *_BASE_URL settings to export
+    GROQ_BASE_URL=... GEMINI_BASE_URL=... python run.py
+    python -m benchmarks.load_test --stages 1,2,4,8 --duration 30 --output load.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import aiohttp
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+ENDPOINTS = ("analyze", "analyze-url")
+
+
+def load_corpus(path: str) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        labels = json.load(f)["labels"]
+    for label in labels:
+        label["data"] = []
+        for image in label["images"]:
+            with open(os.path.join(os.path.dirname(path), image), "rb") as f:
+                label["data"].append(f.read())
+    return labels
+
+
+def padded(data: bytes, token: Optional[str]) -> bytes:
+    """The image with bytes after its end (decoders ignore them), so its digest is new"""
+    return data if token is None else data + f"\n{token}".encode()
+
+
+def serve_images(corpus: List[Dict[str, Any]], host: str) -> ThreadingHTTPServer:
+    """GET /{label}?pad=TOKEN returns the label's first image, padded with TOKEN"""
+    images = {label["name"]: label["data"][0] for label in corpus}
+
+    class ImageHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            data = images.get(url.path.lstrip("/"))
+            if data is None:
+                self.send_error(404)
+                return
+            body = padded(data, parse_qs(url.query).get("pad", [None])[0])
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, 0), ImageHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="load-test-images", daemon=True).start()
+    return server
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))] if ordered else 0.0
+
+
+class LoadTest:
+    """Closed-loop clients cycling through the corpus and the endpoints"""
+
+    def __init__(self, args: argparse.Namespace, corpus: List[Dict[str, Any]], image_base_url: str):
+        self.args = args
+        self.corpus = corpus
+        self.image_base_url = image_base_url
+        self.endpoints = args.endpoints
+        self._sequence = 0
+
+    def _next(self):
+        self._sequence += 1
+        label = self.corpus[self._sequence % len(self.corpus)]
+        endpoint = self.endpoints[self._sequence % len(self.endpoints)]
+        token = None if self.args.cache_hits else f"load-{os.getpid()}-{self._sequence}"
+        return label, endpoint, token
+
+    async def request(self, session: aiohttp.ClientSession, label: Dict[str, Any], endpoint: str, token: Optional[str]):
+        profile = label["profile"] if token is None else f"{label['profile']} (ref {token})"
+        url = f"{self.args.target.rstrip('/')}/api/v1/{endpoint}"
+        params = {"mode": label["mode"]} if label.get("mode") else {}
+        if endpoint == "analyze":
+            form = aiohttp.FormData()
+            for image, data in zip(label["images"], label["data"]):
+                form.add_field("file", padded(data, token), filename=os.path.basename(image), content_type="image/jpeg")
+            form.add_field("user_health_profile", profile)
+            request = session.post(url, params=params, data=form)
+        else:
+            image_url = f"{self.image_base_url}/{label['name']}" + (f"?pad={token}" if token else "")
+            request = session.post(url, params=params, json={"image_url": image_url, "user_health_profile": profile})
+        async with request as response:
+            await response.read()
+            return response.status
+
+    async def client(self, session: aiohttp.ClientSession, deadline: float, samples: List[Dict[str, Any]]):
+        while time.monotonic() < deadline:
+            label, endpoint, token = self._next()
+            start = time.monotonic()
+            try:
+                status = await self.request(session, label, endpoint, token)
+            except asyncio.TimeoutError:
+                status = "timeout"
+            except aiohttp.ClientError as e:
+                status = type(e).__name__
+            samples.append({"endpoint": endpoint, "status": status, "seconds": time.monotonic() - start})
+
+    async def stage(self, concurrency: int) -> Dict[str, Any]:
+        samples: List[Dict[str, Any]] = []
+        timeout = aiohttp.ClientTimeout(total=self.args.timeout)
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            started = time.monotonic()
+            deadline = started + self.args.duration
+            # Requests still in flight at the deadline finish and are counted
+            await asyncio.gather(*(self.client(session, deadline, samples) for _ in range(concurrency)))
+            elapsed = time.monotonic() - started
+        return {
+            "concurrency": concurrency,
+            "seconds": round(elapsed, 2),
+            "endpoints": {endpoint: summarize([s for s in samples if s["endpoint"] == endpoint], elapsed)
+                          for endpoint in self.endpoints},
+        }
+
+
+def summarize(samples: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    statuses = Counter(str(s["status"]) for s in samples)
+    ok = sorted(s["seconds"] * 1000 for s in samples if s["status"] == 200)
+    return {
+        "requests": len(samples),
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        "p50_ms": round(percentile(ok, 50), 1),
+        "p95_ms": round(percentile(ok, 95), 1),
+        "p99_ms": round(percentile(ok, 99), 1),
+        "error_rate": round(1 - len(ok) / len(samples), 4) if samples else 0.0,
+        "statuses": dict(sorted(statuses.items())),
+    }
+
+
+def print_stage(stage: Dict[str, Any]):
+    for endpoint, stats in stage["endpoints"].items():
+        statuses = " ".join(f"{status}:{n}" for status, n in stats["statuses"].items())
+        print(f"{stage['concurrency']:>5} {endpoint:12} {stats['requests']:6} {stats['throughput_rps']:8.2f} "
+              f"{stats['p50_ms']:9.1f} {stats['p95_ms']:9.1f} {stats['p99_ms']:9.1f} {stats['error_rate']:7.1%}  {statuses}",
+              flush=True)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    corpus = load_corpus(args.corpus)
+    images = serve_images(corpus, args.image_host)
+    load = LoadTest(args, corpus, f"http://{args.image_host}:{images.server_address[1]}")
+    print(f"{'conc':>5} {'endpoint':12} {'reqs':>6} {'ok_rps':>8} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9} {'errors':>7}  statuses")
+    stages = []
+    try:
+        for concurrency in args.stages:
+            stage = await load.stage(concurrency)
+            print_stage(stage)
+            stages.append(stage)
+    finally:
+        images.shutdown()
+        images.server_close()
+    return {
+        "target": args.target,
+        "config": {"stages": args.stages, "duration": args.duration, "endpoints": args.endpoints,
+                   "cache_hits": args.cache_hits, "labels": len(corpus)},
+        "stages": stages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="http://127.0.0.1:8000", help="base URL of the running server")
+    parser.add_argument("--corpus", default=os.path.join(FIXTURES, "corpus.json"))
+    parser.add_argument("--stages", default="1,2,4,8", type=lambda s: [int(n) for n in s.split(",")],
+                        help="comma-separated concurrency levels, run in order")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per stage")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), type=lambda s: s.split(","),
+                        help=f"comma-separated, alternated per request ({', '.join(ENDPOINTS)})")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per request, seconds")
+    parser.add_argument("--cache-hits", action="store_true", help="repeat identical requests instead of busting the caches")
+    parser.add_argument("--image-host", default="127.0.0.1", help="address the server fetches analyze-url images from")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nreport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
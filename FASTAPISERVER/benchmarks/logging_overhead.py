@@ -0,0 +1,178 @@
+"""
+Request-path cost of logging: synchronous handlers vs. the queue + listener thread
+
+Each simulated analysis logs what one request logs: ~20 progress lines, the
+raw vision-model output and parsed label JSON, and the full designer answer.
+"sync" is the previous setup (console + rotating file written on the calling
+thread, payloads logged whole at INFO/DEBUG); "queued" is app.utils.logger
+(records enqueued, payloads sampled and capped). Only time spent on the
+request threads is measured; the console goes to /dev/null. Each thread
+pauses `--interval-ms` between requests, standing in for the network waits
+of a real analysis (0 measures a saturated logger).
+
+    python -m benchmarks.logging_overhead --requests 2000 --threads 8 --interval-ms 5
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from app.config.settings import settings  # noqa: E402
+from app.utils import logger as app_logging  # noqa: E402
+from app.utils.metrics import metrics  # noqa: E402
+
+PROGRESS_LINES = 20
+
+
+def make_payloads() -> dict:
+    label = {
+        "brand": "Brand",
+        "ingredients": [f"ingredient number {i} (E{100 + i})" for i in range(60)],
+        "nutrition": {"calories": 250, "total_fat_g": 12.5, "protein_g": 4.0, "sodium_mg": 310},
+    }
+    return {
+        "raw": "```json\n" + json.dumps(label, indent=2) + "\n```",
+        "label": label,
+        "designer": "\n".join(f"## Section {i}\n" + "Lorem ipsum dolor sit amet. " * 40 for i in range(6)),
+    }
+
+
+def sync_logger(directory: str, devnull) -> logging.Logger:
+    """The previous configuration: handlers called on the logging thread"""
+    log = logging.getLogger("benchmark.sync")
+    log.setLevel(logging.DEBUG)
+    log.propagate = False
+    console = logging.StreamHandler(devnull)
+    console.setLevel(logging.INFO)
+    console.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+    file_handler = RotatingFileHandler(os.path.join(directory, "sync.log"), maxBytes=10 * 1024 * 1024, backupCount=5)
+    file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s', datefmt='%Y-%m-%d %H:%M:%S'
+    ))
+    log.addHandler(console)
+    log.addHandler(file_handler)
+    return log
+
+
+def queued_logger(directory: str, devnull) -> tuple:
+    """app.utils.logger's configuration, writing to the benchmark's files"""
+    log = logging.getLogger("benchmark.queued")
+    log.setLevel(logging.DEBUG)
+    log.propagate = False
+    console = logging.StreamHandler(devnull)
+    console.setLevel(logging.INFO)
+    console.setFormatter(app_logging.TextFormatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+    file_handler = RotatingFileHandler(os.path.join(directory, "queued.log"), maxBytes=10 * 1024 * 1024, backupCount=5)
+    file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(app_logging.JsonFormatter())
+    log_queue = queue.Queue(maxsize=settings.log_queue_size)
+    log.addHandler(app_logging.NonBlockingQueueHandler(log_queue))
+    listener = app_logging.DrainingQueueListener(log_queue, console, file_handler, respect_handler_level=True)
+    return log, listener
+
+
+def sync_request(log: logging.Logger, payloads: dict):
+    for i in range(PROGRESS_LINES):
+        log.info(f"Step {i}: processing label image with model llama-4 (preprocessed: True)")
+    log.info(f"Groq Vision raw response text: {payloads['raw']}")
+    log.info(f"Successfully parsed JSON: {payloads['label']}")
+    log.debug(f"Designer response ({len(payloads['designer'])} chars):\n{payloads['designer']}")
+
+
+def queued_request(log: logging.Logger, payloads: dict):
+    # log_payload bound to the benchmark logger
+    def log_payload(message, **payload):
+        if log.isEnabledFor(logging.DEBUG) and random.random() < settings.log_payload_sample_rate:
+            log.debug(message, extra={"payload": payload})
+
+    for i in range(PROGRESS_LINES):
+        log.info(f"Step {i}: processing label image with model llama-4 (preprocessed: True)")
+    log_payload("Groq Vision raw response", model="llama-4", text=payloads["raw"])
+    log_payload("Parsed Groq Vision JSON", data=payloads["label"])
+    log_payload(f"Designer response ({len(payloads['designer'])} chars)", text=payloads["designer"])
+
+
+def run(request_fn, log, payloads: dict, requests: int, threads: int, interval: float) -> list:
+    latencies = []
+    lock = threading.Lock()
+    per_thread = requests // threads
+
+    def worker():
+        local = []
+        for _ in range(per_thread):
+            start = time.perf_counter()
+            request_fn(log, payloads)
+            local.append(time.perf_counter() - start)
+            time.sleep(interval)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return latencies
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--interval-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    # The app's own listener must not compete with the one measured here
+    app_logging.stop_logging()
+    payloads = make_payloads()
+    print(f"{args.requests} requests on {args.threads} threads, {PROGRESS_LINES + 3} records each, "
+          f"payload sample rate {settings.log_payload_sample_rate}, {os.cpu_count()} CPUs")
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, "w") as devnull:
+        log = sync_logger(directory, devnull)
+        sync_latencies = run(sync_request, log, payloads, args.requests, args.threads, args.interval_ms / 1000)
+
+        log, listener = queued_logger(directory, devnull)
+        listener.start()
+        started = time.perf_counter()
+        queued_latencies = run(queued_request, log, payloads, args.requests, args.threads, args.interval_ms / 1000)
+        listener.stop()
+        drained = time.perf_counter() - started
+
+        for label, latencies in (("sync handlers", sync_latencies), ("queue + listener", queued_latencies)):
+            print(f"\n{label}")
+            print(f"  request_p50_us    {statistics.median(latencies) * 1e6:9.1f}")
+            print(f"  request_p99_us    {percentile(latencies, 99) * 1e6:9.1f}")
+            print(f"  request_mean_us   {statistics.mean(latencies) * 1e6:9.1f}")
+        # Including rotated files
+        sizes = {
+            name: sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory) if f.startswith(name))
+            for name in ("sync.log", "queued.log")
+        }
+        print(f"\nlog file bytes per request: sync {sizes['sync.log'] / args.requests:.0f}, "
+              f"queued {sizes['queued.log'] / args.requests:.0f}")
+        dropped = sum(c["value"] for c in metrics.snapshot()["counters"] if c["name"] == "log_records_dropped_total")
+        print(f"queued run incl. draining the listener: {drained:.2f}s, "
+              f"{dropped:.0f} records dropped on a full queue (LOG_QUEUE_SIZE={settings.log_queue_size})")
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
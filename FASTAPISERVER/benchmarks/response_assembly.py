@@ -0,0 +1,155 @@
+"""
+Cost of turning a finished analysis state into response bytes
+
+"previous" is what the routes did before app.api.assembly: rebuild every
+ingredient profile field by field, validate a HealthAnalysisResponse, then
+let FastAPI validate it again against the response model, serialize it to
+Python and `json.dumps` it (JSONResponse). "assembly" validates one plain
+document with a precompiled TypeAdapter and serializes it in pydantic-core;
+compression is measured separately per encoding. The state has `--ingredients`
+IngredientProfile models and a designer answer of `--insight-kb` KB.
+
+    python -m benchmarks.response_assembly --iterations 2000 --ingredients 40 --insight-kb 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+import warnings
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+import orjson  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+from app.api import assembly  # noqa: E402
+from app.models.responses import HealthAnalysisResponse, IngredientProfileResponse  # noqa: E402
+from app.services.health_agent.tools import IngredientProfile  # noqa: E402
+
+
+def make_state(ingredients: int, insight_kb: float) -> dict:
+    paragraph = "Sodium is high for someone managing blood pressure; compare brands per 100g. "
+    insight = "\n\n".join(
+        f"## Section {i}\n" + paragraph * max(1, int(insight_kb * 1024 / 6 / len(paragraph)))
+        for i in range(6)
+    )
+    return {
+        "brand_name": "Example Cereal",
+        "ingredients_list": [f"Ingredient {i}" for i in range(ingredients)],
+        "user_clinical_profile": "Limit sodium < 1500mg/day; avoid peanuts",
+        "ingredient_knowledge_base": [
+            IngredientProfile(
+                name=f"Ingredient {i}",
+                manufacturing="Synthetic, produced by fermentation and refined",
+                regulatory_gap="Approved in the EU and US, restricted in some regions",
+                health_risks="Large intakes are linked to raised blood pressure in sensitive people",
+                nova_score=1 + i % 4,
+            )
+            for i in range(ingredients)
+        ],
+        "clinical_risk_analysis": paragraph * 40,
+        "product_alternatives": [f"Alternative {i}" for i in range(5)],
+        "final_conversational_insight": insight,
+        "decision_color": "#F97316",
+        "degraded_stages": [],
+        "extraction_status": "ok",
+        "decision": {
+            "level": "concerns", "color": "#F97316", "verdict": "Not ideal, consider alternatives.",
+            "score": 5, "reasons": ["High sodium"], "traffic_lights": {"sodium": "red"}, "basis": "per_100g",
+        },
+        "prescreen_result": {"conflicts": []},
+    }
+
+
+def previous_build(result: dict) -> HealthAnalysisResponse:
+    """The routes' former per-field assembly"""
+    warnings.filterwarnings("ignore", message="The `dict` method is deprecated")
+    ingredient_profiles = []
+    for item in result.get("ingredient_knowledge_base", []):
+        item_dict = item.dict() if hasattr(item, 'dict') else item
+        ingredient_profiles.append(IngredientProfileResponse(
+            name=item_dict.get("name", "Unknown"),
+            manufacturing=item_dict.get("manufacturing", "Unknown"),
+            regulatory_gap=item_dict.get("regulatory_gap", "No data"),
+            health_risks=item_dict.get("health_risks", "No data"),
+            nova_score=item_dict.get("nova_score", 3)
+        ))
+    return HealthAnalysisResponse(
+        success=True,
+        brand_name=result.get("brand_name", "Unknown"),
+        ingredients_list=result.get("ingredients_list", []),
+        user_clinical_profile=result.get("user_clinical_profile", ""),
+        ingredient_knowledge_base=ingredient_profiles,
+        clinical_risk_analysis=result.get("clinical_risk_analysis", ""),
+        product_alternatives=result.get("product_alternatives", []),
+        final_conversational_insight=result.get("final_conversational_insight", ""),
+        decision_color=result.get("decision_color", "#EAB308"),
+        degraded_stages=result.get("degraded_stages", []),
+        extraction_status=result.get("extraction_status") or "ok",
+        decision=result.get("decision"),
+        conflicts=(result.get("prescreen_result") or {}).get("conflicts", [])
+    )
+
+
+async def previous_bytes(result: dict, field) -> bytes:
+    """Former assembly plus FastAPI's response_model handling and JSONResponse rendering"""
+    content = await serialize_response(field=field, response_content=previous_build(result))
+    return JSONResponse(content).body
+
+
+def timed(fn, iterations: int) -> list:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--ingredients", type=int, default=40)
+    parser.add_argument("--insight-kb", type=float, default=8.0)
+    args = parser.parse_args()
+
+    state = make_state(args.ingredients, args.insight_kb)
+    field = create_model_field(name="Response_analyze", type_=HealthAnalysisResponse, mode="serialization")
+    loop = asyncio.new_event_loop()
+
+    previous = loop.run_until_complete(previous_bytes(state, field))
+    current = assembly.analysis_json(state)
+    assert json.loads(previous) == json.loads(current), "assembly changed the response body"
+    document = json.loads(current)
+
+    results = {
+        "previous (build + response_model + JSONResponse)": timed(
+            lambda: loop.run_until_complete(previous_bytes(state, field)), args.iterations),
+        "assembly.analysis_json": timed(lambda: assembly.analysis_json(state), args.iterations),
+        "  of which build_analysis_response": timed(lambda: assembly.build_analysis_response(state), args.iterations),
+        "job result: orjson of a snapshot": timed(lambda: orjson.dumps(document), args.iterations),
+        "job result: json.dumps of a snapshot": timed(lambda: json.dumps(document).encode(), args.iterations),
+    }
+    compressed = {}
+    for encoding in ("gzip", "br") if assembly.brotli is not None else ("gzip",):
+        results[f"compress {encoding}"] = timed(lambda: assembly.compress(current, encoding), args.iterations)
+        compressed[encoding] = len(assembly.compress(current, encoding))
+
+    print(f"{args.ingredients} ingredients, {len(state['final_conversational_insight']) / 1024:.1f} KB insight, "
+          f"{args.iterations} iterations")
+    print(f"\n{'':52} {'p50_us':>9} {'mean_us':>9}")
+    for label, samples in results.items():
+        print(f"{label:52} {statistics.median(samples) * 1e6:9.1f} {statistics.mean(samples) * 1e6:9.1f}")
+    sizes = ", ".join(f"{encoding} {size}" for encoding, size in compressed.items())
+    print(f"\nbody bytes: json {len(current)}, {sizes}")
+    if assembly.brotli is None:
+        print("(Brotli not installed: br not measured)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Cold-start budget: import time of app.main and time until /api/v1/health answers
+
+Runs `python -X importtime -c "import app.main"` in fresh interpreters,
+reports the median total and the slowest top-level packages, checks that the
+heavy dependencies (LangChain, LangGraph, provider SDKs, OpenCV, aiohttp) are
+not imported at startup, then starts uvicorn and measures how long the health
+endpoint takes to respond. Exits non-zero when a budget is exceeded, so it can
+run in CI and be tracked across releases.
+
+    python -m benchmarks.startup_time --runs 5 --import-budget-ms 1500 --health-budget-ms 3000
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+
+# Must not be imported by `import app.main`; the analysis engine loads them after startup
+LAZY_MODULES = ("langchain_google_genai", "langchain_core", "langgraph", "groq", "cv2", "aiohttp", "requests")
+
+
+def child_env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_API_KEY", "benchmark")
+    env.setdefault("GROQ_API_KEY", "benchmark")
+    return env
+
+
+def import_profile() -> tuple:
+    """(cumulative microseconds for app.main, {top-level package: summed self microseconds})"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True, text=True, env=child_env(), check=True
+    )
+    total, packages = 0, defaultdict(int)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line.split("|", 2)
+        try:
+            self_us, cumulative_us = int(self_us.split(":")[-1]), int(cumulative_us)
+        except ValueError:
+            continue  # Header line
+        module = name.strip()
+        packages[module.split(".")[0]] += self_us
+        if module == "app.main":
+            total = cumulative_us
+    return total, packages
+
+
+def loaded_lazy_modules() -> list:
+    code = "import sys, json, app.main; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=child_env(), check=True)
+    modules = set(json.loads(result.stdout.strip().splitlines()[-1]))
+    return [name for name in LAZY_MODULES if name in modules]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_health(timeout: float = 60.0) -> float:
+    """Seconds from launching uvicorn until GET /api/v1/health returns 200"""
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=child_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/v1/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"/api/v1/health did not answer within {timeout:.0f}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level packages to list")
+    parser.add_argument("--import-budget-ms", type=float, default=1500)
+    parser.add_argument("--health-budget-ms", type=float, default=3000)
+    args = parser.parse_args()
+
+    totals, packages = [], defaultdict(list)
+    for _ in range(args.runs):
+        total, per_package = import_profile()
+        totals.append(total / 1000)
+        for name, us in per_package.items():
+            packages[name].append(us / 1000)
+    import_ms = statistics.median(totals)
+    print(f"import app.main: median {import_ms:.0f} ms over {args.runs} runs (min {min(totals):.0f}, max {max(totals):.0f})")
+    print("slowest packages (self time, median ms):")
+    slowest = sorted(packages.items(), key=lambda item: statistics.median(item[1]), reverse=True)[:args.top]
+    for name, values in slowest:
+        print(f"  {name:<28} {statistics.median(values):8.1f}")
+
+    failures = []
+    eager = loaded_lazy_modules()
+    print(f"heavy modules imported at startup: {', '.join(eager) or 'none'}")
+    if eager:
+        failures.append(f"imported at startup: {', '.join(eager)}")
+    if import_ms > args.import_budget_ms:
+        failures.append(f"import {import_ms:.0f} ms > budget {args.import_budget_ms:.0f} ms")
+
+    health_ms = statistics.median(time_to_health() for _ in range(args.runs)) * 1000
+    print(f"uvicorn start -> /api/v1/health 200: median {health_ms:.0f} ms")
+    if health_ms > args.health_budget_ms:
+        failures.append(f"health {health_ms:.0f} ms > budget {args.health_budget_ms:.0f} ms")
+
+    if failures:
+        print("\nFAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("\nOK: within budget")
+
+
+if __name__ == "__main__":
+    main()
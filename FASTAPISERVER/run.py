@@ -1,20 +1,35 @@
 """Server startup script"""
 
+import argparse
 import uvicorn
 from app.config.settings import settings
 
 import os
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Health Agent API")
+    parser.add_argument("--workers", type=int, default=settings.workers,
+                        help="Worker processes (default: WORKERS); more than 1 disables auto-reload")
+    parser.add_argument("--reload", action=argparse.BooleanOptionalAction, default=None,
+                        help="Restart on code changes (default: DEBUG, single worker only)")
+    args = parser.parse_args()
+
     # CRITICAL FIX FOR RENDER DEPLOYMENT
     # Render sets the PORT environment variable. We MUST listen on that port.
     # Locally, PORT is usually unset, so we default to settings.port (8000).
     port = int(os.environ.get("PORT", settings.port))
+
+    # Production mode: N processes, one per core. Workers re-read the environment,
+    # so WORKERS must match for the per-worker provider rate limits to add up.
+    workers = max(1, args.workers)
+    os.environ["WORKERS"] = str(workers)
+    reload = (settings.debug if args.reload is None else args.reload) and workers == 1
     
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0", # Always bind to 0.0.0.0 for deployment
         port=port,
-        reload=settings.debug,
+        workers=workers,
+        reload=reload,
         log_level=settings.log_level.lower()
     )
@@ -23,13 +23,13 @@ const HealthAnalysisDisplay = ({ insight, decisionColor }) => {
         const iconBgColor = `rgba(${rgb.r}, ${rgb.g}, ${rgb.b}, 0.25)`;
 
         // Determine icon based on color hue
-        // Green hues (60-180): thumbs up, Yellow (30-60): warning, Red (0-30, 330-360): thumbs down
+        // Green hues (80-160): thumbs up, Yellow/orange (15-80, e.g. #F97316 "concerns"): warning, Red (0-15, 340-360): thumbs down
         const hue = rgbToHue(rgb.r, rgb.g, rgb.b);
         let Icon = FiAlertTriangle; // Default
 
         if (hue >= 80 && hue <= 160) {
             Icon = FiThumbsUp; // Green spectrum
-        } else if (hue >= 0 && hue <= 40 || hue >= 340) {
+        } else if (hue >= 0 && hue < 15 || hue >= 340) {
             Icon = FiThumbsDown; // Red spectrum
         }
 